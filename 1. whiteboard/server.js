@@ -3,7 +3,7 @@ const fs = require('fs');
 const path = require('path');
 const multer = require('multer');
 const cors = require('cors');
-const { spawn } = require('child_process');
+const http = require('http');
 
 const app = express();
 app.use(cors());
@@ -35,39 +35,78 @@ app.post('/upload', upload.single('recording'), (req, res) => {
     });
 });
 
-// Endpoint to execute Python script
-app.post('/run-python', (req, res) => {
-    const scriptPath = "C:\\Users\\CoE\\Desktop\\Final Smartboard\\Ai-Board-YIC\\3. ml features\\2. Video To Transcript with Trl\\checkFolder.py";  // Update with the correct script path
-    const pythonExecutable = "C:\\Users\\CoE\\AppData\\Local\\Programs\\Python\\Python311\\python.exe"; // Replace with the full path to Python executable
+// Resident Python job server (3. ml features/2. Video To Transcript with Trl/job_server.py)
+const jobServerUrl = process.env.SMARTREC_JOB_SERVER || 'http://127.0.0.1:8765';
+
+// Forward a request to the job server and relay its JSON response
+const forwardToJobServer = (method, jobPath, body, res) => {
+    const payload = body ? JSON.stringify(body) : null;
+    const request = http.request(`${jobServerUrl}${jobPath}`, {
+        method,
+        headers: payload ? { 'Content-Type': 'application/json', 'Content-Length': Buffer.byteLength(payload) } : {},
+    }, (response) => {
+        let data = '';
+        response.on('data', (chunk) => { data += chunk; });
+        response.on('end', () => {
+            res.status(response.statusCode).type('application/json').send(data);
+        });
+    });
 
-    // console.log(`Running Python script: ${scriptPath} using ${pythonExecutable}`);
+    request.on('error', (err) => {
+        console.error('Error reaching job server:', err);
+        res.status(502).json({ error: 'Python job server is not running.' });
+    });
 
-    const pythonProcess = spawn(pythonExecutable, [scriptPath]);
+    if (payload) {
+        request.write(payload);
+    }
+    request.end();
+};
 
-    let scriptOutput = '';
-    let scriptError = '';
+// Endpoint to enqueue a scan of the recordings folder. The body may set a
+// priority class ("urgent", "normal", "archive") and a classroom id.
+app.post('/run-python', (req, res) => {
+    const params = { input_dir: recordingsDir };
+    const { priority, classroom } = req.body || {};
+    if (priority) {
+        params.priority = priority;
+    }
+    if (classroom) {
+        params.classroom = classroom;
+    }
+    forwardToJobServer('POST', '/jobs', { kind: 'scan', params }, res);
+});
 
-    pythonProcess.stdout.on('data', (data) => {
-        scriptOutput += data.toString();
-        console.log(`Script output: ${data.toString()}`);
-    });
+// Job status and result endpoints
+app.get('/jobs/:id', (req, res) => {
+    forwardToJobServer('GET', `/jobs/${encodeURIComponent(req.params.id)}`, null, res);
+});
+
+app.get('/jobs/:id/result', (req, res) => {
+    forwardToJobServer('GET', `/jobs/${encodeURIComponent(req.params.id)}/result`, null, res);
+});
 
-    pythonProcess.stderr.on('data', (data) => {
-        scriptError += data.toString();
-        console.error(`Script error: ${data.toString()}`);
+// Progress events: cheap polling with ?since=<next>, or a Server-Sent Events stream
+app.get('/jobs/:id/events', (req, res) => {
+    const since = parseInt(req.query.since, 10) || 0;
+    forwardToJobServer('GET', `/jobs/${encodeURIComponent(req.params.id)}/events?since=${since}`, null, res);
+});
+
+app.get('/jobs/:id/stream', (req, res) => {
+    const since = parseInt(req.query.since, 10) || 0;
+    const request = http.get(`${jobServerUrl}/jobs/${encodeURIComponent(req.params.id)}/stream?since=${since}`, (response) => {
+        res.writeHead(response.statusCode, {
+            'Content-Type': response.headers['content-type'] || 'text/event-stream',
+            'Cache-Control': 'no-cache',
+        });
+        response.pipe(res);
     });
 
-    pythonProcess.on('close', (code) => {
-        console.log(`Python process exited with code: ${code}`);
-        if (code === 0) {
-            res.json({ message: scriptOutput.trim() });
-        } else {
-            res.status(500).json({
-                error: `Failed to execute Python script. Exit code: ${code}`,
-                stderr: scriptError.trim(),
-            });
-        }
+    request.on('error', (err) => {
+        console.error('Error reaching job server:', err);
+        res.status(502).json({ error: 'Python job server is not running.' });
     });
+    req.on('close', () => request.destroy());
 });
 
 
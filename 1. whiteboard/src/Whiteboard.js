@@ -150,22 +150,42 @@ function Whiteboard() {
         throw new Error("Failed to execute Python script");
       }
   
-      // Use a stream or event source to get real-time updates
-      const reader = response.body.getReader();
-      const decoder = new TextDecoder("utf-8");
-  
-      while (true) {
-        const { done, value } = await reader.read();
-        if (done) break;
-  
-        // Decode the chunk of data
-        const chunk = decoder.decode(value);
-        console.log("Received chunk:", chunk);
-  
-        // Update the SweetAlert2 modal with the new content
-        swalInstance.update({
-          html: chunk, // Update the content with the latest chunk
-        });
+      // The server only enqueues the job; poll its progress events until it finishes
+      const job = await response.json();
+      let status = job.status;
+      let since = 0;
+
+      const pending = (value) => value === "queued" || value === "running" || value === "waiting";
+
+      while (pending(status)) {
+        const eventsResponse = await fetch(
+          `http://localhost:8000/jobs/${job.id}/events?since=${since}`
+        );
+        if (!eventsResponse.ok) {
+          throw new Error("Failed to fetch job progress");
+        }
+        const progress = await eventsResponse.json();
+        status = progress.status;
+        since = progress.next;
+
+        const latest = progress.events[progress.events.length - 1];
+        if (latest) {
+          const eta = latest.eta_seconds ? ` (about ${Math.ceil(latest.eta_seconds)}s left)` : "";
+          const step = latest.total ? ` ${latest.processed || 0}/${latest.total} ${latest.unit}` : "";
+          swalInstance.update({
+            html: `${latest.file || ""} ${latest.stage}${step}${eta}`,
+          });
+        } else if (status === "queued") {
+          swalInstance.update({ html: "Waiting in queue..." });
+        }
+
+        if (pending(status)) {
+          await new Promise((resolve) => setTimeout(resolve, 2000));
+        }
+      }
+
+      if (status !== "done") {
+        throw new Error("Python job failed");
       }
   
       // Final success message
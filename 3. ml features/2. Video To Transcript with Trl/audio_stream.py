@@ -0,0 +1,118 @@
+import os
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+
+FFMPEG = os.environ.get("FFMPEG_BINARY", "ffmpeg")
+FFPROBE = os.environ.get("FFPROBE_BINARY", "ffprobe")
+SAMPLE_RATE = 16000  # Whisper's native input rate
+BYTES_PER_SAMPLE = 2  # s16le
+
+
+def probe_duration(path):
+    """
+    Read the duration from the container header, or None when it is missing
+    (MediaRecorder WebM files carry no duration).
+    """
+    try:
+        completed = subprocess.run(
+            [FFPROBE, "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", str(path)],
+            capture_output=True, text=True, check=True,
+        )
+        return float(completed.stdout.strip())
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return None
+
+
+class PCMStream:
+    """
+    Decode any container ffmpeg understands into fixed-size windows of 16 kHz
+    mono float32 PCM. Only one window is held in memory at a time, so peak
+    memory does not grow with the length of the lecture.
+    """
+
+    def __init__(self, path, window_seconds=30, sample_rate=SAMPLE_RATE, start_seconds=None, end_seconds=None):
+        self.path = str(path)
+        self.window_seconds = window_seconds
+        self.sample_rate = sample_rate
+        self.start_seconds = start_seconds
+        self.end_seconds = end_seconds
+        self.decoded_seconds = 0.0
+        self.decode_wait_seconds = 0.0
+        # ffmpeg runs at most a pipe buffer ahead of the reader, so the wait is the decode time
+        self.decode_seconds = 0.0
+
+    def _command(self):
+        command = [FFMPEG, "-nostdin", "-v", "error"]
+        if self.start_seconds:
+            command += ["-ss", str(self.start_seconds)]
+        command += ["-i", self.path]
+        if self.end_seconds is not None:
+            command += ["-t", str(self.end_seconds - (self.start_seconds or 0))]
+        return command + ["-vn", "-ac", "1", "-ar", str(self.sample_rate), "-f", "s16le", "-"]
+
+    def __iter__(self):
+        window_bytes = int(self.window_seconds * self.sample_rate) * BYTES_PER_SAMPLE
+        # ffmpeg's messages go to a temp file: a pipe nobody reads until the end
+        # could fill up on a damaged recording and stall the decode
+        errors = tempfile.TemporaryFile()
+        process = subprocess.Popen(self._command(), stdout=subprocess.PIPE, stderr=errors,
+                                   bufsize=window_bytes)
+        try:
+            while True:
+                start = time.perf_counter()
+                data = _read_exactly(process.stdout, window_bytes)
+                self.decode_wait_seconds += time.perf_counter() - start
+                self.decode_seconds = self.decode_wait_seconds
+                if not data:
+                    break
+                usable = len(data) - len(data) % BYTES_PER_SAMPLE
+                window = np.frombuffer(data[:usable], dtype=np.int16).astype(np.float32) / 32768.0
+                self.decoded_seconds += len(window) / self.sample_rate
+                yield window
+        finally:
+            process.stdout.close()
+            killed = process.poll() is None
+            if killed:
+                process.kill()
+            process.wait()
+            errors.seek(0)
+            error = errors.read().decode("utf-8", "replace").strip()
+            errors.close()
+            if not killed and process.returncode != 0:
+                raise RuntimeError(f"ffmpeg failed to decode {self.path} (exit code {process.returncode}): "
+                                   f"{error[-2000:]}")
+
+
+def _read_exactly(stream, size):
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        data = stream.read(remaining)
+        if not data:
+            break
+        chunks.append(data)
+        remaining -= len(data)
+    return b"".join(chunks)
+
+
+def speech_ratio(window, sample_rate=SAMPLE_RATE, frame_ms=30, threshold_db=-45.0):
+    """
+    Fraction of short frames in the window whose energy is above the speech threshold.
+    """
+    frame = int(sample_rate * frame_ms / 1000)
+    frames = len(window) // frame
+    if frames == 0:
+        return 0.0
+    energy = np.square(window[:frames * frame].reshape(frames, frame)).mean(axis=1)
+    level_db = 10 * np.log10(energy + 1e-12)
+    return float((level_db > threshold_db).mean())
+
+
+def is_speech(window, min_ratio=0.05, **kwargs):
+    """
+    Energy-based voice activity check used to skip silent windows before transcription.
+    """
+    return speech_ratio(window, **kwargs) >= min_ratio
@@ -0,0 +1,281 @@
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+HERE = Path(__file__).resolve().parent
+REPO_ROOT = HERE.parent.parent
+DATA_DIR = HERE / "benchmark_data"
+RESULTS_DIR = HERE / "benchmark_results"
+BASELINE_FILE = RESULTS_DIR / "baseline.json"
+PREVIOUS_FILE = RESULTS_DIR / "previous.json"
+LATEST_FILE = RESULTS_DIR / "latest.json"
+
+DEFAULT_LENGTHS = [1, 10, 60, 180]
+STAGES = ["decode", "transcribe", "translate", "pdf", "summary", "end_to_end"]
+WORDS_PER_MINUTE = 150
+
+# Checked-in or commonly used recordings, in order of preference
+SAMPLE_CANDIDATES = [
+    HERE / "small-eng.mp4",
+    HERE / "input" / "fgg.webm",
+    REPO_ROOT / "1. whiteboard" / "public" / "data" / "lec6" / "friends.mp3",
+    *sorted(Path(p) for p in glob.glob(str(REPO_ROOT / "1. whiteboard" / "public" / "data" / "recording_*.webm"))),
+]
+SAMPLE_TRANSCRIPT = REPO_ROOT / "FINAL" / "FINAL-english.txt"
+
+
+class FakeTranslateClient:
+    """
+    Local stand-in for translate.Client that echoes text back tagged with the language.
+    """
+
+    def __init__(self, seconds_per_kilochar=0.0):
+        self.seconds_per_kilochar = seconds_per_kilochar
+
+    def translate(self, values, target_language):
+        # Like the real client: a list of strings in, a list of results out
+        texts = [values] if isinstance(values, str) else list(values)
+        if self.seconds_per_kilochar:
+            time.sleep(sum(len(text) for text in texts) / 1000 * self.seconds_per_kilochar)
+        results = [{"translatedText": f"[{target_language}] {text}"} for text in texts]
+        return results[0] if isinstance(values, str) else results
+
+
+def find_sample(explicit=None):
+    if explicit:
+        return Path(explicit)
+    for candidate in SAMPLE_CANDIDATES:
+        if candidate.exists():
+            return candidate
+    raise FileNotFoundError("No sample recording found; pass --sample")
+
+
+def synthesize_audio(sample, minutes):
+    """
+    Loop the sample into a mono 16 kHz Opus WebM of exactly `minutes` minutes, cached on disk.
+    """
+    DATA_DIR.mkdir(exist_ok=True)
+    output = DATA_DIR / f"synthetic-{minutes}m.webm"
+    if not output.exists():
+        print(f"Generating {minutes} minute recording from {sample.name}...")
+        subprocess.run(
+            ["ffmpeg", "-v", "error", "-y", "-stream_loop", "-1", "-i", str(sample), "-t", str(minutes * 60),
+             "-vn", "-ac", "1", "-ar", "16000", "-c:a", "libopus", "-b:a", "32k", str(output)],
+            check=True,
+        )
+    return output
+
+
+def synthesize_transcript(minutes):
+    """
+    Repeat the sample transcript to roughly the length a lecture of `minutes` would produce.
+    """
+    words = SAMPLE_TRANSCRIPT.read_text(encoding="utf-8").split()
+    target = minutes * WORDS_PER_MINUTE
+    repeated = (words * (target // len(words) + 1))[:target]
+    return " ".join(repeated)
+
+
+def prepare_inputs(sample, minutes):
+    """
+    Build every stage's input outside the timed region.
+    """
+    workdir = DATA_DIR / f"{minutes}m"
+    workdir.mkdir(parents=True, exist_ok=True)
+    webm = synthesize_audio(sample, minutes)
+    mp3 = workdir / "converted_audio.mp3"
+    if not mp3.exists():
+        subprocess.run(["ffmpeg", "-v", "error", "-y", "-i", str(webm), str(mp3)], check=True)
+
+    transcript_file = workdir / "transcript.txt"
+    if not transcript_file.exists():
+        transcript_file.write_text(synthesize_transcript(minutes), encoding="utf-8")
+    return {"webm": str(webm), "mp3": str(mp3), "transcript": str(transcript_file), "minutes": minutes}
+
+
+def _output_bytes(path):
+    path = Path(path)
+    if path.is_file():
+        return path.stat().st_size
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def _peak_rss_bytes():
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+def run_stage(stage, inputs):
+    """
+    Run one stage in this process and return its measurements. Called in a
+    fresh subprocess per stage so peak memory is isolated.
+    """
+    import thread_budget
+
+    thread_budget.install()
+    import checkFolder
+
+    checkFolder.translate_client_factory = FakeTranslateClient
+    audio_seconds = inputs["minutes"] * 60
+    with open(inputs["transcript"], "r", encoding="utf-8") as f:
+        transcript = f.read()
+
+    outdir = Path(inputs["outdir"])
+    if outdir.exists():
+        shutil.rmtree(outdir)
+    outdir.mkdir(parents=True)
+    base = outdir / "bench"
+
+    if stage == "pdf":
+        for lang_name in list(checkFolder.languages.values()) + ["English"]:
+            checkFolder.save_to_file(f"{base}-{lang_name.lower()}.txt", transcript)
+
+    start = time.perf_counter()
+    if stage == "decode":
+        import pcm_cache
+        pcm_cache.decode(inputs["webm"])
+        work = audio_seconds
+    elif stage == "transcribe":
+        text = checkFolder.transcribe_long_audio(inputs["mp3"], chunk_length_seconds=30)
+        checkFolder.save_to_file(f"{base}-english.txt", text)
+        work = audio_seconds
+    elif stage == "translate":
+        translations = checkFolder.translate_transcript(transcript, checkFolder.languages.keys())
+        for lang_code, translation in translations.items():
+            checkFolder.save_to_file(f"{base}-{lang_code}.txt", translation)
+        work = len(transcript) * len(checkFolder.languages)
+    elif stage == "pdf":
+        checkFolder.txt_to_pdf(base, dict(checkFolder.languages))
+        work = len(transcript) * (len(checkFolder.languages) + 1)
+    elif stage == "summary":
+        checkFolder.generate_summary(transcript, f"{base}-summary.pdf")
+        work = len(transcript)
+    elif stage == "end_to_end":
+        checkFolder.process_recording(inputs["webm"], outdir)
+        work = audio_seconds
+    else:
+        raise ValueError(f"Unknown stage: {stage}")
+    wall = time.perf_counter() - start
+
+    unit = "audio_seconds" if stage in ("decode", "transcribe", "end_to_end") else "characters"
+    return {
+        "stage": stage,
+        "minutes": inputs["minutes"],
+        "wall_seconds": round(wall, 3),
+        "rtf": round(wall / audio_seconds, 5),
+        "throughput": round(work / wall, 3) if wall > 0 else None,
+        "throughput_unit": f"{unit}_per_second",
+        "peak_rss_bytes": _peak_rss_bytes(),
+        "output_bytes": _output_bytes(outdir),
+    }
+
+
+def stage_env(outdir, **overrides):
+    """
+    Environment for a stage subprocess. The PCM cache is off, so every run decodes
+    for real, and model speeds go to a file in the stage's (freshly emptied) output
+    folder: the production model_rtf.json is left alone and model choice starts
+    from the same defaults each run.
+    """
+    return dict(os.environ, SMARTREC_PCM_CACHE_ENABLED="0",
+                SMARTREC_MODEL_STATS=str(Path(outdir) / "model_rtf.json"), **overrides)
+
+
+def run_isolated(stage, inputs):
+    inputs = dict(inputs, outdir=str(DATA_DIR / f"{inputs['minutes']}m" / f"out-{stage}"))
+    completed = subprocess.run(
+        [sys.executable, str(Path(__file__).resolve()), "_stage", stage, json.dumps(inputs)],
+        cwd=str(HERE), env=stage_env(inputs["outdir"]), capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        print(completed.stderr)
+        raise RuntimeError(f"Stage {stage} failed for {inputs['minutes']} minutes")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def compare(previous, current, threshold):
+    """
+    Flag runs whose wall time or peak memory grew by more than `threshold` since the previous run.
+    """
+    regressions = []
+    for key, result in current["runs"].items():
+        before = previous.get("runs", {}).get(key)
+        if not before:
+            continue
+        for metric in ("wall_seconds", "peak_rss_bytes"):
+            old, new = before.get(metric), result.get(metric)
+            if old and new and new > old * (1 + threshold):
+                regressions.append(f"{key}: {metric} {old} -> {new} (+{100 * (new / old - 1):.1f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the lecture pipeline stages.")
+    parser.add_argument("--lengths", default=",".join(map(str, DEFAULT_LENGTHS)),
+                        help="Comma-separated synthetic recording lengths in minutes")
+    parser.add_argument("--stages", default=",".join(STAGES), help="Comma-separated stages to run")
+    parser.add_argument("--sample", help="Recording to loop into synthetic inputs")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown that counts as a regression")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Accept this run as the new baseline even if it has regressions")
+    args = parser.parse_args()
+
+    sample = find_sample(args.sample)
+    lengths = [int(length) for length in args.lengths.split(",") if length]
+    stages = [stage for stage in args.stages.split(",") if stage]
+
+    current = {"created_at": time.time(), "sample": str(sample), "python": sys.version.split()[0], "runs": {}}
+    for minutes in lengths:
+        inputs = prepare_inputs(sample, minutes)
+        for stage in stages:
+            result = run_isolated(stage, inputs)
+            current["runs"][f"{stage}@{minutes}m"] = result
+            print(f"{stage:>11} {minutes:>4}m  wall {result['wall_seconds']:>9.2f}s  RTF {result['rtf']:.4f}  "
+                  f"{result['throughput']} {result['throughput_unit']}  "
+                  f"peak {(result['peak_rss_bytes'] or 0) / 2**20:.0f} MiB  out {result['output_bytes']} B")
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    LATEST_FILE.write_text(json.dumps(current, indent=2), encoding="utf-8")
+    previous = {}
+    if BASELINE_FILE.exists():
+        previous = json.loads(BASELINE_FILE.read_text(encoding="utf-8"))
+
+    regressions = compare(previous, current, args.threshold)
+    if regressions:
+        print("Regressions against the baseline:")
+        for line in regressions:
+            print(f"  {line}")
+    if regressions and not args.update_baseline:
+        # The baseline stays as it was, so the next run is still compared against it
+        print(f"Baseline left unchanged; this run is in {LATEST_FILE} (use --update-baseline to accept it)")
+        sys.exit(1)
+
+    if BASELINE_FILE.exists():
+        shutil.copyfile(BASELINE_FILE, PREVIOUS_FILE)
+    # Stages and lengths this run skipped keep their earlier baseline
+    baseline = dict(current, runs=dict(previous.get("runs", {}), **current["runs"]))
+    BASELINE_FILE.write_text(json.dumps(baseline, indent=2), encoding="utf-8")
+    if regressions:
+        print(f"Baseline updated with the regressions accepted. Results saved to {BASELINE_FILE}")
+    else:
+        print(f"No regressions. Results saved to {BASELINE_FILE}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "_stage":
+        result = run_stage(sys.argv[2], json.loads(sys.argv[3]))
+        print(json.dumps(result))
+    else:
+        main()
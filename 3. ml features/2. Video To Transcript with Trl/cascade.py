@@ -0,0 +1,152 @@
+import argparse
+import difflib
+import time
+
+import audio_stream
+
+# Whisper's own fallback thresholds for a decode it does not trust
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+COMPRESSION_RATIO_THRESHOLD = 2.4
+# Audio context added around an escalated span, and the gap below which spans are merged
+SPAN_PADDING_SECONDS = 0.1
+MERGE_GAP_SECONDS = 0.5
+
+
+def needs_escalation(segment, logprob_threshold=LOGPROB_THRESHOLD, no_speech_threshold=NO_SPEECH_THRESHOLD):
+    """
+    True when the fast model's segment looks unreliable: low average log-probability,
+    repetitive output, or text produced where it thought there was no speech.
+    """
+    if segment["avg_logprob"] < logprob_threshold:
+        return True
+    if segment.get("compression_ratio", 0.0) > COMPRESSION_RATIO_THRESHOLD:
+        return True
+    return segment["no_speech_prob"] > no_speech_threshold and bool(segment["text"].strip())
+
+
+def _escalation_spans(segments, flagged):
+    """
+    Group runs of flagged segments into (first_index, last_index, start, end) spans.
+    """
+    spans = []
+    for i, segment in enumerate(segments):
+        if not flagged[i]:
+            continue
+        if spans and spans[-1][1] == i - 1 and segment["start"] - spans[-1][3] <= MERGE_GAP_SECONDS:
+            first, _, start, _ = spans[-1]
+            spans[-1] = (first, i, start, segment["end"])
+        else:
+            spans.append((i, i, segment["start"], segment["end"]))
+    return spans
+
+
+def transcribe_window(window, fast_model, large_model, sample_rate=audio_stream.SAMPLE_RATE, **thresholds):
+    """
+    Transcribe one PCM window with the fast model, re-decode its low-confidence
+    segments with the large model and splice them back in by timestamp.
+
+    Returns the text and the number of audio seconds that were escalated.
+    """
+    result = fast_model.transcribe(window)
+    segments = result.get("segments") or []
+    flagged = [needs_escalation(segment, **thresholds) for segment in segments]
+    spans = _escalation_spans(segments, flagged)
+    if not spans:
+        return result["text"].strip(), 0.0
+
+    replacements = {}
+    escalated = 0.0
+    for first, last, start, end in spans:
+        lo = max(0, int((start - SPAN_PADDING_SECONDS) * sample_rate))
+        hi = min(len(window), int((end + SPAN_PADDING_SECONDS) * sample_rate))
+        if hi <= lo:
+            continue
+        replacements[first] = (last, large_model.transcribe(window[lo:hi])["text"].strip())
+        escalated += (hi - lo) / sample_rate
+
+    pieces = []
+    i = 0
+    while i < len(segments):
+        if i in replacements:
+            last, text = replacements[i]
+            pieces.append(text)
+            i = last + 1
+        else:
+            pieces.append(segments[i]["text"].strip())
+            i += 1
+    return " ".join(piece for piece in pieces if piece), escalated
+
+
+def _edit_distance(ref, hyp):
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1]
+
+
+def word_error_rate(reference, hypothesis, max_gap_cells=250000):
+    """
+    Word-level edit distance divided by the reference length.
+
+    A full Levenshtein table over two lecture-length transcripts is too slow in
+    Python, so the transcripts are first aligned on their matching runs of
+    words (difflib) and the exact distance is only computed for the differing
+    stretches between them; a stretch too large for that counts as fully wrong
+    (the longer side's word count). For transcripts of the same audio the
+    result is the exact WER or very close to it, never below it.
+    """
+    ref = reference.lower().split()
+    hyp = hypothesis.lower().split()
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    errors = 0
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, ref, hyp, autojunk=False).get_opcodes():
+        if tag == "equal":
+            continue
+        if tag == "replace" and (i2 - i1) * (j2 - j1) <= max_gap_cells:
+            errors += _edit_distance(ref[i1:i2], hyp[j1:j2])
+        else:
+            errors += max(i2 - i1, j2 - j1)
+    return errors / len(ref)
+
+
+def compare(file_path, fast="base", large="medium", window_seconds=30):
+    """
+    Transcribe a recording fast-only, cascaded and large-only, and report wall
+    time, escalated fraction and WER of each against the large-only transcript.
+    """
+    import checkFolder
+
+    runs = {}
+    for label, model_name, cascade_model in (("large-only", large, None),
+                                             ("fast-only", fast, None),
+                                             ("cascade", fast, large)):
+        checkFolder.load_whisper_model(model_name)
+        if cascade_model:
+            checkFolder.load_whisper_model(cascade_model)
+        start = time.perf_counter()
+        text, stats = checkFolder.transcribe_long_audio(file_path, chunk_length_seconds=window_seconds,
+                                                        model_name=model_name, cascade_model=cascade_model,
+                                                        return_stats=True)
+        runs[label] = {"text": text, "wall_seconds": time.perf_counter() - start, **stats}
+
+    reference = runs["large-only"]["text"]
+    print(f"{'run':>10} {'wall s':>9} {'escalated':>10} {'WER vs large':>13}")
+    for label, run in runs.items():
+        fraction = run["escalated_seconds"] / run["audio_seconds"] if run["audio_seconds"] else 0.0
+        print(f"{label:>10} {run['wall_seconds']:9.1f} {100 * fraction:9.1f}% "
+              f"{100 * word_error_rate(reference, run['text']):12.2f}%")
+    return runs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare cascade transcription with large-only and fast-only runs.")
+    parser.add_argument("recording")
+    parser.add_argument("--fast", default="base")
+    parser.add_argument("--large", default="medium")
+    args = parser.parse_args()
+    compare(args.recording, fast=args.fast, large=args.large)
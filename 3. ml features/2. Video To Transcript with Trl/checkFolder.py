@@ -1,85 +1,245 @@
-import whisper
-from pydub import AudioSegment
-from pydub.utils import make_chunks
-from google.cloud import translate_v2 as translate
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfbase import pdfmetrics
+# Heavy libraries (whisper/torch, transformers, the Google client, reportlab
+# and the numpy-based audio modules) are imported inside the stage that needs
+# them, so a scan that finds nothing new or a PDF-only job starts instantly.
+# See import_profile.py for the import-time report.
+import contextlib
+import json
+import math
 import os
+import re
+import sys
+import time
+from collections import OrderedDict
 from pathlib import Path
+import lecture_bundle
+import metrics
+import model_selection
+import progress
+import thread_budget
 
 # Directories
-input_dir = r"C:\Users\CoE\Desktop\Final Smartboard\Ai-Board-YIC\1. whiteboard\src\recordings"  # Directory containing input files
-output_dir = r"C:\Users\CoE\Desktop\Final Smartboard\Ai-Board-YIC\2. classroom\public\data\smartrec"  # Directory to check/create output folders
-
-def convert_webm_to_mp3(webm_path, mp3_path):
+input_dir = os.environ.get("SMARTREC_INPUT_DIR", r"C:\Users\CoE\Desktop\Final Smartboard\Ai-Board-YIC\1. whiteboard\src\recordings")  # Directory containing input files
+output_dir = os.environ.get("SMARTREC_OUTPUT_DIR", r"C:\Users\CoE\Desktop\Final Smartboard\Ai-Board-YIC\2. classroom\public\data\smartrec")  # Directory to check/create output folders
+fonts_folder = os.environ.get("SMARTREC_FONTS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts"))
+credentials_path = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS", r"C:\Users\CoE\Desktop\Final Smartboard\Ai-Board-YIC\3. ml features\2. Video To Transcript with Trl\amir-translate.json")
+
+languages = {
+    "hi": "Hindi",
+    "mr": "Marathi",
+    "gu": "Gujarati",
+    "bn": "Bengali",
+    "te": "Telugu",
+    "ta": "Tamil",
+    "ur": "Urdu",
+    "kn": "Kannada",
+    "ml": "Malayalam",
+    "pa": "Punjabi",
+    "es": "Spanish",
+    "fr": "French",
+    "de": "German",
+    "it": "Italian",
+    "ja": "Japanese",
+    "zh-cn": "Chinese (Simplified)",
+    "ar": "Arabic",
+}
+
+def google_translate_client():
+    from google.cloud import translate_v2 as translate
+    return translate.Client()
+
+# "files" leaves a folder of loose .txt/.pdf files per lecture; "bundle" packs
+# it into a single indexed <lecture>.smartrec file (see lecture_bundle.py)
+output_format = os.environ.get("SMARTREC_OUTPUT_FORMAT", "files")
+
+# "eager" translates and renders every language while processing; "lazy" only
+# produces English and leaves the rest to be made on first request (see lazy_translation.py)
+translation_mode = os.environ.get("SMARTREC_TRANSLATION_MODE", "eager")
+
+# "final" summarizes the finished transcript; "progressive" keeps rolling partial
+# summaries while transcription runs and only merges them at the end (see progressive_summary.py)
+summary_mode = os.environ.get("SMARTREC_SUMMARY_MODE", "final")
+
+# Swapped for a local fake by benchmark.py so runs never hit the real API
+translate_client_factory = google_translate_client
+
+# Called between pipeline stages; the job server uses it to run more urgent
+# jobs before continuing with the current one
+stage_boundary_hook = None
+
+def stage_boundary(next_stage):
+    if stage_boundary_hook is not None:
+        stage_boundary_hook(next_stage)
+
+# Whisper models stay loaded for the life of the process so a resident
+# worker (see job_server.py) only pays the load once. Pinned models (the ones
+# a server or worker pool preloads) are always kept; of the others only the
+# WHISPER_CACHE_SIZE most recently used stay loaded.
+WHISPER_CACHE_SIZE = int(os.environ.get("SMARTREC_WHISPER_CACHE_SIZE", "2"))
+_whisper_models = OrderedDict()
+_pinned_whisper_models = set()
+
+def load_whisper_model(model_name="base", pin=False):
+    """
+    Load a Whisper model once and reuse it on later calls.
     """
-    Convert a WEBM file to MP3 format.
+    if pin:
+        _pinned_whisper_models.add(model_name)
+    if model_name in _whisper_models:
+        _whisper_models.move_to_end(model_name)
+        return _whisper_models[model_name]
+    import whisper
+    model = whisper.load_model(model_name)
+    _whisper_models[model_name] = model
+    unpinned = [name for name in _whisper_models if name not in _pinned_whisper_models]
+    evicted = unpinned[:max(0, len(unpinned) - WHISPER_CACHE_SIZE)]
+    for name in evicted:
+        del _whisper_models[name]
+        print(f"Unloaded Whisper '{name}' (least recently used)")
+    if evicted:
+        import gc
+        gc.collect()
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    return model
+
+def recording_duration(file_path):
     """
-    print(f"Converting {webm_path} to {mp3_path}...")
-    audio = AudioSegment.from_file(webm_path, format="webm")
-    audio.export(mp3_path, format="mp3")
-    print("Conversion complete.")
+    Length of a recording in seconds from the PCM cache, the cluster index or the container header.
 
-def transcribe_long_audio(file_path, chunk_length_seconds=30):
+    A WebM's index is built here if need be: fresh MediaRecorder uploads carry no
+    duration in their header, and shortest-job-first needs their length at submit time.
+    Processing reuses the saved index.
     """
-    Transcribe long audio files by splitting them into smaller chunks.
+    import audio_stream
+    import pcm_cache
+    import webm_index
+    is_webm = str(file_path).lower().endswith(".webm")
+    return (pcm_cache.cached_duration(file_path) or webm_index.indexed_duration(file_path, build=is_webm)
+            or audio_stream.probe_duration(file_path))
+
+@metrics.timed("transcribe")
+def transcribe_long_audio(file_path, chunk_length_seconds=30, model_name="base", cascade_model=None,
+                          return_stats=False, on_text=None):
     """
-    model = whisper.load_model("base")
-    audio = AudioSegment.from_file(file_path)
-    chunk_length_ms = chunk_length_seconds * 1000
-    chunks = make_chunks(audio, chunk_length_ms)
-
-    chunk_dir = "audio_chunks"
-    os.makedirs(chunk_dir, exist_ok=True)
+    Transcribe long audio files by streaming fixed-size PCM windows from the decoder.
 
+    With a `cascade_model`, each window is transcribed by `model_name` first and only
+    its low-confidence segments are re-decoded by the larger cascade model.
+    `on_text` is called with each window's text as soon as it is transcribed.
+    """
+    import audio_stream
+    import cascade
+    import pcm_cache
+    model = load_whisper_model(model_name)
+    large_model = load_whisper_model(cascade_model) if cascade_model else None
+    start = time.perf_counter()
+    stream = pcm_cache.windows(file_path, window_seconds=chunk_length_seconds)
+    duration = recording_duration(file_path)
+    chunks = math.ceil(duration / chunk_length_seconds) if duration else None
+
+    stage = progress.StageProgress("transcribe", total=round(duration, 3) if duration else None, unit="seconds")
     transcripts = []
-    for i, chunk in enumerate(chunks):
-        chunk_name = os.path.join(chunk_dir, f"chunk_{i}.mp3")
-        chunk.export(chunk_name, format="mp3")
-        print(f"Transcribing chunk {i+1}/{len(chunks)}: {chunk_name}")
-        result = model.transcribe(chunk_name)
-        transcripts.append(result["text"])
+    skipped = 0
+    escalated = 0.0
+    for i, window in enumerate(stream):
+        thread_budget.refresh()
+        if not audio_stream.is_speech(window):
+            print(f"Skipping silent chunk {i+1}/{chunks or '?'}")
+            skipped += 1
+        else:
+            print(f"Transcribing chunk {i+1}/{chunks or '?'}")
+            if large_model is not None:
+                text, window_escalated = cascade.transcribe_window(window, model, large_model)
+                escalated += window_escalated
+            else:
+                text = model.transcribe(window)["text"]
+            transcripts.append(text)
+            if on_text is not None:
+                on_text(text)
+        stage.update(round(stream.decoded_seconds, 3), chunk=i + 1, chunks=chunks)
+    stage.done(skipped_chunks=skipped, escalated_seconds=round(escalated, 3))
+    # Decoding overlaps transcription, so it is recorded as units of this stage rather than as its own
+    metrics.add_units(audio_seconds=stream.decoded_seconds, decode_seconds=stream.decode_seconds,
+                      decode_wait_seconds=stream.decode_wait_seconds, escalated_seconds=escalated)
+    if large_model is None:
+        model_selection.record_rtf(model_name, stream.decoded_seconds, time.perf_counter() - start)
+    elif stream.decoded_seconds:
+        print(f"Escalated {escalated:.1f}s of {stream.decoded_seconds:.1f}s "
+              f"({100 * escalated / stream.decoded_seconds:.1f}%) to Whisper '{cascade_model}'")
 
     full_transcript = " ".join(transcripts)
-    for chunk_file in os.listdir(chunk_dir):
-        os.remove(os.path.join(chunk_dir, chunk_file))
-    os.rmdir(chunk_dir)
-
+    if return_stats:
+        return full_transcript, {"audio_seconds": stream.decoded_seconds, "escalated_seconds": escalated,
+                                 "skipped_chunks": skipped}
     return full_transcript
 
-def translate_transcript(transcript, languages):
+def split_sentences(text):
+    """
+    Split a transcript into sentences at ., ! or ? followed by whitespace.
+    """
+    return [sentence for sentence in re.split(r"(?<=[.!?])\s+", text.strip()) if sentence]
+
+def translate_sentences(client, sentences, target_language, batch_size=100):
+    """
+    Translate a list of sentences, several per API request.
+    """
+    translated = []
+    for start in range(0, len(sentences), batch_size):
+        results = client.translate(sentences[start:start + batch_size], target_language=target_language)
+        translated.extend(result['translatedText'] for result in results)
+    return translated
+
+@metrics.timed("translate")
+def translate_transcript(transcript, languages, client=None, sentence_map=None):
     """
     Translate the transcript into the specified languages using Google Cloud Translation API.
+
+    The text is translated sentence by sentence; pass a dict as `sentence_map` to
+    get each language's translated sentences back for incremental updates (see retranslate.py).
     """
     # Initialize the Google Cloud Translation API client
-    client = translate.Client()
+    if client is None:
+        client = translate_client_factory()
 
+    languages = list(languages)
+    sentences = split_sentences(transcript)
+    stage = progress.StageProgress("translate", total=len(languages), unit="languages")
     translations = {}
-    for language in languages:
+    for i, language in enumerate(languages):
         try:
             print(f"Translating into {language}...")
-            result = client.translate(transcript, target_language=language)
-            translations[language] = result['translatedText']
+            translated = translate_sentences(client, sentences, language)
+            translations[language] = " ".join(translated)
+            if sentence_map is not None:
+                sentence_map[language] = translated
+            metrics.add_units(characters=len(transcript))
         except Exception as e:
             print(f"Error translating to {language}: {e}")
+        stage.update(i + 1, language=language, characters=len(transcript))
+    stage.done()
     return translations
 
 def save_to_file(filename, content):
     """
-    Save the given content to a text file.
+    Save the given content to a text file. The file only appears once it is
+    complete, so an interrupted run never leaves a truncated transcript behind.
     """
-    with open(filename, "w", encoding="utf-8") as file:
+    temp_path = f"{filename}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
         file.write(content)
+    os.replace(temp_path, filename)
     print(f"Saved to {filename}")
 
-def txt_to_pdf(input_common_name, languages):
+@metrics.timed("pdf")
+def txt_to_pdf(input_common_name, languages, include_english=True):
     """
-    Convert text files into PDFs using appropriate fonts for each language, including English.
+    Convert text files into PDFs using appropriate fonts for each language, including English unless told otherwise.
     """
-    fonts_folder = r"C:\Users\CoE\Desktop\Final Smartboard\Ai-Board-YIC\3. ml features\2. Video To Transcript with Trl\fonts"
-
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
     language_fonts = {
         'english': "NotoSans-Regular.ttf",
         'hindi': "NotoSansDevanagari-Regular.ttf",
@@ -101,9 +261,11 @@ def txt_to_pdf(input_common_name, languages):
         'arabic': "NotoSansArabic-Regular.ttf"
     }
 
-    languages['en'] = 'English'
+    if include_english:
+        languages['en'] = 'English'
 
-    for lang_code, lang_name in languages.items():
+    stage = progress.StageProgress("pdf", total=len(languages), unit="languages")
+    for index, (lang_code, lang_name) in enumerate(languages.items(), start=1):
         txt_file_name = f"{input_common_name}-{lang_name.lower()}.txt"
 
         if not os.path.exists(txt_file_name):
@@ -159,8 +321,57 @@ def txt_to_pdf(input_common_name, languages):
                     pdf.setFont(font_name, font_size)
                     y_position = page_height - margin
 
+        pages = pdf.getPageNumber()
         pdf.save()
+        metrics.add_units(pages=pages, bytes=os.path.getsize(output_pdf_file))
         print(f"PDF created successfully: {output_pdf_file}")
+        stage.update(index, language=lang_name.lower())
+    stage.done()
+
+_summarizers = {}
+
+def load_summarizer(model_name="default"):
+    """
+    Load the summarization pipeline once and reuse it on later calls.
+    """
+    if model_name not in _summarizers:
+        from transformers import pipeline  # Using Hugging Face's summarization pipeline
+        options = {} if model_name == "default" else {"model": model_name}
+        _summarizers[model_name] = pipeline("summarization", **options)
+    return _summarizers[model_name]
+
+@metrics.timed("summary")
+def generate_summary(transcript, output_pdf_path):
+    """
+    Generate a summary of the English transcript and save it as a PDF file.
+    """
+    print("Generating summary...")
+    summarizer = load_summarizer()
+    summary = summarizer(transcript, max_length=150, min_length=50, do_sample=False, truncation=True)[0]['summary_text']
+    metrics.add_units(characters=len(transcript))
+    write_summary_pdf(summary, output_pdf_path)
+
+def write_summary_pdf(summary, output_pdf_path):
+    """
+    Lay out a summary one sentence per line in a PDF.
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    pdf = canvas.Canvas(str(output_pdf_path), pagesize=A4)
+    pdf.setFont("Helvetica", 12)
+    pdf.drawString(50, 800, "Summary of Transcript")
+
+    y_position = 780
+    for line in summary.split('. '):
+        if y_position < 50:
+            pdf.showPage()
+            pdf.setFont("Helvetica", 12)
+            y_position = 800
+        pdf.drawString(50, y_position, line.strip())
+        y_position -= 20
+
+    pdf.save()
+    print(f"Summary PDF created successfully: {output_pdf_path}")
 
 def create_output_folder(input_file, output_dir):
     """
@@ -171,56 +382,214 @@ def create_output_folder(input_file, output_dir):
     output_folder.mkdir(parents=True, exist_ok=True)
     return output_folder
 
-if __name__ == "__main__":
-    # Set the path to your Google Cloud API key file
-    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = r"C:\Users\CoE\Desktop\Final Smartboard\Ai-Board-YIC\3. ml features\2. Video To Transcript with Trl\amir-translate.json"  # <-- Update this path
+def completion_marker(output_folder, base_filename):
+    return Path(output_folder) / f"{base_filename}-complete.json"
+
+def is_processed(input_file, output_dir):
+    """
+    Check whether a recording went through every stage: its folder has the
+    completion marker, or it has been packed into a bundle (done after the marker).
+    """
+    base_filename = Path(input_file).stem
+    if lecture_bundle.bundle_path(output_dir, base_filename).exists():
+        return True
+    return completion_marker(Path(output_dir) / base_filename, base_filename).exists()
 
-    # Process each file in the input directory
+def process_recording(input_file, output_dir, profile=None, model=None, backlog_seconds=0.0, slo_minutes=None,
+                      cascade_model=None):
+    """
+    Run the full pipeline for one recording: decode, transcribe, summarize, translate and render PDFs.
+
+    With profile="sample" or "deterministic" each stage is profiled into a "profile" subfolder.
+    Unless a Whisper `model` is given, the largest one that meets the turnaround
+    target for this recording plus `backlog_seconds` of queued audio is used.
+    A `cascade_model` re-decodes that model's low-confidence segments.
+    In lazy translation mode only the English transcript, summary and PDF are made here.
+    A run that was interrupted resumes from the first missing artifact: an
+    existing transcript, summary or translation is reused instead of made again.
+    """
+    file_name = os.path.basename(input_file)
+    base_filename = os.path.splitext(file_name)[0]
+    progress.set_context(file=file_name)
+    output_folder = create_output_folder(input_file, output_dir)
+    eng_file = output_folder / f"{base_filename}-english.txt"
+
+    with metrics.RecordingTimings(output_folder), _profiler(output_folder, profile):
+        summary_pdf_path = output_folder / f"{base_filename}-summary.pdf"
+        rolling = None
+        if eng_file.exists():
+            print(f"Resuming {file_name} from its saved transcript")
+            with open(eng_file, "r", encoding="utf-8") as f:
+                transcript = f.read()
+        else:
+            # Index the clusters once so the audio can be decoded as parallel time ranges
+            import webm_index
+            try:
+                webm_index.load_index(input_file)
+            except ValueError as e:
+                print(f"Could not index {file_name}: {e}")
+
+            if model:
+                choice = {"model": model, "selected_by": "request"}
+            else:
+                choice = model_selection.choose_model(recording_duration(input_file), backlog_seconds,
+                                                      model_selection.remaining_budget(input_file, slo_minutes))
+                choice["selected_by"] = "slo"
+            progress.emit("model", model=choice["model"], selected_by=choice["selected_by"])
+
+            if summary_mode == "progressive" and not summary_pdf_path.exists():
+                import progressive_summary
+                rolling = progressive_summary.RollingSummarizer(output_folder, base_filename)
+
+            # The recording is decoded as a stream straight into transcription; no MP3 copy is made
+            choice["cascade_model"] = cascade_model
+            try:
+                transcript = transcribe_long_audio(input_file, chunk_length_seconds=30, model_name=choice["model"],
+                                                   cascade_model=cascade_model,
+                                                   on_text=rolling.add if rolling is not None else None)
+            except BaseException:
+                if rolling is not None:
+                    rolling.close()
+                raise
+            model_selection.save_choice(output_folder, choice)
+            save_to_file(eng_file, transcript)
+
+        stage_boundary("summary")
+        if rolling is not None:
+            rolling.finish(summary_pdf_path, transcript)
+        elif not summary_pdf_path.exists():
+            generate_summary(transcript, summary_pdf_path)
+
+        if translation_mode == "lazy":
+            import lazy_translation
+            lazy_translation.register_lecture(output_dir, base_filename, len(transcript))
+            rendered_languages = {}
+        else:
+            stage_boundary("translate")
+            import retranslate
+            english_sentences = split_sentences(transcript)
+            stored = retranslate.load_map(output_folder, base_filename)
+            sentence_map = stored["translations"] if stored and stored["english"] == english_sentences else {}
+            missing = [code for code, name in languages.items()
+                       if not (output_folder / f"{base_filename}-{name.lower()}.txt").exists()]
+            translations = translate_transcript(transcript, missing, sentence_map=sentence_map) if missing else {}
+
+            for lang_code, translation in translations.items():
+                lang_name = languages[lang_code].lower()
+                translation_file = output_folder / f"{base_filename}-{lang_name}.txt"
+                save_to_file(translation_file, translation)
+            # Kept so a corrected transcript only needs its changed sentences re-translated
+            retranslate.save_map(output_folder, base_filename, english_sentences, sentence_map)
+            rendered_languages = dict(languages)
+
+        stage_boundary("pdf")
+        txt_to_pdf(output_folder / base_filename, rendered_languages)
+
+    # Written last (after the timings), so only a recording that went through every stage counts as processed
+    with open(completion_marker(output_folder, base_filename), "w", encoding="utf-8") as f:
+        json.dump({"completed_at": time.time(), "translation_mode": translation_mode}, f)
+
+    if output_format == "bundle":
+        # Packed after the timings are written so they end up in the bundle too
+        output_folder = lecture_bundle.pack(output_folder, remove=True)
+
+    print(f"All outputs for {file_name} saved in: {output_folder}")
+    progress.emit("complete", output_folder=str(output_folder))
+    return output_folder
+
+def regenerate_pdfs(output_dir, names=None):
+    """
+    Re-render the PDFs of already processed recordings from their text files,
+    without decoding, transcribing or translating anything. Bundles are
+    unpacked for the render and packed again.
+    """
+    rendered = []
+    for path in sorted(Path(output_dir).iterdir()):
+        bundled = path.name.endswith(lecture_bundle.BUNDLE_SUFFIX)
+        name = path.name[:-len(lecture_bundle.BUNDLE_SUFFIX)] if bundled else path.name
+        if names and name not in names:
+            continue
+        if not (bundled or (path.is_dir() and (path / f"{name}-english.txt").exists())):
+            continue
+        progress.set_context(file=name)
+        with lecture_bundle.lecture_lock(lecture_bundle.bundle_path(output_dir, name)):
+            folder = lecture_bundle.unpack(path) if bundled else path
+            try:
+                txt_to_pdf(folder / name, dict(languages))
+            finally:
+                if bundled:
+                    lecture_bundle.pack(folder, path, remove=True)
+        rendered.append(str(path))
+    return rendered
+
+def _profiler(output_folder, profile):
+    if not profile:
+        return contextlib.nullcontext()
+    import profiling
+    return profiling.StageProfiler(output_folder / "profile", mode=profile)
+
+def find_new_recordings(input_dir, output_dir):
+    """
+    List the .webm recordings in the input directory that have not been processed yet.
+    """
+    import webm_index
+    recordings = []
     for file_name in os.listdir(input_dir):
         input_file = os.path.join(input_dir, file_name)
+        if file_name.endswith(webm_index.INDEX_SUFFIX):
+            continue
         if not input_file.lower().endswith(".webm"):
             print(f"Skipping unsupported file: {file_name}")
             continue
+        if is_processed(input_file, output_dir):
+            print(f"Skipping already processed file: {file_name}")
+            continue
+        recordings.append(input_file)
+    return recordings
 
-        base_filename = os.path.splitext(os.path.basename(input_file))[0]
-        output_folder = create_output_folder(input_file, output_dir)
-        mp3_file = output_folder / "converted_audio.mp3"
-        eng_file = output_folder / f"{base_filename}-english.txt"
-
-        convert_webm_to_mp3(input_file, mp3_file)
-        transcript = transcribe_long_audio(mp3_file, chunk_length_seconds=30)
-        save_to_file(eng_file, transcript)
-
-        languages = {
-            "hi": "Hindi",
-            "mr": "Marathi",
-            "gu": "Gujarati",
-            "bn": "Bengali",
-            "te": "Telugu",
-            "ta": "Tamil",
-            "ur": "Urdu",
-            "kn": "Kannada",
-            "ml": "Malayalam",
-            "pa": "Punjabi",
-            "es": "Spanish",
-            "fr": "French",
-            "de": "German",
-            "it": "Italian",
-            "ja": "Japanese",
-            "zh-cn": "Chinese (Simplified)",
-            "ar": "Arabic",
-        }
-
-        translations = translate_transcript(transcript, languages.keys())
-
-        for lang_code, translation in translations.items():
-            lang_name = languages[lang_code].lower()
-            translation_file = output_folder / f"{base_filename}-{lang_name}.txt"
-            save_to_file(translation_file, translation)
-
-        txt_to_pdf(output_folder / base_filename, languages)
-
-        if mp3_file.exists():
-            mp3_file.unlink()
-
-        print(f"All outputs for {file_name} saved in folder: {output_folder}")
\ No newline at end of file
+def scan_recordings(input_dir, output_dir, profile=None, model=None, backlog_seconds=0.0, slo_minutes=None,
+                    cascade_model=None):
+    """
+    Process every new recording in the input directory.
+
+    The recordings still waiting in this scan count towards the backlog that model selection sees.
+    """
+    recordings = find_new_recordings(input_dir, output_dir)
+    durations = [0.0 if model else recording_duration(input_file) or 0.0 for input_file in recordings]
+    processed = []
+    for i, input_file in enumerate(recordings):
+        waiting = backlog_seconds + sum(durations[i + 1:])
+        processed.append(str(process_recording(input_file, output_dir, profile=profile, model=model,
+                                               backlog_seconds=waiting, slo_minutes=slo_minutes,
+                                               cascade_model=cascade_model)))
+    return processed
+
+if __name__ == "__main__":
+    # Set the path to your Google Cloud API key file
+    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = credentials_path  # <-- Update this path
+
+    # Optionally stream structured progress events as JSON lines on stderr
+    if "--progress-json" in sys.argv:
+        progress.add_listener(progress.json_lines_listener(sys.stderr))
+
+    # --profile samples each stage; --profile=deterministic uses cProfile instead
+    profile = None
+    for arg in sys.argv[1:]:
+        if arg == "--profile":
+            profile = "sample"
+        elif arg.startswith("--profile="):
+            profile = arg.split("=", 1)[1]
+
+    if "--bundle" in sys.argv:
+        output_format = "bundle"
+    if "--lazy-translation" in sys.argv:
+        translation_mode = "lazy"
+    if "--progressive-summary" in sys.argv:
+        summary_mode = "progressive"
+
+    if "--pdf-only" in sys.argv:
+        # Only re-render PDFs from existing transcripts and translations
+        regenerate_pdfs(output_dir)
+    else:
+        # Process each new file in the input directory
+        scan_recordings(input_dir, output_dir, profile=profile)
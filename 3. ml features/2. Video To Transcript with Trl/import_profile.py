@@ -0,0 +1,121 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ENTRY_POINTS = ["checkFolder", "job_server", "worker", "watcher"]
+HEAVY_MODULES = ["torch", "whisper", "transformers", "numpy", "reportlab", "google.cloud", "spacy"]
+TOP_N = 15
+
+# Run inside the child: execute a command, then report which heavy modules ended up imported
+_CHILD = """
+import json, runpy, sys, time
+start = time.perf_counter()
+sys.argv = {argv!r}
+try:
+    runpy.run_path({script!r}, run_name="__main__")
+finally:
+    heavy = sorted(name for name in {heavy!r} if name in sys.modules)
+    print("IMPORT_PROFILE " + json.dumps({{"seconds": time.perf_counter() - start, "heavy": heavy}}), file=sys.stderr)
+"""
+
+
+def parse_importtime(stderr):
+    """
+    Parse `python -X importtime` output into (module, self_us, cumulative_us) rows.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def profile_import(module):
+    """
+    Import one module in a fresh interpreter and report its slowest imports.
+    """
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                               cwd=HERE, capture_output=True, text=True)
+    rows = parse_importtime(completed.stderr)
+    total = next((cumulative for name, _, cumulative in rows if name == module), None)
+    top_level = {name for name, _, _ in rows if not name.startswith(" ")}
+    heavy = [name for name in HEAVY_MODULES if name in top_level]
+    return {"module": module, "ok": completed.returncode == 0, "seconds": (total or 0) / 1e6,
+            "heavy": heavy, "rows": rows, "error": completed.stderr.strip().splitlines()[-1:] if completed.returncode else []}
+
+
+def run_command(argv, env=None):
+    """
+    Run checkFolder.py with `argv` in a fresh interpreter; return wall time and heavy modules imported.
+    """
+    script = os.path.join(HERE, "checkFolder.py")
+    code = _CHILD.format(argv=[script] + argv, script=script, heavy=HEAVY_MODULES)
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-c", code], cwd=HERE, capture_output=True, text=True,
+                               env=dict(os.environ, **(env or {})))
+    wall = time.perf_counter() - start
+    report = {"wall_seconds": wall, "returncode": completed.returncode, "heavy": None}
+    for line in completed.stderr.splitlines():
+        if line.startswith("IMPORT_PROFILE "):
+            report.update(json.loads(line[len("IMPORT_PROFILE "):]))
+    if completed.returncode:
+        report["error"] = completed.stderr.strip().splitlines()[-1:]
+    return report
+
+
+def check_noop_scan():
+    """
+    A scan of an empty input directory must finish well under a second and import nothing heavy.
+    """
+    with tempfile.TemporaryDirectory() as input_dir, tempfile.TemporaryDirectory() as output_dir:
+        return run_command([], env={"SMARTREC_INPUT_DIR": input_dir, "SMARTREC_OUTPUT_DIR": output_dir})
+
+
+def check_pdf_only(output_dir):
+    """
+    Re-rendering PDFs must never import torch.
+    """
+    return run_command(["--pdf-only"], env={"SMARTREC_OUTPUT_DIR": output_dir})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report import time of the pipeline entry points.")
+    parser.add_argument("modules", nargs="*", default=ENTRY_POINTS)
+    parser.add_argument("--top", type=int, default=TOP_N)
+    parser.add_argument("--pdf-output-dir", help="Also time a PDF-only run against this output directory")
+    args = parser.parse_args()
+
+    for module in args.modules:
+        report = profile_import(module)
+        status = "" if report["ok"] else f"  FAILED: {' '.join(report['error'])}"
+        print(f"\nimport {module}: {report['seconds'] * 1000:.0f} ms, "
+              f"heavy modules: {', '.join(report['heavy']) or 'none'}{status}")
+        for name, self_us, cumulative_us in sorted(report["rows"], key=lambda row: -row[2])[:args.top]:
+            print(f"  {cumulative_us / 1000:9.1f} ms cumulative {self_us / 1000:8.1f} ms self  {name}")
+
+    checks = [("no-op scan", check_noop_scan(), 1.0, HEAVY_MODULES)]
+    if args.pdf_output_dir:
+        checks.append(("PDF-only", check_pdf_only(args.pdf_output_dir), None, ["torch", "whisper", "transformers"]))
+
+    failed = False
+    print()
+    for label, report, limit, forbidden in checks:
+        bad = [name for name in report["heavy"] or [] if name in forbidden]
+        ok = report["returncode"] == 0 and not bad and (limit is None or report["wall_seconds"] < limit)
+        failed |= not ok
+        print(f"{label}: {report['wall_seconds']:.2f}s wall, heavy modules imported: "
+              f"{', '.join(report['heavy'] or []) or 'none'} -> {'OK' if ok else 'FAIL'}")
+        if report.get("error"):
+            print(f"  {' '.join(report['error'])}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,698 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+from urllib.request import Request, urlopen
+
+import checkFolder
+import lazy_translation
+import lecture_bundle
+import metrics
+import progress
+import retranslate
+import thread_budget
+
+HOST = os.environ.get("SMARTREC_JOB_HOST", "127.0.0.1")
+PORT = int(os.environ.get("SMARTREC_JOB_PORT", "8765"))
+MAX_FINISHED_JOBS = 200
+# Seconds each Whisper model took to load when the server started, for the latency comparison
+_model_load_seconds = {}
+
+# Explicit priority classes, most urgent first. Within a class the policy decides:
+# "fifo" keeps arrival order, "sjf" runs the shortest recording first and
+# "fair" serves the classroom that has had the least processing time so far.
+PRIORITIES = {"urgent": 0, "normal": 1, "archive": 2}
+DEFAULT_PRIORITY = "normal"
+POLICY = os.environ.get("SMARTREC_QUEUE_POLICY", "sjf")
+POLICIES = ("fifo", "sjf", "fair")
+
+
+class Job:
+    """
+    One unit of pipeline work and everything the status endpoints report about it.
+    """
+
+    def __init__(self, kind, key, params, sequence=0):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.key = key
+        self.params = params
+        self.priority = params.get("priority", DEFAULT_PRIORITY)
+        if self.priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {self.priority}")
+        self.classroom = params.get("classroom", "default")
+        self.duration = None
+        self.sequence = sequence
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at = None
+        self.first_output_at = None
+        self.finished_at = None
+        self.warm = None
+        self.output = []
+        self.events = []
+        self.changed = threading.Condition()
+        self.result = None
+        self.error = None
+        self.parents = []
+        self.children = []
+        self.preempted = 0
+        self.paused_seconds = 0.0
+
+    def write(self, text):
+        if self.first_output_at is None and text.strip():
+            self.first_output_at = time.time()
+        self.output.append(text)
+
+    def add_event(self, event):
+        if self.first_output_at is None:
+            self.first_output_at = time.time()
+        with self.changed:
+            self.events.append(event)
+            self.changed.notify_all()
+        for parent in self.parents:
+            parent.add_event(event)
+
+    def events_since(self, since, timeout=None):
+        """
+        Return events after index `since`, optionally waiting up to `timeout` for new ones.
+        """
+        with self.changed:
+            if timeout and len(self.events) <= since and self.status in ("queued", "running", "waiting"):
+                self.changed.wait(timeout)
+            return self.events[since:], self.status
+
+    def to_dict(self):
+        first_byte = self.first_output_at - self.created_at if self.first_output_at else None
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "priority": self.priority,
+            "classroom": self.classroom,
+            "duration_seconds": self.duration,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "warm": self.warm,
+            "first_byte_seconds": first_byte,
+            "children": [child.id for child in self.children],
+            "preempted": self.preempted,
+            "latest_event": self.events[-1] if self.events else None,
+            "error": self.error,
+        }
+
+
+class _JobOutput(io.TextIOBase):
+    """
+    Stdout replacement that copies the worker's prints into the running job.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        # Per thread, so prints from request handler threads stay out of the running job
+        self._local = threading.local()
+
+    @property
+    def job(self):
+        return getattr(self._local, "job", None)
+
+    @job.setter
+    def job(self, job):
+        self._local.job = job
+
+    def write(self, text):
+        if self.job is not None:
+            self.job.write(text)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def is_lecture_name(name, output_dir=None):
+    """
+    True for a plain lecture name that stays inside the output directory: no
+    path separators, no "." or "..", checked after URL decoding.
+    """
+    if not name or name in (".", "..") or any(character in name for character in "/\\\0"):
+        return False
+    root = os.path.realpath(output_dir or checkFolder.output_dir)
+    return os.path.dirname(os.path.realpath(os.path.join(root, name))) == root
+
+
+def job_key(kind, params):
+    """
+    Identify identical jobs so repeated clicks attach to the one already queued or running.
+    """
+    if kind == "process":
+        path = os.path.abspath(params["input_file"])
+        stat = os.stat(path)
+        return f"process:{path}:{stat.st_size}:{int(stat.st_mtime)}"
+    if kind == "pdf":
+        names = ",".join(sorted(params.get("recordings") or []))
+        return f"pdf:{os.path.abspath(params.get('output_dir', checkFolder.output_dir))}:{names}"
+    if kind == "retranslate":
+        output_dir = os.path.abspath(params.get("output_dir", checkFolder.output_dir))
+        if not is_lecture_name(params["lecture"], output_dir):
+            raise ValueError(f"Invalid lecture name: {params['lecture']!r}")
+        return f"retranslate:{output_dir}:{retranslate.correction_key(params['lecture'], params['transcript'])}"
+    return f"{kind}:{os.path.abspath(params.get('input_dir', checkFolder.input_dir))}"
+
+
+def expand_scan(params):
+    """
+    Split a scan into one process job per new recording so each can be scheduled on its own.
+    """
+    output_dir = params.get("output_dir", checkFolder.output_dir)
+    shared = {key: value for key, value in params.items() if key not in ("input_dir", "input_file")}
+    shared["output_dir"] = output_dir
+    return [("process", dict(shared, input_file=input_file))
+            for input_file in checkFolder.find_new_recordings(params.get("input_dir", checkFolder.input_dir),
+                                                              output_dir)]
+
+
+def run_process(params):
+    return str(checkFolder.process_recording(params["input_file"],
+                                             params.get("output_dir", checkFolder.output_dir),
+                                             profile=params.get("profile"), model=params.get("model"),
+                                             backlog_seconds=params.get("backlog_seconds", 0.0),
+                                             slo_minutes=params.get("slo_minutes"),
+                                             cascade_model=params.get("cascade_model")))
+
+
+def run_pdf(params):
+    return checkFolder.regenerate_pdfs(params.get("output_dir", checkFolder.output_dir), params.get("recordings"))
+
+
+def run_retranslate(params):
+    return retranslate.correct_lecture(params.get("output_dir", checkFolder.output_dir), params["lecture"],
+                                       params["transcript"], resummarize=params.get("resummarize", False))
+
+
+HANDLERS = {
+    "process": run_process,
+    "pdf": run_pdf,
+    "retranslate": run_retranslate,
+}
+
+# Job kinds that only fan out into other jobs and finish when all of those have
+EXPANDERS = {
+    "scan": expand_scan,
+}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class JobQueue:
+    """
+    Priority queue of pipeline jobs run by one resident worker thread, with
+    deduplication of jobs that are already queued or running.
+
+    A running recording checks the queue at every stage boundary and lets a job
+    of a more urgent class run to completion before it continues.
+    """
+
+    def __init__(self, policy=POLICY):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self.policy = policy
+        self.jobs = {}
+        self.active = {}
+        self.pending = []
+        self.running = []
+        self.finished = deque()
+        self.served = {}
+        self.sequence = 0
+        self.lock = threading.Condition()
+        self.output = _JobOutput(sys.stdout)
+        progress.add_listener(self._on_event)
+
+    def _on_event(self, event):
+        job = self.output.job
+        if job is not None:
+            job.add_event(event)
+
+    def submit(self, kind, params, parent=None):
+        if kind not in HANDLERS and kind not in EXPANDERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        key = job_key(kind, params)
+        with self.lock:
+            job = self.active.get(key)
+            deduplicated = job is not None
+            if job is None:
+                self.sequence += 1
+                job = Job(kind, key, params, self.sequence)
+                self.jobs[job.id] = job
+                self.active[key] = job
+            if parent is not None:
+                job.parents.append(parent)
+                parent.children.append(job)
+        if not deduplicated:
+            if kind == "process":
+                try:
+                    job.duration = checkFolder.recording_duration(params["input_file"])
+                except (OSError, ValueError) as e:
+                    print(f"Could not read the duration of {params['input_file']}: {e}")
+            with self.lock:
+                self.pending.append(job)
+                self.lock.notify()
+        return job, deduplicated
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def depth(self):
+        with self.lock:
+            return len(self.pending)
+
+    def backlog_seconds(self):
+        """
+        Audio seconds in the queued recording jobs, as far as they can be measured.
+        """
+        with self.lock:
+            return sum(job.duration or 0.0 for job in self.pending)
+
+    def _order(self, job):
+        rank = PRIORITIES[job.priority]
+        if self.policy == "sjf":
+            # Recordings of unknown length go after every measured one in their class
+            return rank, job.duration if job.duration is not None else float("inf"), job.sequence
+        if self.policy == "fair":
+            return rank, self.served.get(job.classroom, 0.0), job.sequence
+        return rank, job.sequence
+
+    def _pop_best(self, outranking=None):
+        """
+        Remove and return the next job to run; with `outranking`, only a job of a more urgent class.
+        """
+        with self.lock:
+            if not self.pending:
+                return None
+            best = min(self.pending, key=self._order)
+            if outranking is not None and PRIORITIES[best.priority] >= PRIORITIES[outranking.priority]:
+                return None
+            self.pending.remove(best)
+            return best
+
+    def _next(self):
+        with self.lock:
+            while not self.pending:
+                self.lock.wait()
+        return self._pop_best()
+
+    def _finish(self, job):
+        with self.lock:
+            self.active.pop(job.key, None)
+            self.finished.append(job)
+            while len(self.finished) > MAX_FINISHED_JOBS:
+                old = self.finished.popleft()
+                self.jobs.pop(old.id, None)
+        with job.changed:
+            job.changed.notify_all()
+        for parent in job.parents:
+            if parent.status == "waiting" and all(child.finished_at for child in parent.children):
+                failed = [child for child in parent.children if child.status == "failed"]
+                parent.status = "failed" if failed else "done"
+                parent.error = "; ".join(f"{child.id}: {child.error.splitlines()[0]}" for child in failed) or None
+                parent.result = [child.result for child in parent.children]
+                parent.finished_at = time.time()
+                self._finish(parent)
+
+    def _expand(self, job):
+        children = [self.submit(kind, params, parent=job)[0] for kind, params in EXPANDERS[job.kind](job.params)]
+        print(f"Job {job.id} queued {len(children)} recording(s)")
+        if children and not all(child.finished_at for child in children):
+            job.status = "waiting"
+            return
+        job.status = "done"
+        job.result = [child.result for child in children]
+        job.finished_at = time.time()
+        self._finish(job)
+
+    def _run(self, job):
+        job.status = "running"
+        job.started_at = time.time()
+        job.warm = bool(checkFolder._whisper_models)
+        if job.kind in HANDLERS:
+            metrics.queue_wait.observe(job.started_at - job.created_at, priority=job.priority)
+        outer = self.output.job
+        context = progress.get_context()
+        self.output.job = job
+        self.running.append(job)
+        start = time.perf_counter()
+        try:
+            if job.kind in EXPANDERS:
+                self._expand(job)
+                return
+            params = dict(job.params, backlog_seconds=self.backlog_seconds())
+            job.result = HANDLERS[job.kind](params)
+            job.status = "done"
+        except Exception as e:
+            job.status = "failed"
+            job.error = f"{e}\n{traceback.format_exc()}"
+            print(f"Job {job.id} failed: {e}")
+        finally:
+            self.running.pop()
+            self.output.job = outer
+            progress.set_context(**context)
+            # Time spent running preempting jobs is charged to their own classrooms
+            elapsed = time.perf_counter() - start - job.paused_seconds
+            with self.lock:
+                self.served[job.classroom] = self.served.get(job.classroom, 0.0) + elapsed
+            if job.status in ("done", "failed") and job.finished_at is None:
+                job.finished_at = time.time()
+                self._finish(job)
+
+    def _stage_boundary(self, next_stage):
+        """
+        Run any queued job of a more urgent class before the current one starts `next_stage`.
+        """
+        if not self.running:
+            return
+        current = self.running[-1]
+        while True:
+            urgent = self._pop_best(outranking=current)
+            if urgent is None:
+                return
+            current.preempted += 1
+            print(f"Pausing job {current.id} before {next_stage} for {urgent.priority} job {urgent.id}")
+            start = time.perf_counter()
+            self._run(urgent)
+            current.paused_seconds += time.perf_counter() - start
+            print(f"Resuming job {current.id} at {next_stage}")
+
+    def run_forever(self):
+        checkFolder.stage_boundary_hook = self._stage_boundary
+        with redirect_stdout(self.output):
+            while True:
+                self._run(self._next())
+
+    def latency_stats(self):
+        stats = {}
+        with self.lock:
+            jobs = [job for job in self.jobs.values() if job.first_output_at]
+        for label, warm in (("cold", False), ("warm", True)):
+            samples = sorted(job.first_output_at - job.created_at for job in jobs if job.warm == warm)
+            stats[label] = {
+                "count": len(samples),
+                "mean_seconds": sum(samples) / len(samples) if samples else None,
+                "max_seconds": samples[-1] if samples else None,
+            }
+        return stats
+
+    def wait_stats(self):
+        """
+        Queue wait-time percentiles per priority class for jobs that have started.
+        """
+        with self.lock:
+            jobs = [job for job in self.jobs.values() if job.started_at and job.kind in HANDLERS]
+        stats = {}
+        for priority in PRIORITIES:
+            waits = sorted(job.started_at - job.created_at for job in jobs if job.priority == priority)
+            stats[priority] = {
+                "count": len(waits),
+                "p50_seconds": percentile(waits, 0.5),
+                "p90_seconds": percentile(waits, 0.9),
+                "p99_seconds": percentile(waits, 0.99),
+                "max_seconds": waits[-1] if waits else None,
+            }
+        return stats
+
+
+def make_handler(queue):
+    # Translations of lazily processed lectures are made right in the request
+    # thread; concurrent requests for the same one share a single translation
+    translator = lazy_translation.LazyTranslator()
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send_json(self, status, body):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _read_json(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            if not length:
+                return {}
+            body = json.loads(self.rfile.read(length).decode("utf-8"))
+            if not isinstance(body, dict) or not isinstance(body.get("params", {}), dict):
+                raise ValueError("The body must be a JSON object whose params are an object")
+            return body
+
+        def do_POST(self):
+            if self.path != "/jobs":
+                self.send_error(404)
+                return
+            try:
+                body = self._read_json()
+                job, deduplicated = queue.submit(body.get("kind", "scan"), body.get("params", {}))
+            except (ValueError, KeyError, OSError) as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            response = job.to_dict()
+            response["deduplicated"] = deduplicated
+            self._send_json(202, response)
+
+        def _send_bundle(self, lecture, member):
+            """
+            List a packed lecture's members, or send one of them straight from the bundle's mapping.
+            """
+            try:
+                bundle = lecture_bundle.BundleReader(lecture_bundle.bundle_path(checkFolder.output_dir, lecture))
+            except (OSError, ValueError):
+                self._send_json(404, {"error": "Unknown lecture"})
+                return
+            with bundle:
+                if member is None:
+                    self._send_json(200, {"lecture": bundle.lecture, "members": list(bundle.members.values())})
+                    return
+                if member not in bundle.members:
+                    self._send_json(404, {"error": "Unknown member"})
+                    return
+                view = bundle.view(member)
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", lecture_bundle.content_type(member))
+                    self.send_header("Content-Length", str(len(view)))
+                    self.end_headers()
+                    self.wfile.write(view)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    view.release()
+
+        def _send_translation(self, lecture, language, extension):
+            try:
+                data = translator.get(lecture, language, extension)
+            except ValueError as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            except FileNotFoundError as e:
+                self._send_json(404, {"error": str(e)})
+                return
+            except Exception as e:
+                self._send_json(502, {"error": str(e)})
+                return
+            if data is None:
+                self._send_json(404, {"error": f"No {extension} for {lecture} in {language}"})
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", lecture_bundle.content_type(f"file.{extension}"))
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _stream_events(self, job, since):
+            """
+            Push the job's progress events as Server-Sent Events until it finishes.
+            """
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            try:
+                while True:
+                    events, status = job.events_since(since, timeout=15)
+                    if events:
+                        for event in events:
+                            self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+                        since += len(events)
+                    elif status in ("queued", "running", "waiting"):
+                        self.wfile.write(b": keepalive\n\n")
+                    else:
+                        end = json.dumps(job.to_dict(), ensure_ascii=False)
+                        self.wfile.write(f"event: end\ndata: {end}\n\n".encode("utf-8"))
+                        break
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            parts = [unquote(part) for part in url.path.split("/") if part]
+            if parts == ["health"]:
+                self._send_json(200, {"status": "ok", "queue_depth": queue.depth(),
+                                      "models_loaded": sorted(checkFolder._whisper_models)})
+            elif parts == ["metrics"]:
+                metrics.queue_depth.set(queue.depth())
+                data = metrics.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            elif parts == ["stats"]:
+                self._send_json(200, {"queue_depth": queue.depth(), "policy": queue.policy,
+                                      "first_byte": queue.latency_stats(), "queue_wait": queue.wait_stats(),
+                                      "model_load_seconds": _model_load_seconds})
+            elif len(parts) >= 2 and parts[0] in ("bundles", "lectures") and not is_lecture_name(parts[1]):
+                self._send_json(404, {"error": "Unknown lecture"})
+            elif len(parts) >= 2 and parts[0] == "bundles":
+                # Members are only looked up by name in the bundle's own index
+                self._send_bundle(parts[1], "/".join(parts[2:]) or None)
+            elif len(parts) == 3 and parts[0] == "lectures":
+                if query.get("format", "pdf") not in ("pdf", "txt"):
+                    self._send_json(400, {"error": "format must be pdf or txt"})
+                else:
+                    self._send_translation(parts[1], parts[2], query.get("format", "pdf"))
+            elif len(parts) >= 2 and parts[0] == "jobs":
+                job = queue.get(parts[1])
+                if job is None:
+                    self._send_json(404, {"error": "Unknown job"})
+                elif len(parts) == 2:
+                    self._send_json(200, job.to_dict())
+                elif parts[2] == "events":
+                    # Cheap polling: clients pass the index of the next event they need
+                    since = int(query.get("since", 0))
+                    events, status = job.events_since(since, timeout=float(query.get("wait", 0)))
+                    self._send_json(200, {"status": status, "events": events, "next": since + len(events)})
+                elif parts[2] == "stream":
+                    self._stream_events(job, int(query.get("since", 0)))
+                elif parts[2] == "result":
+                    if job.status in ("queued", "running", "waiting"):
+                        self._send_json(409, {"status": job.status})
+                    else:
+                        self._send_json(200, {"status": job.status, "result": job.result,
+                                              "output": "".join(job.output).strip(), "error": job.error})
+                else:
+                    self.send_error(404)
+            else:
+                self.send_error(404)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(host=HOST, port=PORT, preload=("base",)):
+    """
+    Start the resident worker, optionally warm up Whisper models, and serve the job API.
+    """
+    os.environ.setdefault("GOOGLE_APPLICATION_CREDENTIALS", checkFolder.credentials_path)
+    thread_budget.install()
+    queue = JobQueue()
+    threading.Thread(target=queue.run_forever, daemon=True).start()
+
+    for model_name in preload:
+        start = time.perf_counter()
+        checkFolder.load_whisper_model(model_name, pin=True)
+        _model_load_seconds[model_name] = time.perf_counter() - start
+        print(f"Loaded Whisper '{model_name}' in {_model_load_seconds[model_name]:.1f}s")
+
+    with ThreadingHTTPServer((host, port), make_handler(queue)) as httpd:
+        print(f"Job server listening on http://{host}:{port}")
+        httpd.serve_forever()
+
+
+# Run in a fresh interpreter by measure_latency: what a one-off checkFolder.py pays before it can work
+COLD_START_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import checkFolder
+imported = time.perf_counter()
+for name in sys.argv[1:]:
+    checkFolder.load_whisper_model(name)
+loaded = time.perf_counter()
+checkFolder.scan_recordings(checkFolder.input_dir, checkFolder.output_dir)
+print(json.dumps({"import_seconds": imported - start, "model_load_seconds": loaded - imported,
+                  "scan_seconds": time.perf_counter() - loaded}))
+"""
+
+
+def measure_latency(url=f"http://{HOST}:{PORT}", timeout=600):
+    """
+    Compare a freshly spawned checkFolder.py against a scan job on the running
+    job server. Both scan the same empty temporary folders, so no real
+    recording is touched, and the fresh process loads the Whisper models the
+    server keeps resident; each model load is timed on its own.
+    """
+    with urlopen(f"{url}/health") as response:
+        models = json.load(response)["models_loaded"]
+    with tempfile.TemporaryDirectory(prefix="smartrec-latency-") as work:
+        input_dir, output_dir = os.path.join(work, "input"), os.path.join(work, "output")
+        os.mkdir(input_dir)
+        os.mkdir(output_dir)
+
+        env = dict(os.environ, SMARTREC_INPUT_DIR=input_dir, SMARTREC_OUTPUT_DIR=output_dir)
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-c", COLD_START_SCRIPT, *models], env=env,
+                                   cwd=os.path.dirname(os.path.abspath(__file__)),
+                                   capture_output=True, text=True, timeout=timeout)
+        cold = time.perf_counter() - start
+        if completed.returncode != 0:
+            raise RuntimeError(f"Cold start run failed: {completed.stderr[-2000:]}")
+        cold_parts = json.loads(completed.stdout.strip().splitlines()[-1])
+
+        start = time.perf_counter()
+        body = {"kind": "scan", "params": {"input_dir": input_dir, "output_dir": output_dir}}
+        request = Request(f"{url}/jobs", data=json.dumps(body).encode("utf-8"),
+                          headers={"Content-Type": "application/json"}, method="POST")
+        with urlopen(request) as response:
+            job = json.load(response)
+        while time.perf_counter() - start < timeout:
+            with urlopen(f"{url}/jobs/{job['id']}") as response:
+                status = json.load(response)
+            if status["status"] in ("done", "failed"):
+                break
+            time.sleep(0.05)
+        warm = time.perf_counter() - start
+        with urlopen(f"{url}/stats") as response:
+            server_loads = json.load(response).get("model_load_seconds", {})
+
+    names = ", ".join(models) or "none"
+    print(f"Cold start (fresh checkFolder.py): {cold:.2f}s to an empty scan with models ready")
+    print(f"  startup and imports {cold - cold_parts['model_load_seconds'] - cold_parts['scan_seconds']:.2f}s, "
+          f"Whisper load ({names}) {cold_parts['model_load_seconds']:.2f}s, scan {cold_parts['scan_seconds']:.2f}s")
+    print(f"Warm job server: {warm:.2f}s for the same scan job ({status['status']})")
+    print(f"  Whisper load 0.00s per job; resident since startup, where it took "
+          f"{sum(server_loads.values()):.2f}s ({names})")
+    return {"cold_seconds": cold, "cold": cold_parts, "warm_seconds": warm, "server_model_load_seconds": server_loads}
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "latency":
+        measure_latency(*sys.argv[2:3])
+    else:
+        serve()
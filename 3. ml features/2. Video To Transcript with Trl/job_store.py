@@ -0,0 +1,334 @@
+import json
+import os
+import sqlite3
+import time
+import uuid
+
+DEFAULT_STORE = os.environ.get(
+    "SMARTREC_JOB_STORE", "sqlite:///" + os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs.db")
+)
+LEASE_SECONDS = 120
+MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    recording TEXT NOT NULL,
+    params TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    duration REAL,
+    status TEXT NOT NULL,
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, priority, duration, created_at);
+CREATE UNIQUE INDEX IF NOT EXISTS active_recordings ON jobs (recording) WHERE status IN ('queued', 'running');
+"""
+
+
+class SQLiteJobStore:
+    """
+    Job queue shared by workers on several hosts through one SQLite file.
+
+    Claims take the database write lock, so two workers can never get the same
+    job. A claimed job holds a lease that its worker renews with heartbeats;
+    jobs whose lease runs out are put back in the queue for another worker.
+    The rollback journal is used instead of WAL because WAL needs shared
+    memory that network filesystems do not provide.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=DELETE")
+        self.conn.execute("PRAGMA busy_timeout=30000")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def enqueue(self, recording, params=None, priority=1, duration=None):
+        """
+        Queue a recording unless it is already queued or running. Returns the job id, or None.
+        """
+        job_id = uuid.uuid4().hex[:12]
+        try:
+            self.conn.execute(
+                "INSERT INTO jobs (id, recording, params, priority, duration, status, created_at) "
+                "VALUES (?, ?, ?, ?, ?, 'queued', ?)",
+                (job_id, recording, json.dumps(params or {}), priority, duration, time.time()),
+            )
+        except sqlite3.IntegrityError:
+            return None
+        return job_id
+
+    def reclaim_expired(self, now=None):
+        """
+        Requeue jobs whose worker stopped heartbeating, or fail them after MAX_ATTEMPTS.
+        """
+        now = now or time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            expired = self.conn.execute(
+                "SELECT id, worker, attempts FROM jobs WHERE status = 'running' AND lease_expires < ?", (now,)
+            ).fetchall()
+            for job_id, worker, attempts in expired:
+                if attempts >= MAX_ATTEMPTS:
+                    self.conn.execute(
+                        "UPDATE jobs SET status = 'failed', finished_at = ?, error = ? WHERE id = ?",
+                        (now, f"Lease expired {attempts} times; last worker {worker}", job_id),
+                    )
+                else:
+                    self.conn.execute(
+                        "UPDATE jobs SET status = 'queued', worker = NULL, lease_expires = NULL WHERE id = ?",
+                        (job_id,),
+                    )
+                print(f"Reclaimed job {job_id} from worker {worker}")
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return len(expired)
+
+    def claim(self, worker_id, lease_seconds=LEASE_SECONDS):
+        """
+        Take the most urgent queued job (shortest first within a priority) and lease it to `worker_id`.
+        """
+        self.reclaim_expired()
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute(
+                "SELECT id, recording, params FROM jobs WHERE status = 'queued' "
+                "ORDER BY priority, duration IS NULL, duration, created_at LIMIT 1"
+            ).fetchone()
+            if row is not None:
+                self.conn.execute(
+                    "UPDATE jobs SET status = 'running', worker = ?, lease_expires = ?, started_at = ?, "
+                    "attempts = attempts + 1 WHERE id = ?",
+                    (worker_id, now + lease_seconds, now, row[0]),
+                )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        return {"id": row[0], "recording": row[1], "params": json.loads(row[2])}
+
+    def heartbeat(self, job_id, worker_id, lease_seconds=LEASE_SECONDS):
+        """
+        Extend the lease. Returns False when the job was reclaimed and belongs to someone else now.
+        """
+        cursor = self.conn.execute(
+            "UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'running'",
+            (time.time() + lease_seconds, job_id, worker_id),
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id, worker_id, result=None):
+        cursor = self.conn.execute(
+            "UPDATE jobs SET status = 'done', finished_at = ?, result = ?, lease_expires = NULL "
+            "WHERE id = ? AND worker = ? AND status = 'running'",
+            (time.time(), json.dumps(result), job_id, worker_id),
+        )
+        return cursor.rowcount == 1
+
+    def fail(self, job_id, worker_id, error):
+        cursor = self.conn.execute(
+            "UPDATE jobs SET status = 'failed', finished_at = ?, error = ?, lease_expires = NULL "
+            "WHERE id = ? AND worker = ? AND status = 'running'",
+            (time.time(), error, job_id, worker_id),
+        )
+        return cursor.rowcount == 1
+
+    def status(self, job_id):
+        """
+        The job's status ("queued", "running", "done" or "failed"), or None for an unknown job.
+        """
+        row = self.conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def stats(self, window_seconds=3600):
+        """
+        Job counts by status and per-worker throughput over the last `window_seconds`.
+        """
+        counts = dict(self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        since = time.time() - window_seconds
+        workers = {}
+        for worker, jobs, audio, busy in self.conn.execute(
+            "SELECT worker, COUNT(*), SUM(COALESCE(duration, 0)), SUM(finished_at - started_at) FROM jobs "
+            "WHERE status = 'done' AND finished_at >= ? GROUP BY worker",
+            (since,),
+        ):
+            workers[worker] = {"jobs": jobs, "audio_seconds": audio, "busy_seconds": busy}
+        return {"counts": counts, "workers": workers, "window_seconds": window_seconds}
+
+
+class RedisJobStore:
+    """
+    The same queue on a Redis-compatible server. "fakeredis://" runs it in
+    process on the fakeredis package, which is handy for local testing.
+
+    Keys: a sorted set of queued job ids scored by priority and duration, a
+    sorted set of running job ids scored by lease expiry, and a hash per job.
+    """
+
+    def __init__(self, url, prefix="smartrec"):
+        if url.startswith("fakeredis://"):
+            import fakeredis
+            self.redis = fakeredis.FakeStrictRedis(decode_responses=True)
+        else:
+            import redis
+            self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.queued = f"{prefix}:queued"
+        self.leases = f"{prefix}:leases"
+        self.active = f"{prefix}:active"
+
+    def _job(self, job_id):
+        return f"{self.prefix}:job:{job_id}"
+
+    def close(self):
+        self.redis.close()
+
+    @staticmethod
+    def _score(priority, duration):
+        # Priority dominates; within a priority shorter recordings come first
+        return priority * 1e9 + (duration if duration is not None else 1e8)
+
+    def enqueue(self, recording, params=None, priority=1, duration=None):
+        job_id = uuid.uuid4().hex[:12]
+        if not self.redis.hsetnx(self.active, recording, job_id):
+            return None
+        self.redis.hset(self._job(job_id), mapping={
+            "recording": recording, "params": json.dumps(params or {}), "priority": priority,
+            "duration": "" if duration is None else duration, "status": "queued", "attempts": 0,
+            "created_at": time.time(),
+        })
+        self.redis.zadd(self.queued, {job_id: self._score(priority, duration)})
+        return job_id
+
+    def reclaim_expired(self, now=None):
+        now = now or time.time()
+        reclaimed = 0
+        for job_id in self.redis.zrangebyscore(self.leases, 0, now):
+            job = self.redis.transaction(lambda pipe: self._requeue(pipe, job_id, now), self.leases,
+                                         self._job(job_id), value_from_callable=True)
+            if job is not None:
+                print(f"Reclaimed job {job_id} from worker {job.get('worker')}")
+                reclaimed += 1
+        return reclaimed
+
+    def _requeue(self, pipe, job_id, now):
+        # Runs under WATCH on the leases and the job: the lease removal and the requeue (or
+        # failure) commit together, so a reclaimer dying in between cannot lose the job
+        score = pipe.zscore(self.leases, job_id)
+        if score is None or score > now:
+            # Finished, reclaimed by someone else, or its lease was renewed meanwhile
+            return None
+        job = pipe.hgetall(self._job(job_id))
+        pipe.multi()
+        pipe.zrem(self.leases, job_id)
+        if int(job.get("attempts", 0)) >= MAX_ATTEMPTS:
+            pipe.hset(self._job(job_id), mapping={
+                "status": "failed", "finished_at": now,
+                "error": f"Lease expired {job['attempts']} times; last worker {job.get('worker')}",
+            })
+            pipe.hdel(self.active, job["recording"])
+        else:
+            pipe.hset(self._job(job_id), mapping={"status": "queued", "worker": ""})
+            duration = float(job["duration"]) if job.get("duration") else None
+            pipe.zadd(self.queued, {job_id: self._score(int(job["priority"]), duration)})
+        return job
+
+    def claim(self, worker_id, lease_seconds=LEASE_SECONDS):
+        self.reclaim_expired()
+
+        def take(pipe):
+            # Runs under WATCH on the queue: the pop and the lease commit together in one
+            # MULTI, so a worker dying in between can never lose a job that is neither queued nor leased
+            head = pipe.zrange(self.queued, 0, 0)
+            if not head:
+                return None
+            job_id = head[0]
+            now = time.time()
+            pipe.multi()
+            pipe.zrem(self.queued, job_id)
+            pipe.zadd(self.leases, {job_id: now + lease_seconds})
+            pipe.hset(self._job(job_id), mapping={"status": "running", "worker": worker_id, "started_at": now})
+            pipe.hincrby(self._job(job_id), "attempts", 1)
+            return job_id
+
+        job_id = self.redis.transaction(take, self.queued, value_from_callable=True)
+        if job_id is None:
+            return None
+        job = self.redis.hgetall(self._job(job_id))
+        return {"id": job_id, "recording": job["recording"], "params": json.loads(job["params"])}
+
+    def _if_owner(self, job_id, worker_id, update):
+        """
+        Run `update(pipe, recording)` in one MULTI only while `worker_id` still holds the job's lease.
+        The check and the update commit together, so a reclaim cannot land in between.
+        """
+        def check_and_update(pipe):
+            if (pipe.hget(self._job(job_id), "worker") != worker_id
+                    or pipe.zscore(self.leases, job_id) is None):
+                return False
+            recording = pipe.hget(self._job(job_id), "recording")
+            pipe.multi()
+            update(pipe, recording)
+            return True
+
+        return self.redis.transaction(check_and_update, self.leases, self._job(job_id), value_from_callable=True)
+
+    def heartbeat(self, job_id, worker_id, lease_seconds=LEASE_SECONDS):
+        return self._if_owner(job_id, worker_id, lambda pipe, recording: pipe.zadd(
+            self.leases, {job_id: time.time() + lease_seconds}, xx=True))
+
+    def _finish(self, job_id, worker_id, fields):
+        def update(pipe, recording):
+            pipe.zrem(self.leases, job_id)
+            pipe.hset(self._job(job_id), mapping=dict(fields, finished_at=time.time()))
+            pipe.hdel(self.active, recording)
+        return self._if_owner(job_id, worker_id, update)
+
+    def complete(self, job_id, worker_id, result=None):
+        return self._finish(job_id, worker_id, {"status": "done", "result": json.dumps(result)})
+
+    def fail(self, job_id, worker_id, error):
+        return self._finish(job_id, worker_id, {"status": "failed", "error": error})
+
+    def status(self, job_id):
+        return self.redis.hget(self._job(job_id), "status")
+
+    def stats(self, window_seconds=3600):
+        since = time.time() - window_seconds
+        counts = {"queued": self.redis.zcard(self.queued), "running": self.redis.zcard(self.leases)}
+        workers = {}
+        for key in self.redis.scan_iter(f"{self.prefix}:job:*"):
+            job = self.redis.hgetall(key)
+            if job.get("status") != "done" or float(job.get("finished_at", 0)) < since:
+                continue
+            entry = workers.setdefault(job["worker"], {"jobs": 0, "audio_seconds": 0.0, "busy_seconds": 0.0})
+            entry["jobs"] += 1
+            entry["audio_seconds"] += float(job["duration"] or 0)
+            entry["busy_seconds"] += float(job["finished_at"]) - float(job["started_at"])
+        return {"counts": counts, "workers": workers, "window_seconds": window_seconds}
+
+
+def open_store(url=DEFAULT_STORE):
+    """
+    Open a job store from a URL: sqlite:///path/to/jobs.db, redis://host:port/0 or fakeredis://.
+    """
+    if url.startswith(("redis://", "rediss://", "fakeredis://")):
+        return RedisJobStore(url)
+    if url.startswith("sqlite:///"):
+        url = url[len("sqlite:///"):]
+    return SQLiteJobStore(url)
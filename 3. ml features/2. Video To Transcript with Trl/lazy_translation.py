@@ -0,0 +1,263 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import checkFolder
+import lecture_bundle
+import retranslate
+import shared_json
+
+STATS_FILE = "lazy_translation_stats.json"
+# Google Cloud Translation list price per million characters, for the cost report
+USD_PER_MILLION_CHARACTERS = float(os.environ.get("SMARTREC_TRANSLATE_USD_PER_MILLION", "20"))
+
+
+def resolve_language(language):
+    """
+    Accept a language code ("hi") or name ("hindi", "Chinese (Simplified)") and return (code, name).
+    """
+    wanted = language.strip().lower()
+    for code, name in checkFolder.languages.items():
+        if wanted in (code, name.lower()):
+            return code, name
+    raise ValueError(f"Unknown language: {language}")
+
+
+def _stats_path(output_dir):
+    return Path(output_dir) / STATS_FILE
+
+
+def _empty_stats():
+    return {"lectures": {}, "requests": 0, "cache_hits": 0, "coalesced": 0}
+
+
+def load_stats(output_dir):
+    return shared_json.load(_stats_path(output_dir), _empty_stats())
+
+
+def _update_stats(output_dir, change):
+    # The job server, pipeline workers and the CLI all update the same file
+    shared_json.update(_stats_path(output_dir), change, _empty_stats(), indent=2)
+
+
+def register_lecture(output_dir, lecture, characters):
+    """
+    Note a lecture processed in lazy mode, so the report can count the translations it never needed.
+    """
+    def change(stats):
+        stats["lectures"][lecture] = {"characters": characters, "processed_at": time.time(), "languages": {}}
+    _update_stats(output_dir, change)
+
+
+class Coalescer:
+    """
+    Runs one call per key at a time. Callers asking for a key that is already
+    in flight wait for that call and share its result instead of repeating it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    def run(self, key, func, *args):
+        """
+        Return (result, coalesced); coalesced is True when another caller did the work.
+        """
+        with self._lock:
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = {"done": threading.Event(), "result": None, "error": None}
+                self._in_flight[key] = call
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"], True
+        try:
+            call["result"] = func(*args)
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            call["done"].set()
+        return call["result"], False
+
+
+class LazyTranslator:
+    """
+    Makes a lecture's translation and PDF for one language the first time it is
+    asked for, then serves the stored copy. Works on loose lecture folders and on bundles.
+    """
+
+    def __init__(self, output_dir=None):
+        self.output_dir = Path(output_dir or checkFolder.output_dir)
+        self.coalescer = Coalescer()
+        self._client = None
+
+    def _read(self, lecture, member):
+        """
+        A lecture file's bytes, or None when it has not been made yet. Raises FileNotFoundError for unknown lectures.
+        """
+        folder = self.output_dir / lecture
+        if folder.is_dir():
+            try:
+                return (folder / member).read_bytes()
+            except FileNotFoundError:
+                return None
+        try:
+            with lecture_bundle.BundleReader(lecture_bundle.bundle_path(self.output_dir, lecture)) as bundle:
+                return bundle.read(member) if member in bundle.members else None
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Unknown lecture: {lecture}")
+
+    def get(self, lecture, language, extension="pdf"):
+        """
+        The lecture's transcript in `language` as PDF or txt bytes, translating and rendering it if needed.
+        """
+        code, name = resolve_language(language)
+        member = f"{lecture}-{name.lower()}.{extension}"
+        data = self._read(lecture, member)
+        if data is not None:
+            self._count(cache_hits=1)
+            return data
+        _, coalesced = self.coalescer.run((lecture, code), self._materialize, lecture, code, name)
+        self._count(coalesced=1 if coalesced else 0)
+        return self._read(lecture, member)
+
+    def _count(self, cache_hits=0, coalesced=0):
+        def change(stats):
+            stats["requests"] += 1
+            stats["cache_hits"] += cache_hits
+            stats["coalesced"] += coalesced
+        _update_stats(self.output_dir, change)
+
+    def _materialize(self, lecture, code, name):
+        while True:
+            made = self._translate_and_render(lecture, code, name)
+            if made is not None:
+                break
+            # The transcript was corrected while translating; start again from the new one
+            print(f"{lecture} changed while making {name}; translating it again")
+        transcript, translate_seconds, render_cpu_seconds = made
+
+        def change(stats):
+            entry = stats["lectures"].get(lecture)
+            if entry is None:
+                # Processed eagerly: no translations were skipped for it, so it stays out of the report
+                return
+            entry["languages"][name.lower()] = {"characters": len(transcript), "translate_seconds": translate_seconds,
+                                                "render_cpu_seconds": render_cpu_seconds, "made_at": time.time()}
+        _update_stats(self.output_dir, change)
+        print(f"Made {name} for {lecture} on request ({translate_seconds:.1f}s translate, "
+              f"{render_cpu_seconds:.1f}s render CPU)")
+
+    def _translate_and_render(self, lecture, code, name):
+        """
+        Translate and render one language, then store it under the lecture's lock.
+        Returns None, storing nothing, when the English transcript changed meanwhile.
+        """
+        english_member = f"{lecture}-english.txt"
+        english = self._read(lecture, english_member)
+        if english is None:
+            raise FileNotFoundError(f"{lecture} has no English transcript")
+        transcript = english.decode("utf-8")
+        if self._client is None:
+            self._client = checkFolder.translate_client_factory()
+
+        start = time.perf_counter()
+        sentences = {}
+        translations = checkFolder.translate_transcript(transcript, [code], client=self._client,
+                                                        sentence_map=sentences)
+        if code not in translations:
+            raise RuntimeError(f"Translating {lecture} into {name} failed")
+        translate_seconds = time.perf_counter() - start
+
+        work = Path(tempfile.mkdtemp(prefix="smartrec-lazy-"))
+        try:
+            checkFolder.save_to_file(work / f"{lecture}-{name.lower()}.txt", translations[code])
+            # Rendering runs on this thread, so its CPU time is not mixed with other jobs'
+            cpu_start = time.thread_time()
+            checkFolder.txt_to_pdf(work / lecture, {code: name}, include_english=False)
+            render_cpu_seconds = time.thread_time() - cpu_start
+            with lecture_bundle.lecture_lock(lecture_bundle.bundle_path(self.output_dir, lecture)):
+                if self._read(lecture, english_member) != english:
+                    return None
+                # Add this language to the lecture's sentence map for later corrections
+                english_sentences = checkFolder.split_sentences(transcript)
+                stored = self._read(lecture, retranslate.map_name(lecture))
+                sentence_map = json.loads(stored.decode("utf-8")) if stored else None
+                if sentence_map is None or sentence_map["english"] != english_sentences:
+                    sentence_map = {"english": english_sentences, "translations": {}}
+                sentence_map["translations"][code] = sentences[code]
+                retranslate.save_map(work, lecture, english_sentences, sentence_map["translations"])
+                files = sorted(work.iterdir())
+                folder = self.output_dir / lecture
+                if folder.is_dir():
+                    for file in files:
+                        shutil.copy2(file, folder / file.name)
+                else:
+                    lecture_bundle.add_files(lecture_bundle.bundle_path(self.output_dir, lecture), files)
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+        return transcript, translate_seconds, render_cpu_seconds
+
+
+def report(output_dir=None):
+    """
+    Translation characters, API cost and rendering CPU that lazy mode has avoided so far.
+    """
+    output_dir = output_dir or checkFolder.output_dir
+    stats = load_stats(output_dir)
+    total_languages = len(checkFolder.languages)
+    made = [entry for lecture in stats["lectures"].values() for entry in lecture["languages"].values()]
+    mean_translate = sum(entry["translate_seconds"] for entry in made) / len(made) if made else None
+    mean_render = sum(entry["render_cpu_seconds"] for entry in made) / len(made) if made else None
+
+    avoided_languages = avoided_characters = used_characters = 0
+    for lecture, entry in sorted(stats["lectures"].items()):
+        requested = sorted(entry["languages"])
+        skipped = total_languages - len(requested)
+        avoided_languages += skipped
+        avoided_characters += skipped * entry["characters"]
+        used_characters += sum(language["characters"] for language in entry["languages"].values())
+        print(f"{lecture}: {len(requested)}/{total_languages} languages made ({', '.join(requested) or 'none'})")
+
+    print(f"\n{len(stats['lectures'])} lazy lectures, {stats['requests']} requests: "
+          f"{stats['cache_hits']} served from cache, {stats['coalesced']} coalesced into a running translation")
+    print(f"Translated {used_characters} characters; avoided {avoided_characters} "
+          f"(${avoided_characters / 1e6 * USD_PER_MILLION_CHARACTERS:.2f} at "
+          f"${USD_PER_MILLION_CHARACTERS:g} per million)")
+    if made:
+        print(f"Avoided {avoided_languages} translations and renders: about "
+              f"{avoided_languages * mean_translate:.0f}s of translation calls and "
+              f"{avoided_languages * mean_render:.0f}s of render CPU "
+              f"(measured {mean_translate:.1f}s and {mean_render:.1f}s per language)")
+    else:
+        print(f"Avoided {avoided_languages} translations and renders (no on-demand renders yet to time them by)")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="On-demand translations for lectures processed in lazy mode.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    get_command = commands.add_parser("get", help="Make (or find) one lecture's translation")
+    get_command.add_argument("lecture")
+    get_command.add_argument("language")
+    report_command = commands.add_parser("report", help="Show the translation and CPU cost avoided")
+    report_command.add_argument("--output-dir")
+    args = parser.parse_args()
+
+    if args.command == "get":
+        os.environ.setdefault("GOOGLE_APPLICATION_CREDENTIALS", checkFolder.credentials_path)
+        data = LazyTranslator().get(args.lecture, args.language)
+        print(f"{args.lecture} in {args.language}: {len(data)} bytes")
+    else:
+        report(args.output_dir)
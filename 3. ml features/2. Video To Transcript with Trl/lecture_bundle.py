@@ -0,0 +1,280 @@
+import argparse
+import json
+import mimetypes
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# One file per lecture instead of a folder of ~40: a fixed header pointing at
+# a JSON index of member offsets, so any member is one slice of a mapping.
+# Layout: header, member data back to back, index.
+MAGIC = b"SMRBND01"
+HEADER = struct.Struct("<8sIQQ")  # magic, version, index offset, index length
+HEADER_SIZE = 64
+VERSION = 1
+BUNDLE_SUFFIX = ".smartrec"
+ALIGNMENT = 8
+REPLACE_ATTEMPTS = 10
+
+# Writers of one lecture (packing, adding translations, corrections, PDF
+# re-renders) take its lock for their whole read-modify-write. A bundle is
+# only replaced or removed once no reader in this process has it mapped:
+# Windows refuses to replace a file that is open.
+_state_lock = threading.Lock()
+_readers_changed = threading.Condition(_state_lock)
+_writer_locks = {}
+_open_readers = {}
+_replacing = set()
+
+
+def bundle_path(output_dir, lecture):
+    return Path(output_dir) / f"{lecture}{BUNDLE_SUFFIX}"
+
+
+def _key(path):
+    return os.path.normcase(os.path.abspath(str(path)))
+
+
+def lecture_lock(path):
+    """
+    The lock shared by everything that rewrites the lecture whose bundle is (or would be) at `path`.
+    """
+    with _state_lock:
+        return _writer_locks.setdefault(_key(path), threading.RLock())
+
+
+def _replace(source, destination):
+    """
+    os.replace (or remove, without `source`) once the destination's readers have closed.
+    """
+    key = _key(destination)
+    with _readers_changed:
+        _replacing.add(key)
+        try:
+            while _open_readers.get(key):
+                _readers_changed.wait()
+            for attempt in range(REPLACE_ATTEMPTS):
+                try:
+                    if source is None:
+                        os.remove(destination)
+                    else:
+                        os.replace(source, destination)
+                    break
+                except PermissionError:
+                    # Still open in another process (Windows); give it a moment
+                    if attempt == REPLACE_ATTEMPTS - 1:
+                        raise
+                    time.sleep(0.05 * (attempt + 1))
+        finally:
+            _replacing.discard(key)
+            _readers_changed.notify_all()
+
+
+def pack(folder, destination=None, remove=False):
+    """
+    Pack every file under a lecture folder into one bundle next to it.
+    With `remove` the loose files are deleted once the bundle is in place.
+    """
+    folder = Path(folder)
+    destination = Path(destination) if destination else folder.with_name(folder.name + BUNDLE_SUFFIX)
+    with lecture_lock(destination):
+        return _pack(folder, destination, remove)
+
+
+def _pack(folder, destination, remove):
+    files = sorted(path for path in folder.rglob("*") if path.is_file())
+    members = []
+    temp_path = destination.with_name(destination.name + ".tmp")
+    with open(temp_path, "wb") as out:
+        out.write(b"\0" * HEADER_SIZE)
+        for path in files:
+            offset = out.tell()
+            with open(path, "rb") as f:
+                shutil.copyfileobj(f, out, 1 << 20)
+            size = out.tell() - offset
+            out.write(b"\0" * (-out.tell() % ALIGNMENT))
+            members.append({"name": path.relative_to(folder).as_posix(), "offset": offset, "size": size,
+                            "mtime": path.stat().st_mtime})
+        index = json.dumps({"lecture": folder.name, "created_at": time.time(), "members": members},
+                           ensure_ascii=False).encode("utf-8")
+        index_offset = out.tell()
+        out.write(index)
+        out.seek(0)
+        out.write(HEADER.pack(MAGIC, VERSION, index_offset, len(index)))
+    _replace(temp_path, destination)
+    if remove:
+        shutil.rmtree(folder)
+    print(f"Packed {len(members)} files from {folder} into {destination}")
+    return destination
+
+
+class BundleReader:
+    """
+    Memory-maps a bundle; each member is served or extracted straight from the mapping.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.map = None
+        self._key = _key(path)
+        with _readers_changed:
+            while self._key in _replacing:
+                _readers_changed.wait()
+            _open_readers[self._key] = _open_readers.get(self._key, 0) + 1
+        try:
+            with open(self.path, "rb") as f:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            self.close()
+            raise
+        magic, version, index_offset, index_length = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a lecture bundle")
+        index = json.loads(self.map[index_offset:index_offset + index_length].decode("utf-8"))
+        self.lecture = index["lecture"]
+        self.members = {member["name"]: member for member in index["members"]}
+
+    def names(self):
+        return list(self.members)
+
+    def view(self, name):
+        """
+        The member's bytes as a zero-copy view of the mapping. Raises KeyError for unknown members.
+        """
+        member = self.members[name]
+        return memoryview(self.map)[member["offset"]:member["offset"] + member["size"]]
+
+    def read(self, name):
+        return bytes(self.view(name))
+
+    def extract(self, name, destination):
+        destination = Path(destination)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        view = self.view(name)
+        try:
+            with open(destination, "wb") as f:
+                f.write(view)
+        finally:
+            view.release()
+        return destination
+
+    def extract_all(self, folder):
+        for name in self.members:
+            self.extract(name, Path(folder) / name)
+        return Path(folder)
+
+    def close(self):
+        if self._key is None:
+            return
+        if self.map is not None:
+            self.map.close()
+        with _readers_changed:
+            _open_readers[self._key] -= 1
+            if not _open_readers[self._key]:
+                del _open_readers[self._key]
+            _readers_changed.notify_all()
+        self._key = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def unpack(path, folder=None, remove=False):
+    """
+    Restore a bundle's loose files, by default into a folder named after the lecture beside it.
+    """
+    path = Path(path)
+    with lecture_lock(path):
+        with BundleReader(path) as bundle:
+            folder = bundle.extract_all(folder or path.with_name(bundle.lecture))
+        if remove:
+            _replace(None, path)
+    return folder
+
+
+def add_files(path, files):
+    """
+    Add files (or replace members of the same name) by rewriting the bundle.
+    """
+    path = Path(path)
+    with lecture_lock(path), tempfile.TemporaryDirectory(dir=path.parent) as work:
+        folder = unpack(path, Path(work) / path.name[:-len(BUNDLE_SUFFIX)])
+        for file in files:
+            shutil.copy2(file, folder / Path(file).name)
+        pack(folder, path)
+    return path
+
+
+def content_type(name):
+    return mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+
+def compare_listing(output_dir):
+    """
+    Count the inodes and time a directory walk over the loose folders and the bundles.
+    """
+    loose, bundles = [], []
+    start = time.perf_counter()
+    for root, _, files in os.walk(output_dir):
+        for name in files:
+            (bundles if name.endswith(BUNDLE_SUFFIX) else loose).append(os.stat(os.path.join(root, name)).st_size)
+    walk = time.perf_counter() - start
+    print(f"{len(loose)} loose files ({sum(loose) / 2 ** 20:.1f} MiB), "
+          f"{len(bundles)} bundles ({sum(bundles) / 2 ** 20:.1f} MiB); walked and stat'ed in {walk * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack lecture output folders into single indexed bundles.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    pack_command = commands.add_parser("pack", help="Pack lecture folders (all of them in the output directory by default)")
+    pack_command.add_argument("folders", nargs="*")
+    pack_command.add_argument("--keep", action="store_true", help="Keep the loose files after packing")
+    unpack_command = commands.add_parser("unpack", help="Restore the loose files of bundles")
+    unpack_command.add_argument("bundles", nargs="+")
+    list_command = commands.add_parser("list", help="Show a bundle's members")
+    list_command.add_argument("bundle")
+    extract_command = commands.add_parser("extract", help="Write one member to a file or stdout")
+    extract_command.add_argument("bundle")
+    extract_command.add_argument("member")
+    extract_command.add_argument("destination", nargs="?")
+    stats_command = commands.add_parser("stats", help="Compare loose files and bundles in an output directory")
+    stats_command.add_argument("output_dir", nargs="?")
+    args = parser.parse_args()
+
+    if args.command == "pack":
+        folders = args.folders
+        if not folders:
+            import checkFolder
+            folders = [path for path in Path(checkFolder.output_dir).iterdir()
+                       if path.is_dir() and checkFolder.completion_marker(path, path.name).exists()]
+        for folder in folders:
+            pack(folder, remove=not args.keep)
+    elif args.command == "unpack":
+        for path in args.bundles:
+            print(f"Unpacked {path} into {unpack(path, remove=True)}")
+    elif args.command == "list":
+        with BundleReader(args.bundle) as bundle:
+            for name, member in bundle.members.items():
+                print(f"{member['size']:>10}  {name}")
+    elif args.command == "extract":
+        with BundleReader(args.bundle) as bundle:
+            if args.destination:
+                bundle.extract(args.member, args.destination)
+            else:
+                sys.stdout.buffer.write(bundle.view(args.member))
+    else:
+        if args.output_dir is None:
+            import checkFolder
+            args.output_dir = checkFolder.output_dir
+        compare_listing(args.output_dir)
@@ -0,0 +1,240 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+_lock = threading.Lock()
+_local = threading.local()
+_stage_listeners = []
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    # Label values may contain file names; backslash, quote and newline must be escaped
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+    return "{" + body + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        # Copied under the lock so a scrape never iterates a dict a job is adding to
+        with _lock:
+            values = sorted(self.values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, value, **labels):
+        with _lock:
+            self.values[_label_key(labels)] = value
+
+    def render(self):
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.series = {}
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with _lock:
+            series = self.series.setdefault(key, {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with _lock:
+            snapshot = sorted((key, {"buckets": list(series["buckets"]), "sum": series["sum"],
+                                     "count": series["count"]}) for key, series in self.series.items())
+        for key, series in snapshot:
+            for bound, bucket_count in zip(self.buckets, series["buckets"]):
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {series['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {series['sum']}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+
+stage_seconds = Histogram("smartrec_stage_seconds", "Wall time spent in each pipeline stage.")
+stage_calls = Counter("smartrec_stage_calls_total", "Pipeline stage calls by outcome.")
+stage_units = Counter("smartrec_stage_units_total", "Work processed per stage (audio seconds, characters, bytes, pages).")
+stage_rate = Gauge("smartrec_stage_units_per_second", "Units processed per wall-clock second in the last call of a stage.")
+queue_depth = Gauge("smartrec_queue_depth", "Jobs waiting in the worker queue.")
+queue_wait = Histogram("smartrec_queue_wait_seconds", "Time jobs spent queued before starting, by priority class.")
+peak_rss = Gauge("smartrec_peak_rss_bytes", "Peak resident set size of the worker process.")
+model_selected = Counter("smartrec_model_selected_total", "Recordings transcribed by each Whisper model.")
+thread_budget = Gauge("smartrec_thread_budget", "CPU threads granted to this process by the thread budget.")
+summary_block_seconds = Histogram("smartrec_summary_block_seconds",
+                                  "Time from a transcript block being queued to its rolling summary being ready.")
+
+REGISTRY = [stage_seconds, stage_calls, stage_units, stage_rate, queue_depth, queue_wait, peak_rss,
+            model_selected, thread_budget, summary_block_seconds]
+
+
+def peak_rss_bytes():
+    """
+    Peak resident memory of this process, or None where getrusage is unavailable.
+    """
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+def add_stage_listener(listener):
+    """
+    Register a callable(event, stage) run in the stage's own thread on "start" and "end".
+    """
+    _stage_listeners.append(listener)
+
+
+def remove_stage_listener(listener):
+    if listener in _stage_listeners:
+        _stage_listeners.remove(listener)
+
+
+def _notify(event, stage):
+    for listener in list(_stage_listeners):
+        listener(event, stage)
+
+
+def add_units(**units):
+    """
+    Record work done by the stage currently being timed, e.g. add_units(audio_seconds=30).
+    """
+    record = getattr(_local, "record", None)
+    if record is None:
+        return
+    for unit, amount in units.items():
+        record["units"][unit] = record["units"].get(unit, 0) + amount
+
+
+def timed(stage):
+    """
+    Decorator recording wall time, outcome and per-unit throughput for a pipeline stage.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            parent = getattr(_local, "record", None)
+            record = {"stage": stage, "units": {}}
+            _local.record = record
+            status = "ok"
+            _notify("start", stage)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                status = "error"
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                _notify("end", stage)
+                _local.record = parent
+                record["seconds"] = round(elapsed, 4)
+                record["status"] = status
+                stage_seconds.observe(elapsed, stage=stage)
+                stage_calls.inc(stage=stage, status=status)
+                for unit, amount in record["units"].items():
+                    stage_units.inc(amount, stage=stage, unit=unit)
+                    if elapsed > 0:
+                        record.setdefault("rates", {})[f"{unit}_per_second"] = round(amount / elapsed, 3)
+                        stage_rate.set(amount / elapsed, stage=stage, unit=unit)
+                rss = peak_rss_bytes()
+                if rss is not None:
+                    peak_rss.set(rss)
+                timings = getattr(_local, "timings", None)
+                if timings is not None:
+                    timings.append(record)
+        return wrapper
+    return decorator
+
+
+class RecordingTimings:
+    """
+    Collects every timed stage call made while processing one recording and
+    writes them to timings.json in its output folder.
+    """
+
+    def __init__(self, output_folder):
+        self.output_folder = output_folder
+        self.stages = []
+        self.started = None
+        self.parent = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        # A preempting job runs nested inside another recording's timings
+        self.parent = getattr(_local, "timings", None)
+        _local.timings = self.stages
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _local.timings = self.parent
+        report = {
+            "total_seconds": round(time.perf_counter() - self.started, 4),
+            "peak_rss_bytes": peak_rss_bytes(),
+            "completed": exc_type is None,
+            "stages": self.stages,
+        }
+        try:
+            with open(os.path.join(self.output_folder, "timings.json"), "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+        except OSError as e:
+            print(f"Could not write timings: {e}")
+        return False
+
+
+def render_prometheus():
+    """
+    Render every metric in the Prometheus text exposition format.
+    """
+    rss = peak_rss_bytes()
+    if rss is not None:
+        peak_rss.set(rss)
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,195 @@
+import argparse
+import gc
+import importlib.util
+import multiprocessing
+import os
+import sys
+import time
+
+SUMMARY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "3. Summary generation")
+MEMORY_FIELDS = {"Rss": "rss", "Pss": "pss", "Shared_Clean": "shared_clean",
+                 "Shared_Dirty": "shared_dirty", "Private_Clean": "private_clean", "Private_Dirty": "private_dirty"}
+
+
+def load_analysis():
+    """
+    Import the summary app's analysis module (it lives in a sibling folder) under its usual name,
+    so forked workers that use it find the parent's loaded models.
+    """
+    if "analysis" not in sys.modules:
+        spec = importlib.util.spec_from_file_location("analysis", os.path.join(SUMMARY_DIR, "analysis.py"))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules["analysis"] = module
+        spec.loader.exec_module(module)
+    return sys.modules["analysis"]
+
+
+def load_models(whisper=("base",), summarizer=True, embeddings=False):
+    """
+    Load the Whisper, BART summarization and MiniLM embedding models into the usual module caches.
+    """
+    import checkFolder
+
+    start = time.perf_counter()
+    for name in whisper:
+        checkFolder.load_whisper_model(name, pin=True)
+    if summarizer:
+        checkFolder.load_summarizer()
+    if embeddings:
+        load_analysis().get_embeddings()
+    print(f"Loaded models in {time.perf_counter() - start:.1f}s")
+
+
+def torch_modules():
+    """
+    Every loaded torch module whose weights workers should share.
+    """
+    import checkFolder
+
+    modules = list(checkFolder._whisper_models.values())
+    modules += [summarizer.model for summarizer in checkFolder._summarizers.values()]
+    analysis = sys.modules.get("analysis")
+    if analysis is not None:
+        for (kind, _), model in analysis._models.items():
+            if kind == "embeddings":
+                modules.append(model.client)
+    return modules
+
+
+def freeze_heap():
+    """
+    Move every object allocated so far out of the garbage collector's reach so
+    collections in the children do not write to (and so copy) the parent's pages.
+    """
+    gc.collect()
+    gc.freeze()
+
+
+def memory_usage(pid=None):
+    """
+    Resident, proportional and private memory of a process in bytes, from
+    /proc/<pid>/smaps_rollup. PSS splits shared pages between the processes
+    mapping them, so summing it over workers gives their real total. None off Linux.
+    """
+    path = f"/proc/{pid or os.getpid()}/smaps_rollup"
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    usage = {}
+    for line in lines:
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].rstrip(":") in MEMORY_FIELDS:
+            usage[MEMORY_FIELDS[parts[0].rstrip(":")]] = int(parts[1]) * 1024
+    usage["private"] = usage.get("private_clean", 0) + usage.get("private_dirty", 0)
+    return usage
+
+
+def _adopt(whisper_models, summarizers, target, args, kwargs):
+    # Runs in a spawned child: install the parent's shared-memory models in the caches
+    import checkFolder
+
+    checkFolder._whisper_models.update(whisper_models)
+    checkFolder._pinned_whisper_models.update(whisper_models)
+    checkFolder._summarizers.update(summarizers)
+    target(*args, **kwargs)
+
+
+def start_workers(target, processes, args=(), kwargs=None, mode="fork"):
+    """
+    Start `processes` workers running target(*args, **kwargs) that reuse the models already loaded here.
+
+    mode="fork" freezes the heap and forks, so every worker maps the parent's
+    weight pages copy-on-write. mode="shared" (for platforms without fork)
+    moves the weights into shared memory and hands them to spawned workers.
+    """
+    kwargs = kwargs or {}
+    if mode == "fork":
+        freeze_heap()
+        context = multiprocessing.get_context("fork")
+        workers = [context.Process(target=target, args=args, kwargs=kwargs) for _ in range(processes)]
+    elif mode == "shared":
+        import checkFolder
+        import torch.multiprocessing
+
+        for module in torch_modules():
+            module.share_memory()
+        context = torch.multiprocessing.get_context("spawn")
+        shared = (dict(checkFolder._whisper_models), dict(checkFolder._summarizers))
+        workers = [context.Process(target=_adopt, args=shared + (target, args, kwargs)) for _ in range(processes)]
+    else:
+        raise ValueError(f"Unknown worker start mode: {mode}")
+    for worker in workers:
+        worker.start()
+    return workers
+
+
+def _hold(ready, stop, load_options):
+    if load_options is not None:
+        load_models(**load_options)
+    ready.set()
+    stop.wait()
+
+
+def _measure(processes, load_options, preload, mode):
+    context = multiprocessing.get_context("fork" if mode == "fork" else "spawn")
+    stop = context.Event()
+    readies = [context.Event() for _ in range(processes)]
+    if preload:
+        load_models(**load_options)
+        if mode == "fork":
+            freeze_heap()
+            workers = [context.Process(target=_hold, args=(ready, stop, None)) for ready in readies]
+            for worker in workers:
+                worker.start()
+        else:
+            workers = [start_workers(_hold, 1, args=(ready, stop, None), mode=mode)[0] for ready in readies]
+    else:
+        workers = [context.Process(target=_hold, args=(ready, stop, load_options)) for ready in readies]
+        for worker in workers:
+            worker.start()
+
+    for ready in readies:
+        ready.wait()
+    time.sleep(1)
+    usages = [memory_usage(worker.pid) or {} for worker in workers]
+    parent = memory_usage() if preload else None
+    stop.set()
+    for worker in workers:
+        worker.join()
+    return usages, parent
+
+
+def compare_memory(processes=4, whisper=("base",), summarizer=True, embeddings=False, mode="fork"):
+    """
+    Report per-worker and total memory for N workers that each load their own
+    models against N workers sharing the models loaded once in the parent.
+
+    The preloaded run must come second: it loads models into this process.
+    """
+    load_options = {"whisper": tuple(whisper), "summarizer": summarizer, "embeddings": embeddings}
+    mib = 2 ** 20
+    for label, preload in (("separate", False), (f"preloaded ({mode})", True)):
+        usages, parent = _measure(processes, load_options, preload, mode)
+        print(f"\n{label}: {processes} workers")
+        print(f"{'worker':>8} {'RSS MiB':>9} {'PSS MiB':>9} {'private MiB':>12} {'shared MiB':>11}")
+        for i, usage in enumerate(usages):
+            shared = usage.get("shared_clean", 0) + usage.get("shared_dirty", 0)
+            print(f"{i:>8} {usage.get('rss', 0) / mib:9.0f} {usage.get('pss', 0) / mib:9.0f} "
+                  f"{usage.get('private', 0) / mib:12.0f} {shared / mib:11.0f}")
+        total_pss = sum(usage.get("pss", 0) for usage in usages) + (parent or {}).get("pss", 0)
+        total_rss = sum(usage.get("rss", 0) for usage in usages)
+        print(f"   total: PSS {total_pss / mib:.0f} MiB (including parent), sum of RSS {total_rss / mib:.0f} MiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare worker memory with and without shared preloaded models.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--whisper", default="base", help="Comma-separated Whisper models to load")
+    parser.add_argument("--no-summarizer", action="store_true")
+    parser.add_argument("--embeddings", action="store_true", help="Also load the MiniLM embeddings")
+    parser.add_argument("--mode", default="fork", choices=["fork", "shared"])
+    args = parser.parse_args()
+    compare_memory(args.workers, [name for name in args.whisper.split(",") if name],
+                   summarizer=not args.no_summarizer, embeddings=args.embeddings, mode=args.mode)
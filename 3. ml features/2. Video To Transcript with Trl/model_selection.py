@@ -0,0 +1,119 @@
+import json
+import os
+import threading
+import time
+
+import metrics
+
+# Whisper sizes from fastest to most accurate
+MODELS = [name for name in os.environ.get("SMARTREC_MODELS", "tiny,base,small,medium").split(",") if name]
+SLO_MINUTES = float(os.environ.get("SMARTREC_SLO_MINUTES", "60"))
+STATS_FILE = os.environ.get("SMARTREC_MODEL_STATS",
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_rtf.json"))
+MODEL_FILE = "model.json"
+
+# Real-time factors (wall seconds per audio second) assumed on CPU until measured
+DEFAULT_RTF = {"tiny": 0.05, "base": 0.1, "small": 0.3, "medium": 0.8, "large": 1.6}
+EWMA_ALPHA = 0.3
+# Rough allowance for summary, translation and PDF rendering after transcription
+OTHER_STAGES_SECONDS = 120
+# Keep some headroom so a slower than usual run still meets the target
+SAFETY_FACTOR = 1.2
+
+_lock = threading.Lock()
+
+
+def load_rtf(stats_file=STATS_FILE):
+    rtf = dict(DEFAULT_RTF)
+    try:
+        with open(stats_file, "r", encoding="utf-8") as f:
+            rtf.update(json.load(f))
+    except (OSError, ValueError):
+        pass
+    return rtf
+
+
+def record_rtf(model_name, audio_seconds, wall_seconds, stats_file=STATS_FILE):
+    """
+    Fold a measured transcription run into the model's moving average real-time factor.
+    """
+    if audio_seconds <= 0:
+        return None
+    measured = wall_seconds / audio_seconds
+    with _lock:
+        measurements = {}
+        try:
+            with open(stats_file, "r", encoding="utf-8") as f:
+                measurements = json.load(f)
+        except (OSError, ValueError):
+            pass
+        previous = measurements.get(model_name)
+        measurements[model_name] = measured if previous is None else EWMA_ALPHA * measured + (1 - EWMA_ALPHA) * previous
+        with open(stats_file, "w", encoding="utf-8") as f:
+            json.dump(measurements, f, indent=2)
+    print(f"Whisper '{model_name}' ran at RTF {measured:.3f} (average {measurements[model_name]:.3f})")
+    return measurements[model_name]
+
+
+def restrict_models(names):
+    """
+    From now on only choose among `names` (the models a worker pool preloaded), fastest first.
+    """
+    global MODELS
+    names = set(names)
+    MODELS = ([name for name in MODELS if name in names]
+              + sorted(names - set(MODELS), key=lambda name: DEFAULT_RTF.get(name, 1.0)))
+
+
+def choose_model(audio_seconds, backlog_seconds=0.0, budget_seconds=None, models=None):
+    """
+    Pick the most accurate model that still gets this recording and the audio
+    queued behind it transcribed within the time budget, at measured speeds.
+
+    Falls back to the fastest model when none of them fits.
+    """
+    models = models or MODELS
+    budget = SLO_MINUTES * 60 if budget_seconds is None else budget_seconds
+    rtf = load_rtf()
+    work = (audio_seconds or 0.0) + (backlog_seconds or 0.0)
+
+    choice = None
+    for name in models:
+        estimate = work * rtf.get(name, DEFAULT_RTF.get(name, 1.0)) * SAFETY_FACTOR + OTHER_STAGES_SECONDS
+        if estimate <= budget or choice is None:
+            choice = {"model": name, "estimated_seconds": round(estimate, 1), "within_slo": estimate <= budget}
+
+    choice.update({
+        "audio_seconds": round(audio_seconds or 0.0, 1),
+        "backlog_seconds": round(backlog_seconds or 0.0, 1),
+        "budget_seconds": round(budget, 1),
+        "rtf": round(rtf.get(choice["model"], 1.0), 4),
+        "chosen_at": time.time(),
+    })
+    metrics.model_selected.inc(model=choice["model"])
+    print(f"Selected Whisper '{choice['model']}' for {choice['audio_seconds']:.0f}s of audio "
+          f"(+{choice['backlog_seconds']:.0f}s backlog): estimated {choice['estimated_seconds']:.0f}s "
+          f"of {choice['budget_seconds']:.0f}s budget")
+    return choice
+
+
+def remaining_budget(input_file, slo_minutes=None):
+    """
+    Seconds left before the recording misses its target, counted from when it was uploaded.
+    """
+    slo = SLO_MINUTES if slo_minutes is None else float(slo_minutes)
+    waited = max(0.0, time.time() - os.path.getmtime(input_file))
+    return slo * 60 - waited
+
+
+def save_choice(output_folder, choice):
+    """
+    Record which model produced the transcript next to the other outputs.
+    """
+    with open(os.path.join(output_folder, MODEL_FILE), "w", encoding="utf-8") as f:
+        json.dump(choice, f, indent=2)
+
+
+if __name__ == "__main__":
+    for name, value in sorted(load_rtf().items(), key=lambda item: item[1]):
+        print(f"{name:>8}: RTF {value:.3f}")
@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+import audio_stream
+import metrics
+import shared_json
+import webm_index
+
+CACHE_DIR = os.environ.get("SMARTREC_PCM_CACHE",
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), "pcm_cache"))
+MAX_CACHE_BYTES = int(os.environ.get("SMARTREC_PCM_CACHE_MB", "4096")) * 1024 * 1024
+ENABLED = os.environ.get("SMARTREC_PCM_CACHE_ENABLED", "1") != "0"
+
+# Fixed 64-byte header followed by raw little-endian samples:
+# magic, sample rate, channels, dtype code, sample count, source size,
+# source mtime (ns), seconds the original decode took (its wall time, not
+# just the part transcription waited for).
+MAGIC = b"SMRPCM01"
+HEADER = struct.Struct("<8sIHHQQQd")
+HEADER_SIZE = 64
+DTYPES = {1: np.int16, 2: np.float32}
+DTYPE_CODES = {np.dtype(np.int16): 1, np.dtype(np.float32): 2}
+STATS_FILE = "stats.json"
+
+
+def cache_path(source_path, cache_dir=CACHE_DIR):
+    """
+    Cache file for a recording, keyed on its absolute path, size and modification time.
+    """
+    stat = os.stat(source_path)
+    key = f"{os.path.abspath(source_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(cache_dir, f"{stem}-{digest}.pcm")
+
+
+def read_header(path):
+    with open(path, "rb") as f:
+        raw = f.read(HEADER.size)
+    magic, sample_rate, channels, dtype_code, samples, source_size, source_mtime_ns, decode_seconds = HEADER.unpack(raw)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a PCM cache file")
+    return {
+        "sample_rate": sample_rate,
+        "channels": channels,
+        "dtype": DTYPES[dtype_code],
+        "samples": samples,
+        "source_size": source_size,
+        "source_mtime_ns": source_mtime_ns,
+        "decode_seconds": decode_seconds,
+    }
+
+
+def open_pcm(path):
+    """
+    Map a cache file without copying it; processes mapping the same file share its pages.
+    """
+    header = read_header(path)
+    if header["samples"] == 0:
+        return header, np.zeros(0, dtype=header["dtype"])
+    samples = np.memmap(path, dtype=header["dtype"], mode="r", offset=HEADER_SIZE,
+                        shape=(header["samples"] * header["channels"],))
+    return header, samples
+
+
+def _record(saved_seconds=0.0, hit=False, cache_dir=CACHE_DIR):
+    # Every process using the cache updates the same stats file
+    def change(stats):
+        stats["hits" if hit else "misses"] += 1
+        stats["saved_seconds"] += saved_seconds
+    return shared_json.update(os.path.join(cache_dir, STATS_FILE), change,
+                              {"hits": 0, "misses": 0, "saved_seconds": 0.0})
+
+
+def cached_duration(source_path, cache_dir=CACHE_DIR):
+    """
+    Duration in seconds of a recording already in the cache, or None.
+    """
+    path = cache_path(source_path, cache_dir)
+    if not os.path.exists(path):
+        return None
+    header = read_header(path)
+    return header["samples"] / header["sample_rate"]
+
+
+def evict(max_bytes=MAX_CACHE_BYTES, cache_dir=CACHE_DIR, keep=None):
+    """
+    Delete least recently used cache files until the cache fits in `max_bytes`.
+    """
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(".pcm"):
+            path = os.path.join(cache_dir, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+            total -= size
+            print(f"Evicted PCM cache file {os.path.basename(path)} ({size / 2**20:.1f} MiB)")
+        except OSError:
+            pass
+    return total
+
+
+class CachedPCMWindows:
+    """
+    Iterate a recording as float32 windows like audio_stream.PCMStream, reading
+    from the memory-mapped cache when present. On a miss the stream is decoded
+    once and written to the cache as it is consumed.
+    """
+
+    def __init__(self, source_path, window_seconds=30, sample_rate=audio_stream.SAMPLE_RATE, cache_dir=CACHE_DIR):
+        self.source_path = str(source_path)
+        self.window_seconds = window_seconds
+        self.sample_rate = sample_rate
+        self.cache_dir = cache_dir
+        self.path = cache_path(self.source_path, cache_dir)
+        self.decoded_seconds = 0.0
+        self.decode_wait_seconds = 0.0
+        self.decode_seconds = 0.0
+        self.hit = None
+
+    def __iter__(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if os.path.exists(self.path):
+            yield from self._from_cache()
+        else:
+            yield from self._decode_and_store()
+
+    def _from_cache(self):
+        start = time.perf_counter()
+        header, samples = open_pcm(self.path)
+        os.utime(self.path)  # mark as recently used for eviction
+        self.hit = True
+        window = int(self.window_seconds * header["sample_rate"])
+        scale = 32768.0 if header["dtype"] is np.int16 else 1.0
+        self.decode_wait_seconds = time.perf_counter() - start
+        for offset in range(0, len(samples), window):
+            start = time.perf_counter()
+            chunk = np.asarray(samples[offset:offset + window], dtype=np.float32) / scale
+            self.decoded_seconds += len(chunk) / header["sample_rate"]
+            self.decode_wait_seconds += time.perf_counter() - start
+            self.decode_seconds = self.decode_wait_seconds
+            yield chunk
+        stats = _record(saved_seconds=max(0.0, header["decode_seconds"] - self.decode_wait_seconds),
+                        hit=True, cache_dir=self.cache_dir)
+        print(f"PCM cache hit for {os.path.basename(self.source_path)}: saved "
+              f"{header['decode_seconds']:.1f}s of decoding ({stats['saved_seconds']:.1f}s saved in total)")
+
+    def _decode_and_store(self):
+        self.hit = False
+        stream = webm_index.stream_for(self.source_path, window_seconds=self.window_seconds)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        start = time.perf_counter()
+        samples = 0
+        completed = False
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(b"\0" * HEADER_SIZE)
+                for window in stream:
+                    pcm = np.clip(window * 32768.0, -32768, 32767).astype("<i2")
+                    f.write(pcm.tobytes())
+                    samples += len(pcm)
+                    self.decoded_seconds = stream.decoded_seconds
+                    self.decode_wait_seconds = stream.decode_wait_seconds
+                    self.decode_seconds = stream.decode_seconds
+                    yield window
+
+                stat = os.stat(self.source_path)
+                f.seek(0)
+                f.write(HEADER.pack(MAGIC, self.sample_rate, 1, DTYPE_CODES[np.dtype(np.int16)], samples,
+                                    stat.st_size, stat.st_mtime_ns, stream.decode_seconds))
+            os.replace(temp_path, self.path)
+            completed = True
+        finally:
+            if not completed and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        _record(hit=False, cache_dir=self.cache_dir)
+        evict(cache_dir=self.cache_dir, keep=self.path)
+        print(f"Cached decoded PCM for {os.path.basename(self.source_path)} "
+              f"({samples * 2 / 2**20:.1f} MiB, decoded in {time.perf_counter() - start:.1f}s)")
+
+
+@metrics.timed("decode")
+def decode(source_path, window_seconds=30):
+    """
+    Decode a whole recording without transcribing or caching it; returns the audio seconds decoded.
+    """
+    stream = webm_index.stream_for(source_path, window_seconds=window_seconds)
+    for _ in stream:
+        pass
+    metrics.add_units(audio_seconds=stream.decoded_seconds, decode_seconds=stream.decode_seconds)
+    return stream.decoded_seconds
+
+
+def windows(source_path, window_seconds=30):
+    """
+    PCM windows for a recording, through the cache unless it is disabled.
+    """
+    if ENABLED:
+        return CachedPCMWindows(source_path, window_seconds=window_seconds)
+    return webm_index.stream_for(source_path, window_seconds=window_seconds)
+
+
+def report(cache_dir=CACHE_DIR):
+    stats_path = os.path.join(cache_dir, STATS_FILE)
+    if not os.path.exists(stats_path):
+        print("PCM cache has not been used yet.")
+        return
+    with open(stats_path, "r", encoding="utf-8") as f:
+        stats = json.load(f)
+    size = sum(os.path.getsize(os.path.join(cache_dir, name))
+               for name in os.listdir(cache_dir) if name.endswith(".pcm"))
+    print(f"PCM cache: {stats['hits']} hits, {stats['misses']} misses, "
+          f"{stats['saved_seconds']:.1f}s of decoding saved, {size / 2**20:.1f} MiB on disk")
+
+
+if __name__ == "__main__":
+    report()
@@ -0,0 +1,293 @@
+import cProfile
+import html
+import os
+import pstats
+import sys
+import threading
+import time
+import zlib
+from collections import Counter, defaultdict
+
+import metrics
+
+SAMPLE_INTERVAL = 0.01
+TOP_N = 25
+MAX_STACK_DEPTH = 128
+
+# Profilers of the jobs running on each thread; a preempting job nests inside another
+_local = threading.local()
+# cProfile hooks are per interpreter thread but share one tool slot, so only one
+# job in the process is profiled deterministically at a time
+_deterministic_lock = threading.Lock()
+_running = set()
+_running_lock = threading.Lock()
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _function_label(function):
+    filename, line, name = function
+    if filename == "~":  # built-ins
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def stacks_from_stats(stats, min_fraction=1e-4):
+    """
+    Turn a cProfile call graph into collapsed stacks weighted in microseconds, so
+    deterministic profiles get the same flame graph as sampled ones.
+
+    pstats keeps only caller -> callee edges, not whole stacks, so each function's
+    time under a given caller is split among its callees in proportion to its totals.
+    """
+    callees = defaultdict(dict)
+    for function, (_, _, _, _, callers) in stats.stats.items():
+        for caller, (_, _, _, edge_cumulative) in callers.items():
+            callees[caller][function] = edge_cumulative
+    roots = [function for function, (_, _, _, _, callers) in stats.stats.items()
+             if not any(caller in stats.stats for caller in callers)]
+    total = sum(stats.stats[function][3] for function in roots)
+    stacks = Counter()
+
+    def walk(function, seconds, stack):
+        _, _, own, cumulative, _ = stats.stats[function]
+        share = seconds / cumulative if cumulative else 0.0
+        stack = stack + (_function_label(function),)
+        self_seconds = own * share
+        for callee, edge_cumulative in callees[function].items():
+            child = edge_cumulative * share
+            if (callee in stats.stats and len(stack) < MAX_STACK_DEPTH and child >= total * min_fraction
+                    and _function_label(callee) not in stack):
+                walk(callee, child, stack)
+            else:
+                # Recursion, depth limit and slivers stay in the caller's own time
+                self_seconds += child
+        microseconds = int(round(self_seconds * 1e6))
+        if microseconds:
+            stacks[stack] += microseconds
+
+    for root in roots:
+        walk(root, stats.stats[root][3], ())
+    return stacks
+
+
+def write_collapsed(stacks, path):
+    """
+    Write stacks in the collapsed "root;child;leaf count" format used by flame graph tools.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{';'.join(stack)} {count}\n")
+
+
+def write_top_table(stacks, path, title, top_n=TOP_N, unit="samples"):
+    """
+    Write the top-N functions by self and inclusive sample counts.
+    """
+    total = sum(stacks.values()) or 1
+    self_counts = Counter()
+    inclusive_counts = Counter()
+    for stack, count in stacks.items():
+        self_counts[stack[-1]] += count
+        for label in set(stack):
+            inclusive_counts[label] += count
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"{title}: {total} {unit}\n\n")
+        f.write(f"{'self %':>8} {'total %':>8}  function\n")
+        for label, count in self_counts.most_common(top_n):
+            f.write(f"{100 * count / total:8.2f} {100 * inclusive_counts[label] / total:8.2f}  {label}\n")
+
+
+def write_flame_graph(stacks, path, title, width=1200, row_height=16, unit="samples"):
+    """
+    Render collapsed stacks as a standalone SVG flame graph.
+    """
+    root = {"children": {}, "count": 0}
+    for stack, count in stacks.items():
+        root["count"] += count
+        node = root
+        for label in stack:
+            node = node["children"].setdefault(label, {"children": {}, "count": 0})
+            node["count"] += count
+
+    total = root["count"] or 1
+    rects = []
+
+    def layout(node, x, depth):
+        for label, child in sorted(node["children"].items()):
+            w = width * child["count"] / total
+            if w >= 0.5:
+                rects.append((x, depth, w, label, child["count"]))
+                layout(child, x, depth + 1)
+            x += w
+
+    layout(root, 0.0, 0)
+    max_depth = max((depth for _, depth, _, _, _ in rects), default=0) + 1
+    height = (max_depth + 2) * row_height
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+                f'font-family="monospace" font-size="11">\n')
+        f.write(f'<text x="4" y="{row_height - 4}">{html.escape(title)} ({total} {unit})</text>\n')
+        for x, depth, w, label, count in rects:
+            y = height - (depth + 1) * row_height
+            hue = zlib.crc32(label.encode("utf-8")) % 60
+            text = html.escape(label[: int(w / 7)]) if w > 21 else ""
+            f.write(f'<g><title>{html.escape(label)} ({count} {unit}, {100 * count / total:.1f}%)</title>'
+                    f'<rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{row_height - 1}" '
+                    f'fill="hsl({hue},85%,60%)"/>'
+                    f'<text x="{x + 2:.1f}" y="{y + row_height - 4}">{text}</text></g>\n')
+        f.write("</svg>\n")
+
+
+class StageProfiler:
+    """
+    Profiles each timed pipeline stage separately and writes collapsed stacks,
+    an SVG flame graph and a top-N table per stage into `output_dir` (plus the
+    .prof file in deterministic mode, where stacks are weighted in microseconds).
+
+    The default sampling mode walks only the stage's own thread every
+    SAMPLE_INTERVAL seconds, which keeps the overhead low enough to leave on
+    for a job in the production queue. mode="deterministic" uses cProfile instead;
+    it falls back to sampling when another job in the process is being profiled.
+
+    Only stages run on the thread that entered the profiler are recorded, and
+    while a preempting job's own profiler runs on that thread this one is paused.
+    """
+
+    def __init__(self, output_dir, mode="sample", interval=SAMPLE_INTERVAL):
+        self.output_dir = str(output_dir)
+        self.mode = mode
+        self.interval = interval
+        self.active = {}
+        self.stacks = defaultdict(Counter)
+        self.profiles = {}
+        self.sampling_seconds = 0.0
+        self.started = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.owner = None
+        self.paused = False
+        self._enabled = None
+
+    def _on_stage(self, event, stage):
+        thread_id = threading.get_ident()
+        if thread_id != self.owner or self.paused:
+            return
+        with self._lock:
+            stack = self.active.setdefault(thread_id, [])
+            if event == "start":
+                stack.append(stage)
+            elif stack:
+                stack.pop()
+                if not stack:
+                    del self.active[thread_id]
+
+        if self.mode == "deterministic":
+            if event == "start" and len(stack) == 1:
+                profile = cProfile.Profile()
+                self.profiles.setdefault(stage, []).append(profile)
+                profile.enable()
+                self._enabled = profile
+            elif event == "end" and not stack:
+                self.profiles[stage][-1].disable()
+                self._enabled = None
+
+    def _pause(self):
+        self.paused = True
+        if self._enabled is not None:
+            self._enabled.disable()
+
+    def _resume(self):
+        self.paused = False
+        if self._enabled is not None:
+            self._enabled.enable()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            start = time.perf_counter()
+            with self._lock:
+                active = {} if self.paused else {thread_id: stages[-1] for thread_id, stages in self.active.items()}
+            if active:
+                frames = sys._current_frames()
+                for thread_id, stage in active.items():
+                    frame = frames.get(thread_id)
+                    stack = []
+                    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                        stack.append(_frame_label(frame))
+                        frame = frame.f_back
+                    if stack:
+                        self.stacks[stage][tuple(reversed(stack))] += 1
+            self.sampling_seconds += time.perf_counter() - start
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.owner = threading.get_ident()
+        with _running_lock:
+            alone = not _running
+            _running.add(self)
+        if self.mode == "deterministic" and not (alone and _deterministic_lock.acquire(blocking=False)):
+            print("Another job is being profiled; sampling instead of deterministic profiling")
+            self.mode = "sample"
+        profilers = getattr(_local, "profilers", None)
+        if profilers is None:
+            profilers = _local.profilers = []
+        if profilers:
+            profilers[-1]._pause()
+        profilers.append(self)
+        metrics.add_stage_listener(self._on_stage)
+        if self.mode == "sample":
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        metrics.remove_stage_listener(self._on_stage)
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+        if self._enabled is not None:
+            self._enabled.disable()
+            self._enabled = None
+        if self.mode == "deterministic":
+            _deterministic_lock.release()
+        with _running_lock:
+            _running.discard(self)
+        profilers = _local.profilers
+        profilers.remove(self)
+        if profilers:
+            profilers[-1]._resume()
+        self.write()
+        return False
+
+    def write(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self.mode == "deterministic":
+            for stage, profiles in self.profiles.items():
+                base = os.path.join(self.output_dir, stage)
+                stats = pstats.Stats(*profiles)
+                stats.dump_stats(f"{base}.prof")
+                with open(f"{base}-top.txt", "w", encoding="utf-8") as f:
+                    stats.stream = f
+                    stats.sort_stats("cumulative").print_stats(TOP_N)
+                stacks = stacks_from_stats(stats)
+                write_collapsed(stacks, f"{base}.folded")
+                write_flame_graph(stacks, f"{base}.svg", f"{stage} stage", unit="us")
+            print(f"Deterministic profiles written to {self.output_dir}")
+            return
+
+        for stage, stacks in self.stacks.items():
+            base = os.path.join(self.output_dir, stage)
+            write_collapsed(stacks, f"{base}.folded")
+            write_flame_graph(stacks, f"{base}.svg", f"{stage} stage")
+            write_top_table(stacks, f"{base}-top.txt", f"{stage} stage")
+
+        elapsed = time.perf_counter() - self.started
+        overhead = 100 * self.sampling_seconds / elapsed if elapsed else 0.0
+        print(f"Stage profiles written to {self.output_dir} "
+              f"(sampling overhead {self.sampling_seconds:.2f}s, {overhead:.1f}% of {elapsed:.1f}s)")
@@ -0,0 +1,87 @@
+import json
+import sys
+import threading
+import time
+
+# Callables that receive every progress event dict. The job server registers
+# one per process; a plain script run can print them as JSON lines.
+_listeners = []
+_context = {}
+_lock = threading.Lock()
+
+
+def add_listener(listener):
+    with _lock:
+        _listeners.append(listener)
+
+
+def remove_listener(listener):
+    with _lock:
+        if listener in _listeners:
+            _listeners.remove(listener)
+
+
+def set_context(**fields):
+    """
+    Set fields (such as the file being processed) attached to every following event.
+    """
+    _context.clear()
+    _context.update({key: value for key, value in fields.items() if value is not None})
+
+
+def get_context():
+    return dict(_context)
+
+
+def emit(stage, **fields):
+    """
+    Publish one structured progress event to every listener.
+    """
+    event = {"time": time.time(), "stage": stage}
+    event.update(_context)
+    event.update({key: value for key, value in fields.items() if value is not None})
+    with _lock:
+        listeners = list(_listeners)
+    for listener in listeners:
+        try:
+            listener(event)
+        except Exception as e:
+            print(f"Progress listener failed: {e}", file=sys.stderr)
+    return event
+
+
+class StageProgress:
+    """
+    Tracks one stage's completed units and estimates the time remaining.
+    """
+
+    def __init__(self, stage, total=None, unit="chunks"):
+        self.stage = stage
+        self.total = total
+        self.unit = unit
+        self.started = time.perf_counter()
+        emit(stage, status="started", total=total, unit=unit)
+
+    def update(self, processed, chunk=None, chunks=None, **fields):
+        elapsed = time.perf_counter() - self.started
+        eta = None
+        if self.total and processed:
+            eta = max(0.0, elapsed / processed * (self.total - processed))
+        return emit(self.stage, status="running", chunk=chunk, chunks=chunks, processed=processed,
+                    total=self.total, unit=self.unit, elapsed_seconds=round(elapsed, 3),
+                    eta_seconds=round(eta, 3) if eta is not None else None, **fields)
+
+    def done(self, **fields):
+        elapsed = time.perf_counter() - self.started
+        return emit(self.stage, status="done", processed=self.total, total=self.total, unit=self.unit,
+                    elapsed_seconds=round(elapsed, 3), eta_seconds=0.0, **fields)
+
+
+def json_lines_listener(stream=sys.stderr):
+    """
+    Build a listener that writes each event as one line of JSON.
+    """
+    def listener(event):
+        stream.write(json.dumps(event, ensure_ascii=False) + "\n")
+        stream.flush()
+    return listener
@@ -0,0 +1,179 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import checkFolder
+import metrics
+import progress
+
+# About as much transcript as the summarization model reads at once (1024 tokens)
+BLOCK_CHARACTERS = int(os.environ.get("SMARTREC_SUMMARY_BLOCK_CHARS", "3000"))
+# A shorter final piece goes into the merge as it is instead of being summarized first
+MIN_TAIL_CHARACTERS = 400
+
+
+@metrics.timed("summary")
+def summarize_block(text, max_length=80, min_length=20):
+    summarizer = checkFolder.load_summarizer()
+    # Keep the minimum below the input length or the model pads the summary with repeats
+    min_length = min(min_length, max(1, len(text.split()) // 2))
+    metrics.add_units(characters=len(text))
+    return summarizer(text, max_length=max_length, min_length=min_length, do_sample=False,
+                      truncation=True)[0]['summary_text']
+
+
+class RollingSummarizer:
+    """
+    Summarizes the transcript block by block on a background thread while
+    transcription continues, and publishes the rolling summary (as a progress
+    event and a "-summary-partial.txt" file) whenever a block finishes. Once the
+    block summaries outgrow one model input they are condensed in the
+    background too, so the end of the lecture only needs one short merge.
+    If a block fails, the rest is left to one summary of the whole transcript at the end.
+    """
+
+    def __init__(self, output_folder, base_filename, block_characters=BLOCK_CHARACTERS):
+        self.partial_path = Path(output_folder) / f"{base_filename}-summary-partial.txt"
+        self.block_characters = block_characters
+        self.buffer = []
+        self.buffered = 0
+        self.pending = []
+        self.summaries = []
+        self.blocks = 0
+        self.block_seconds = []
+        self.failed = None
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def add(self, text):
+        """
+        Take one transcribed window. Called on the transcription thread.
+        """
+        # Publishing happens here rather than on the worker thread so job output and events stay with the job
+        self._publish_ready()
+        text = text.strip()
+        if not text or self.failed is not None:
+            return
+        self.buffer.append(text)
+        self.buffered += len(text) + 1
+        if self.buffered >= self.block_characters:
+            self._submit_block()
+
+    def _submit_block(self):
+        block = " ".join(self.buffer)
+        self.buffer = []
+        self.buffered = 0
+        self.blocks += 1
+        self.pending.append(self.executor.submit(_summarize_queued, "block", time.perf_counter(), block))
+
+    def _publish_ready(self, wait=False):
+        published = False
+        while self.pending and (wait or self.pending[0].done()):
+            try:
+                kind, summary, seconds = self.pending.pop(0).result()
+            except Exception as e:
+                self._fail(e)
+                return
+            if kind == "block":
+                self.block_seconds.append(round(seconds, 3))
+            self.summaries.append(summary)
+            published = True
+        if not published:
+            return
+        rolling = " ".join(self.summaries)
+        checkFolder.save_to_file(self.partial_path, rolling)
+        progress.emit("summary", status="partial", blocks=self.blocks, summary=rolling,
+                      block_seconds=self.block_seconds[-1] if self.block_seconds else None)
+        if len(rolling) > self.block_characters and len(self.summaries) > 1:
+            # Fold the earlier summaries into one; it stays ahead of the blocks still pending
+            self.pending.insert(0, self.executor.submit(_summarize_queued, "fold", time.perf_counter(),
+                                                        rolling, 150, 40))
+            self.summaries = []
+
+    def _fail(self, error):
+        """
+        Stop summarizing blocks; finish() summarizes the whole transcript instead.
+        """
+        self.failed = error
+        for future in self.pending:
+            future.cancel()
+        self.pending = []
+        self.buffer = []
+        self.buffered = 0
+        print(f"Rolling summary failed ({error}); the summary will be made from the full transcript")
+        progress.emit("summary", status="degraded", blocks=self.blocks, error=str(error))
+
+    def close(self):
+        """
+        Drop the blocks not yet summarized and let the worker thread exit, e.g. when transcription failed.
+        """
+        for future in self.pending:
+            future.cancel()
+        self.pending = []
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def finish(self, output_pdf_path, transcript):
+        """
+        Summarize what is left, merge the block summaries into the final summary and write its PDF.
+        Falls back to one summary of `transcript` when any block could not be summarized.
+        """
+        start = time.perf_counter()
+        try:
+            summary = self._merge()
+        finally:
+            self.executor.shutdown(cancel_futures=True)
+        if summary is None:
+            summary = summarize_block(transcript, max_length=150, min_length=50)
+        checkFolder.write_summary_pdf(summary, output_pdf_path)
+        try:
+            os.remove(self.partial_path)
+        except FileNotFoundError:
+            pass
+
+        delay = time.perf_counter() - start
+        progress.emit("summary", status="done", blocks=self.blocks, summary=summary, delay_seconds=round(delay, 3),
+                      block_seconds=self.block_seconds, degraded=self.failed is not None)
+        if self.failed is not None:
+            print(f"Summary ready {delay:.1f}s after transcription finished "
+                  f"(made from the full transcript after the rolling summary failed)")
+        else:
+            print(f"Summary ready {delay:.1f}s after transcription finished "
+                  f"({self.blocks} block(s) summarized while transcribing)")
+        if self.block_seconds:
+            print(f"Block summaries took {sum(self.block_seconds) / len(self.block_seconds):.1f}s on average, "
+                  f"{max(self.block_seconds):.1f}s at most")
+        return summary
+
+    def _merge(self):
+        """
+        The merged summary of the blocks, or None once a block has failed.
+        """
+        tail = " ".join(self.buffer)
+        leftover = None
+        if tail and (len(tail) >= MIN_TAIL_CHARACTERS or not (self.blocks or self.pending)):
+            self._submit_block()
+        elif tail:
+            leftover = tail
+        while self.pending:
+            self._publish_ready(wait=True)
+        if self.failed is not None:
+            return None
+
+        parts = self.summaries + ([leftover] if leftover else [])
+        if len(parts) <= 1:
+            return parts[0] if parts else ""
+        try:
+            return summarize_block(" ".join(parts), max_length=150, min_length=50)
+        except Exception as e:
+            self._fail(e)
+            return None
+
+
+def _summarize_queued(kind, queued_at, text, max_length=80, min_length=20):
+    """
+    Runs on the summarizer thread; the latency includes the time the block waited behind earlier ones.
+    """
+    summary = summarize_block(text, max_length, min_length)
+    seconds = time.perf_counter() - queued_at
+    metrics.summary_block_seconds.observe(seconds, kind=kind)
+    return kind, summary, seconds
@@ -0,0 +1,159 @@
+import argparse
+import difflib
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import checkFolder
+import lecture_bundle
+import metrics
+
+# Per lecture: the English sentences and each language's translation of them, in the same order
+MAP_SUFFIX = "-sentences.json"
+
+
+def map_name(lecture):
+    return f"{lecture}{MAP_SUFFIX}"
+
+
+def save_map(folder, lecture, english, translations):
+    """
+    Store the sentence map; `translations` maps language codes to lists of translated sentences.
+    """
+    path = Path(folder) / map_name(lecture)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"english": english, "translations": translations}, f, ensure_ascii=False)
+    return path
+
+
+def load_map(folder, lecture):
+    try:
+        with open(Path(folder) / map_name(lecture), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def diff_sentences(old, new):
+    """
+    Line up the old and new sentences. Returns the opcodes and, for each new
+    sentence, the index of an identical old sentence (None where it must be translated).
+    """
+    opcodes = difflib.SequenceMatcher(None, old, new, autojunk=False).get_opcodes()
+    # Sentences that only moved can reuse their old translation too
+    old_positions = {sentence: i for i, sentence in enumerate(old)}
+    sources = [None] * len(new)
+    for tag, i1, i2, j1, j2 in opcodes:
+        for offset, j in enumerate(range(j1, j2)):
+            sources[j] = i1 + offset if tag == "equal" else old_positions.get(new[j])
+    return opcodes, sources
+
+
+@metrics.timed("translate")
+def retranslate_sentences(client, sentences, target_language):
+    translated = checkFolder.translate_sentences(client, sentences, target_language) if sentences else []
+    metrics.add_units(characters=sum(len(sentence) for sentence in sentences))
+    return translated
+
+
+def apply_correction(folder, lecture, new_text, client=None, resummarize=False):
+    """
+    Bring a lecture folder's translations and PDFs up to date with a corrected
+    English transcript, re-translating only the sentences that changed.
+    """
+    folder = Path(folder)
+    english_path = folder / f"{lecture}-english.txt"
+    old_text = english_path.read_text(encoding="utf-8")
+    new_sentences = checkFolder.split_sentences(new_text)
+    report = {"lecture": lecture, "sentences": len(new_sentences), "changed_sentences": 0, "languages": 0,
+              "retranslated_characters": 0, "full_characters": 0, "rendered": []}
+    if old_text.strip() == new_text.strip():
+        print(f"{lecture}: transcript unchanged")
+        return report
+
+    sentence_map = load_map(folder, lecture)
+    if sentence_map is None or sentence_map["english"] != checkFolder.split_sentences(old_text):
+        # No usable map (older lecture, or edited by hand): every language is translated in full once
+        print(f"{lecture}: no sentence map matches the stored transcript; translating in full")
+        sentence_map = {"english": [], "translations": {}}
+    old_sentences = sentence_map["english"]
+    opcodes, sources = diff_sentences(old_sentences, new_sentences)
+    changed = [j for j, source in enumerate(sources) if source is None]
+    report["changed_sentences"] = len(changed)
+
+    present = {code: name for code, name in checkFolder.languages.items()
+               if (folder / f"{lecture}-{name.lower()}.txt").exists()}
+    if client is None and present:
+        client = checkFolder.translate_client_factory()
+    translations = {}
+    affected = {}
+    for code, name in present.items():
+        previous = sentence_map["translations"].get(code)
+        if previous is None or len(previous) != len(old_sentences):
+            targets = list(range(len(new_sentences)))
+        else:
+            targets = changed
+        translated = dict(zip(targets, retranslate_sentences(client, [new_sentences[j] for j in targets], code)))
+        translations[code] = [translated[j] if j in translated else previous[sources[j]]
+                              for j in range(len(new_sentences))]
+        report["retranslated_characters"] += sum(len(new_sentences[j]) for j in targets)
+        report["full_characters"] += len(new_text)
+        translation_path = folder / f"{lecture}-{name.lower()}.txt"
+        text = " ".join(translations[code])
+        if text != translation_path.read_text(encoding="utf-8"):
+            checkFolder.save_to_file(translation_path, text)
+            affected[code] = name
+    report["languages"] = len(present)
+
+    checkFolder.save_to_file(english_path, new_text)
+    save_map(folder, lecture, new_sentences, translations)
+    # Only the PDFs whose text actually changed are rendered again
+    checkFolder.txt_to_pdf(folder / lecture, dict(affected))
+    report["rendered"] = ["english"] + [name.lower() for name in affected.values()]
+    if resummarize:
+        checkFolder.generate_summary(new_text, folder / f"{lecture}-summary.pdf")
+
+    full = report["full_characters"]
+    share = 100 * report["retranslated_characters"] / full if full else 0.0
+    print(f"{lecture}: {len(changed)} of {len(new_sentences)} sentences changed; re-translated "
+          f"{report['retranslated_characters']} characters instead of {full} ({share:.1f}%) "
+          f"across {len(present)} languages")
+    return report
+
+
+def correct_lecture(output_dir, lecture, new_text, client=None, resummarize=False):
+    """
+    Apply a corrected transcript to a lecture stored as a folder or as a bundle.
+    """
+    folder = Path(output_dir) / lecture
+    path = lecture_bundle.bundle_path(output_dir, lecture)
+    # Held throughout, so an on-demand translation or PDF re-render cannot interleave with the correction
+    with lecture_bundle.lecture_lock(path):
+        if folder.is_dir():
+            return apply_correction(folder, lecture, new_text, client, resummarize)
+        if not path.exists():
+            raise FileNotFoundError(f"Unknown lecture: {lecture}")
+        folder = lecture_bundle.unpack(path)
+        try:
+            return apply_correction(folder, lecture, new_text, client, resummarize)
+        finally:
+            lecture_bundle.pack(folder, path, remove=True)
+
+
+def correction_key(lecture, new_text):
+    return f"{lecture}:{hashlib.sha1(new_text.encode('utf-8')).hexdigest()[:16]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Propagate a corrected English transcript to the translations and PDFs.")
+    parser.add_argument("lecture", help="Lecture name, e.g. 'Lec 2'")
+    parser.add_argument("transcript", help="Text file with the corrected English transcript")
+    parser.add_argument("--output-dir", default=checkFolder.output_dir)
+    parser.add_argument("--summary", action="store_true", help="Also regenerate the summary PDF")
+    args = parser.parse_args()
+
+    os.environ.setdefault("GOOGLE_APPLICATION_CREDENTIALS", checkFolder.credentials_path)
+    with open(args.transcript, "r", encoding="utf-8") as f:
+        corrected = f.read()
+    print(json.dumps(correct_lecture(args.output_dir, args.lecture, corrected, resummarize=args.summary)))
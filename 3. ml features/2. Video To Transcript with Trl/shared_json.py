@@ -0,0 +1,64 @@
+import json
+import os
+import threading
+import time
+
+# JSON files that several processes update (the job server, workers, CLIs):
+# each read-modify-write holds a lock file beside the JSON and replaces it atomically.
+LOCK_TIMEOUT_SECONDS = 10
+# A lock file this old was left by a process that died while holding it
+STALE_LOCK_SECONDS = 30
+
+_lock = threading.Lock()
+
+
+def load(path, default=None):
+    """
+    The JSON object at `path` laid over a copy of `default`; missing or unreadable files give the default.
+    """
+    data = dict(default or {})
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data.update(json.load(f))
+    except (OSError, ValueError):
+        pass
+    return data
+
+
+def _acquire(lock_path):
+    deadline = time.monotonic() + LOCK_TIMEOUT_SECONDS
+    while True:
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > STALE_LOCK_SECONDS:
+                    os.remove(lock_path)
+                    continue
+            except OSError:
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Timed out waiting for {lock_path}")
+            time.sleep(0.01)
+
+
+def update(path, change, default=None, indent=None):
+    """
+    Apply `change(data)` to the JSON object at `path` and write it back, without
+    losing updates made at the same time by other threads or processes. Returns the new data.
+    """
+    path = str(path)
+    lock_path = f"{path}.lock"
+    with _lock:
+        _acquire(lock_path)
+        try:
+            data = load(path, default)
+            change(data)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=indent)
+            os.replace(temp_path, path)
+        finally:
+            os.remove(lock_path)
+    return data
@@ -0,0 +1,255 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import metrics
+
+ENABLED = os.environ.get("SMARTREC_THREAD_BUDGET", "1") != "0"
+REGISTRY_DIR = os.environ.get("SMARTREC_THREAD_REGISTRY", os.path.join(tempfile.gettempdir(), "smartrec-threads"))
+# Relative CPU appetite of each stage; translation waits on the network and gets one thread
+STAGE_WEIGHTS = {"transcribe": 4, "summary": 2, "decode": 1, "pdf": 1, "translate": 0}
+DEFAULT_WEIGHT = 1
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                   "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS")
+REFRESH_SECONDS = 5
+
+
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def active_stages(registry_dir=REGISTRY_DIR):
+    """
+    Stages currently running in any pipeline process on this host, one per
+    busy thread. Entries of dead processes are removed.
+    """
+    stages = []
+    try:
+        names = os.listdir(registry_dir)
+    except FileNotFoundError:
+        return stages
+    for name in names:
+        if name.endswith(".tmp"):
+            continue
+        path = os.path.join(registry_dir, name)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if _alive(entry["pid"]):
+            stages.append(entry)
+        else:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    return stages
+
+
+def share_for(weight, stages, cores):
+    """
+    Threads for a stage of `weight` when the cores are split by weight among all active stages.
+    """
+    total = sum(entry["weight"] for entry in stages)
+    if weight <= 0 or total <= 0:
+        return 1
+    return max(1, int(cores * weight / total))
+
+
+def limit_threads(threads):
+    """
+    Cap torch intra-op threads and the OpenMP/BLAS pools of this process.
+    """
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(threads)
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+    threadpool_limits(limits=threads)
+
+
+class ThreadBudget:
+    """
+    Splits the host's cores between the pipeline stages running in all
+    processes. Each thread running a stage registers its innermost stage in a
+    shared directory; every process sizes its own thread pools from the
+    combined weight of its threads' stages and re-checks periodically, so it
+    gets more threads as other stages finish.
+    """
+
+    def __init__(self, cores=None, registry_dir=REGISTRY_DIR, weights=None):
+        self.cores = cores or available_cores()
+        self.registry_dir = registry_dir
+        self.weights = dict(STAGE_WEIGHTS, **(weights or {}))
+        self.stages = {}  # thread ident -> stack of the stages running on it
+        self.threads = None
+        self.checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _entry_path(self, thread_id):
+        return os.path.join(self.registry_dir, f"{os.getpid()}-{thread_id}.json")
+
+    def _on_stage(self, event, stage):
+        thread_id = threading.get_ident()
+        path = self._entry_path(thread_id)
+        with self._lock:
+            stack = self.stages.setdefault(thread_id, [])
+            if event == "start":
+                stack.append(stage)
+            else:
+                # Stages end innermost first; drop the one that ended, not an outer one of the same name
+                for i in range(len(stack) - 1, -1, -1):
+                    if stack[i] == stage:
+                        del stack[i]
+                        break
+            if stack:
+                # Only the innermost stage of a thread is running; nested ones wait on it
+                entry = {"pid": os.getpid(), "thread": thread_id, "stage": stack[-1],
+                         "weight": self.weights.get(stack[-1], DEFAULT_WEIGHT), "started_at": time.time()}
+                with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                    json.dump(entry, f)
+                os.replace(f"{path}.tmp", path)
+            else:
+                del self.stages[thread_id]
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        self.refresh(force=True)
+
+    def refresh(self, force=False):
+        """
+        Re-apply this process's share; cheap enough to call once per transcription window.
+        """
+        now = time.monotonic()
+        if not force and now - self.checked_at < REFRESH_SECONDS:
+            return self.threads
+        self.checked_at = now
+        with self._lock:
+            running = [stack[-1] for stack in self.stages.values()]
+        stages = active_stages(self.registry_dir)
+        if not running:
+            # Idle: an even split between the processes still working
+            threads = max(1, self.cores // max(1, len({entry["pid"] for entry in stages}) + 1))
+        else:
+            # Thread pools are per process, so the share covers all of this process's stages together
+            weight = sum(self.weights.get(stage, DEFAULT_WEIGHT) for stage in running)
+            threads = share_for(weight, stages, self.cores)
+        if threads != self.threads:
+            limit_threads(threads)
+            metrics.thread_budget.set(threads)
+            if running:
+                print(f"Thread budget for {', '.join(running)}: {threads} of {self.cores} cores "
+                      f"({len(stages)} active stage(s) on this host)")
+            self.threads = threads
+        return threads
+
+
+_budget = None
+
+
+def install(processes=1):
+    """
+    Set up budgeting in a pipeline process. Call before torch or numpy are
+    imported so the OpenMP/BLAS pools start at the initial share.
+    """
+    global _budget
+    if not ENABLED or _budget is not None:
+        return _budget
+    os.makedirs(REGISTRY_DIR, exist_ok=True)
+    _budget = ThreadBudget()
+    initial = max(1, _budget.cores // max(1, processes))
+    for name in THREAD_ENV_VARS:
+        os.environ.setdefault(name, str(initial))
+    metrics.add_stage_listener(_budget._on_stage)
+    return _budget
+
+
+def refresh():
+    if _budget is not None:
+        _budget.refresh()
+
+
+def current_share():
+    """
+    Threads this process may use right now: its budgeted share, or every core when budgeting is off.
+    """
+    if _budget is None:
+        return available_cores()
+    return _budget.refresh() or available_cores()
+
+
+def benchmark(workers=4, minutes=10, stages=("transcribe", "summary"), sample=None):
+    """
+    Run `workers` concurrent pipeline stages with and without the thread budget
+    and compare throughput in audio seconds per wall second.
+    """
+    import benchmark as pipeline_benchmark
+
+    inputs = pipeline_benchmark.prepare_inputs(pipeline_benchmark.find_sample(sample), minutes)
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark.py")
+    results = {}
+    for label, enabled in (("unmanaged", "0"), ("budgeted", "1")):
+        start = time.perf_counter()
+        processes = []
+        for i in range(workers):
+            stage = stages[i % len(stages)]
+            worker_inputs = dict(inputs, outdir=str(pipeline_benchmark.DATA_DIR / f"{minutes}m" / f"threads-{label}-{i}"))
+            env = pipeline_benchmark.stage_env(worker_inputs["outdir"], SMARTREC_THREAD_BUDGET=enabled)
+            for name in THREAD_ENV_VARS:
+                env.pop(name, None)
+            processes.append(subprocess.Popen([sys.executable, script, "_stage", stage, json.dumps(worker_inputs)],
+                                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        failed = sum(process.wait() != 0 for process in processes)
+        wall = time.perf_counter() - start
+        results[label] = {"wall_seconds": wall, "throughput": workers * minutes * 60 / wall, "failed": failed}
+
+    print(f"{workers} concurrent workers ({', '.join(stages)}) on {available_cores()} cores, {minutes} min audio each")
+    for label, result in results.items():
+        print(f"{label:>10}: {result['wall_seconds']:8.1f}s wall, "
+              f"{result['throughput']:7.2f} audio s/s, {result['failed']} failed")
+    speedup = results["budgeted"]["throughput"] / results["unmanaged"]["throughput"]
+    print(f"Budgeted throughput is {speedup:.2f}x the unmanaged default")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show the host's thread budget or benchmark it.")
+    parser.add_argument("command", nargs="?", default="status", choices=["status", "benchmark"])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--minutes", type=int, default=10)
+    parser.add_argument("--stages", default="transcribe,summary")
+    parser.add_argument("--sample")
+    args = parser.parse_args()
+    if args.command == "benchmark":
+        benchmark(args.workers, args.minutes, [stage for stage in args.stages.split(",") if stage], args.sample)
+    else:
+        stages = active_stages()
+        cores = available_cores()
+        print(f"{cores} cores, {len(stages)} active stage(s)")
+        for pid in sorted({entry["pid"] for entry in stages}):
+            own = [entry for entry in stages if entry["pid"] == pid]
+            threads = share_for(sum(entry["weight"] for entry in own), stages, cores)
+            print(f"  pid {pid} {', '.join(entry['stage'] for entry in own)}: {threads} threads")
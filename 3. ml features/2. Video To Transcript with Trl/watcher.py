@@ -0,0 +1,326 @@
+import argparse
+import ctypes
+import ctypes.util
+import hashlib
+import json
+import os
+import select
+import struct
+import sys
+import time
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+import job_server
+
+DEBOUNCE_SECONDS = 2.0
+POLL_SECONDS = 2.0
+FINGERPRINT_BYTES = 1 << 20
+# How often enqueued jobs are checked, and how many times a failing recording is enqueued
+JOB_CHECK_SECONDS = 60.0
+MAX_ENQUEUES = 3
+STATE_FILE = os.environ.get("SMARTREC_WATCHER_STATE",
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), "watcher_state.json"))
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def is_recording(name):
+    return name.lower().endswith(".webm") and not name.startswith(".")
+
+
+def fingerprint(path, sample_bytes=FINGERPRINT_BYTES):
+    """
+    Identify a recording by its size and the bytes at both ends, without reading all of it.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha1(str(size).encode("ascii"))
+    with open(path, "rb") as f:
+        digest.update(f.read(sample_bytes))
+        if size > sample_bytes:
+            f.seek(max(sample_bytes, size - sample_bytes))
+            digest.update(f.read(sample_bytes))
+    return digest.hexdigest()
+
+
+class InotifyWatch:
+    """
+    Reports names of files closed after writing or moved into a directory (Linux only).
+    """
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+
+    def read(self, timeout):
+        """
+        Wait up to `timeout` seconds and return (names, overflowed).
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return [], False
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return [], False
+        names = []
+        overflowed = False
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                overflowed = True
+            elif name:
+                names.append(os.fsdecode(name))
+        return names, overflowed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class Watcher:
+    """
+    Enqueues each new recording shortly after it is complete in the input
+    directory. A file is considered complete once its size and modification
+    time have not changed for DEBOUNCE_SECONDS; recordings whose fingerprint
+    was already enqueued, or that have outputs, are skipped.
+
+    With `job_status` (a callable returning a job's status) the enqueued jobs
+    are checked every JOB_CHECK_SECONDS, and a recording whose job failed or
+    was lost is enqueued again, up to MAX_ENQUEUES times in all.
+    """
+
+    def __init__(self, input_dir, output_dir, enqueue, debounce=DEBOUNCE_SECONDS, state_file=STATE_FILE,
+                 job_status=None):
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.enqueue = enqueue
+        self.job_status = job_status
+        self.checked_at = 0.0
+        self.debounce = debounce
+        self.state_file = state_file
+        self.pending = {}
+        self.settled = {}
+        self.seen = self._load_state()
+
+    def _load_state(self):
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        temp_path = f"{self.state_file}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.seen, f)
+        os.replace(temp_path, self.state_file)
+
+    def notice(self, name):
+        if is_recording(name):
+            self.pending[os.path.join(self.input_dir, name)] = (time.time(), None)
+
+    def notice_all(self):
+        for name in os.listdir(self.input_dir):
+            self.notice(name)
+
+    def settle(self):
+        """
+        Enqueue pending files that have stopped changing. Returns the seconds until the next check is due.
+        """
+        import checkFolder
+
+        now = time.time()
+        next_check = None
+        for path, (noticed_at, last_stat) in list(self.pending.items()):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                del self.pending[path]
+                continue
+            current = (stat.st_size, stat.st_mtime_ns)
+            if current != last_stat or now - noticed_at < self.debounce:
+                # Still being written, or not quiet for long enough yet
+                if current != last_stat:
+                    noticed_at = now
+                self.pending[path] = (noticed_at, current)
+                wait = noticed_at + self.debounce - now
+                next_check = wait if next_check is None else min(next_check, wait)
+                continue
+
+            del self.pending[path]
+            self.settled[path] = current
+            if checkFolder.is_processed(path, self.output_dir):
+                continue
+            digest = fingerprint(path)
+            if digest in self.seen and self.seen[digest].get("status") != "retry":
+                continue
+            try:
+                job_id = self.enqueue(path)
+            except (OSError, URLError) as e:
+                print(f"Could not enqueue {os.path.basename(path)}: {e}; will retry")
+                del self.settled[path]
+                self.pending[path] = (now, None)
+                continue
+            enqueues = self.seen.get(digest, {}).get("enqueues", 0) + 1
+            self.seen[digest] = {"path": path, "job": job_id, "enqueued_at": now, "status": "enqueued",
+                                 "enqueues": enqueues}
+            self._save_state()
+            print(f"Enqueued {os.path.basename(path)} as job {job_id}, "
+                  f"{now - stat.st_mtime:.1f}s after the upload finished")
+        return max(0.1, next_check) if next_check is not None else None
+
+    def check_jobs(self):
+        """
+        Look up the jobs still in flight; recordings whose job failed are queued for another attempt.
+        """
+        import checkFolder
+
+        if self.job_status is None or time.time() - self.checked_at < JOB_CHECK_SECONDS:
+            return
+        self.checked_at = time.time()
+        changed = False
+        for digest, entry in self.seen.items():
+            if entry.get("status", "enqueued") != "enqueued" or not entry.get("job"):
+                continue
+            if checkFolder.is_processed(entry["path"], self.output_dir):
+                entry["status"] = "done"
+                changed = True
+                continue
+            try:
+                status = self.job_status(entry["job"])
+            except (OSError, URLError) as e:
+                print(f"Could not check job {entry['job']}: {e}")
+                break
+            if status not in ("failed", None):
+                continue
+            # Failed, or forgotten by a restarted job server, without leaving outputs
+            changed = True
+            name = os.path.basename(entry["path"])
+            if entry.get("enqueues", 1) >= MAX_ENQUEUES:
+                entry["status"] = "failed"
+                print(f"Giving up on {name}: job {entry['job']} failed after {entry.get('enqueues', 1)} attempt(s)")
+            elif os.path.exists(entry["path"]):
+                entry["status"] = "retry"
+                print(f"Job {entry['job']} for {name} {status or 'was lost'}; enqueueing it again")
+                self.settled.pop(entry["path"], None)
+                self.pending[entry["path"]] = (time.time(), None)
+        if changed:
+            self._save_state()
+
+    def _poll(self):
+        """
+        Notice recordings that are new or changed since they last settled.
+        """
+        with os.scandir(self.input_dir) as entries:
+            for entry in entries:
+                if not is_recording(entry.name) or entry.path in self.pending:
+                    continue
+                stat = entry.stat()
+                if self.settled.get(entry.path) != (stat.st_size, stat.st_mtime_ns):
+                    self.notice(entry.name)
+
+    def run(self, use_inotify=True):
+        self.notice_all()
+        watch = None
+        if use_inotify and sys.platform.startswith("linux"):
+            try:
+                watch = InotifyWatch(self.input_dir)
+                print(f"Watching {self.input_dir} with inotify")
+            except OSError as e:
+                print(f"inotify unavailable ({e}); polling instead")
+        if watch is None:
+            print(f"Polling {self.input_dir} every {POLL_SECONDS:.0f}s")
+
+        try:
+            while True:
+                self.check_jobs()
+                timeout = self.settle()
+                if self.job_status is not None:
+                    timeout = min(timeout, JOB_CHECK_SECONDS) if timeout is not None else JOB_CHECK_SECONDS
+                if watch is not None:
+                    names, overflowed = watch.read(timeout if timeout is not None else 60)
+                    if overflowed:
+                        self.notice_all()
+                    for name in names:
+                        self.notice(name)
+                else:
+                    time.sleep(min(POLL_SECONDS, timeout) if timeout is not None else POLL_SECONDS)
+                    self._poll()
+        finally:
+            if watch is not None:
+                watch.close()
+
+
+def job_server_enqueuer(url, priority="normal"):
+    """
+    Return (enqueue, job_status) functions for the job server at `url`.
+    """
+    def enqueue(path):
+        body = {"kind": "process", "params": {"input_file": path, "priority": priority}}
+        request = Request(f"{url}/jobs", data=json.dumps(body).encode("utf-8"),
+                          headers={"Content-Type": "application/json"}, method="POST")
+        with urlopen(request, timeout=30) as response:
+            return json.load(response)["id"]
+
+    def job_status(job_id):
+        try:
+            with urlopen(f"{url}/jobs/{job_id}", timeout=30) as response:
+                return json.load(response)["status"]
+        except HTTPError as e:
+            if e.code == 404:
+                return None
+            raise
+    return enqueue, job_status
+
+
+def store_enqueuer(store_url, input_dir, priority="normal"):
+    """
+    Return (enqueue, job_status) functions for a shared job store.
+    """
+    import checkFolder
+    import job_store
+
+    store = job_store.open_store(store_url)
+
+    def enqueue(path):
+        recording = os.path.relpath(path, input_dir)
+        return store.enqueue(recording, {"priority": priority}, job_server.PRIORITIES[priority],
+                             checkFolder.recording_duration(path))
+    return enqueue, store.status
+
+
+if __name__ == "__main__":
+    import checkFolder
+
+    parser = argparse.ArgumentParser(description="Enqueue recordings as soon as uploads finish.")
+    parser.add_argument("--input-dir", default=checkFolder.input_dir)
+    parser.add_argument("--output-dir", default=checkFolder.output_dir)
+    parser.add_argument("--job-server", default=f"http://{job_server.HOST}:{job_server.PORT}")
+    parser.add_argument("--store", help="Enqueue into a shared job store (see worker.py) instead of the job server")
+    parser.add_argument("--priority", default="normal", choices=sorted(job_server.PRIORITIES))
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE_SECONDS)
+    parser.add_argument("--poll", action="store_true", help="Poll even where inotify is available")
+    args = parser.parse_args()
+
+    if args.store:
+        enqueue, job_status = store_enqueuer(args.store, args.input_dir, args.priority)
+    else:
+        enqueue, job_status = job_server_enqueuer(args.job_server, args.priority)
+    Watcher(args.input_dir, args.output_dir, enqueue, debounce=args.debounce,
+            job_status=job_status).run(use_inotify=not args.poll)
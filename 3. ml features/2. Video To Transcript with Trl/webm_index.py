@@ -0,0 +1,405 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import thread_budget
+
+# numpy and audio_stream are imported by the decoders only, so indexing and
+# duration lookups stay cheap for the scan
+
+# Matroska/WebM element IDs (with their length marker bits kept)
+EBML_HEADER = 0x1A45DFA3
+SEGMENT = 0x18538067
+SEEK_HEAD = 0x114D9B74
+INFO = 0x1549A966
+TRACKS = 0x1654AE6B
+CLUSTER = 0x1F43B675
+CUES = 0x1C53BB6B
+TAGS = 0x1254C367
+CHAPTERS = 0x1043A770
+ATTACHMENTS = 0x1941A469
+TIMECODE_SCALE = 0x2AD7B1
+TIMECODE = 0xE7
+SIMPLE_BLOCK = 0xA3
+BLOCK_GROUP = 0xA0
+BLOCK = 0xA1
+
+LEVEL1_IDS = {SEEK_HEAD, INFO, TRACKS, CLUSTER, CUES, TAGS, CHAPTERS, ATTACHMENTS}
+UNKNOWN_SEGMENT_SIZE = b"\x01\xff\xff\xff\xff\xff\xff\xff"
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".index.json"
+
+
+def index_path(recording_path):
+    return f"{recording_path}{INDEX_SUFFIX}"
+
+
+def _read_vint(f, keep_marker):
+    """
+    Read an EBML variable-length integer. Returns (value, length, is_unknown_size).
+    """
+    first = f.read(1)
+    if not first:
+        return None, 0, False
+    byte = first[0]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not byte & mask:
+        mask >>= 1
+        length += 1
+    if length > 8:
+        raise ValueError("Invalid EBML variable-length integer")
+    rest = f.read(length - 1)
+    if len(rest) < length - 1:
+        return None, 0, False
+    value = byte if keep_marker else byte & (mask - 1)
+    for b in rest:
+        value = (value << 8) | b
+    unknown = not keep_marker and value == (1 << (7 * length)) - 1
+    return value, length, unknown
+
+
+def _read_element_header(f, position):
+    f.seek(position)
+    element_id, id_length, _ = _read_vint(f, keep_marker=True)
+    if element_id is None:
+        return None
+    size, size_length, unknown = _read_vint(f, keep_marker=False)
+    if size is None:
+        return None
+    return element_id, position + id_length + size_length, None if unknown else size
+
+
+def _block_relative_timecode(f, data_start):
+    f.seek(data_start)
+    _read_vint(f, keep_marker=False)  # track number
+    raw = f.read(2)
+    return int.from_bytes(raw, "big", signed=True) if len(raw) == 2 else 0
+
+
+def _scan_cluster(f, data_start, size, file_size):
+    """
+    Walk a cluster's children for its timecode and the latest block offset.
+    Clusters written by MediaRecorder have unknown size, so the cluster ends
+    where the next top-level element begins.
+    """
+    end = data_start + size if size is not None else file_size
+    timecode = 0
+    max_relative = 0
+    position = data_start
+    while position < end:
+        header = _read_element_header(f, position)
+        if header is None:
+            break
+        element_id, child_start, child_size = header
+        if size is None and element_id in LEVEL1_IDS:
+            break
+        if child_size is None:
+            break
+        if element_id == TIMECODE:
+            f.seek(child_start)
+            timecode = int.from_bytes(f.read(child_size), "big")
+        elif element_id == SIMPLE_BLOCK:
+            max_relative = max(max_relative, _block_relative_timecode(f, child_start))
+        elif element_id == BLOCK_GROUP:
+            inner = child_start
+            while inner < child_start + child_size:
+                inner_header = _read_element_header(f, inner)
+                if inner_header is None or inner_header[2] is None:
+                    break
+                if inner_header[0] == BLOCK:
+                    max_relative = max(max_relative, _block_relative_timecode(f, inner_header[1]))
+                inner = inner_header[1] + inner_header[2]
+        position = child_start + child_size
+    return timecode, max_relative, min(position, file_size)
+
+
+def build_index(recording_path):
+    """
+    Scan a WebM file once and record where its header ends and where each cluster starts.
+    """
+    start = time.perf_counter()
+    file_size = os.path.getsize(recording_path)
+    timecode_scale = 1000000
+    clusters = []
+    last_relative = 0
+
+    with open(recording_path, "rb") as f:
+        header = _read_element_header(f, 0)
+        if header is None or header[0] != EBML_HEADER:
+            raise ValueError(f"{recording_path} is not a WebM/Matroska file")
+        ebml_end = header[1] + header[2]
+
+        segment = _read_element_header(f, ebml_end)
+        if segment is None or segment[0] != SEGMENT:
+            raise ValueError(f"{recording_path} has no Segment element")
+        segment_data_start = segment[1]
+        segment_end = segment_data_start + segment[2] if segment[2] is not None else file_size
+
+        header_end = None
+        position = segment_data_start
+        while position < min(segment_end, file_size):
+            element = _read_element_header(f, position)
+            if element is None:
+                break
+            element_id, data_start, size = element
+            if element_id == CLUSTER:
+                if header_end is None:
+                    header_end = position
+                timecode, last_relative, end = _scan_cluster(f, data_start, size, file_size)
+                clusters.append([position, timecode])
+                position = data_start + size if size is not None else end
+                continue
+            if element_id == INFO and size is not None:
+                inner = data_start
+                while inner < data_start + size:
+                    child = _read_element_header(f, inner)
+                    if child is None or child[2] is None:
+                        break
+                    if child[0] == TIMECODE_SCALE:
+                        f.seek(child[1])
+                        timecode_scale = int.from_bytes(f.read(child[2]), "big")
+                    inner = child[1] + child[2]
+            if size is None:
+                break
+            position = data_start + size
+
+    if header_end is None:
+        raise ValueError(f"{recording_path} contains no clusters")
+
+    seconds_per_tick = timecode_scale / 1e9
+    duration = (clusters[-1][1] + last_relative) * seconds_per_tick if clusters else 0.0
+    stat = os.stat(recording_path)
+    index = {
+        "version": INDEX_VERSION,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "ebml_header_end": ebml_end,
+        "segment_data_start": segment_data_start,
+        "header_end": header_end,
+        "timecode_scale": timecode_scale,
+        "duration_seconds": duration,
+        "clusters": [[offset, timecode * seconds_per_tick] for offset, timecode in clusters],
+    }
+    print(f"Indexed {len(clusters)} clusters ({duration:.1f}s) in {os.path.basename(recording_path)} "
+          f"in {time.perf_counter() - start:.2f}s")
+    return index
+
+
+def load_index(recording_path, build=True):
+    """
+    Load the index saved next to the recording, rebuilding it if the file changed.
+    """
+    path = index_path(recording_path)
+    stat = os.stat(recording_path)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if (index.get("version") == INDEX_VERSION and index["size"] == stat.st_size
+                and index["mtime_ns"] == stat.st_mtime_ns):
+            return index
+    except (OSError, ValueError, KeyError):
+        pass
+    if not build:
+        return None
+
+    index = build_index(recording_path)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    return index
+
+
+def _range_bytes(index, start_seconds, end_seconds):
+    """
+    Byte range of the clusters covering [start_seconds, end_seconds), and the time the first one starts.
+    """
+    clusters = index["clusters"]
+    first = 0
+    for i, (_, cluster_start) in enumerate(clusters):
+        if cluster_start <= start_seconds:
+            first = i
+        else:
+            break
+    last = len(clusters)
+    for i in range(first + 1, len(clusters)):
+        if clusters[i][1] >= end_seconds:
+            last = i
+            break
+    end_offset = clusters[last][0] if last < len(clusters) else index["size"]
+    return clusters[first][0], end_offset, clusters[first][1]
+
+
+def decode_range(recording_path, index, start_seconds, end_seconds, sample_rate=None):
+    """
+    Decode one time range by feeding ffmpeg the file header plus only the clusters
+    that cover it, so decoding can start mid-file. Returns int16 PCM.
+    """
+    import numpy as np
+    import audio_stream
+
+    sample_rate = sample_rate or audio_stream.SAMPLE_RATE
+    range_start, range_end, cluster_start = _range_bytes(index, start_seconds, end_seconds)
+
+    def feed(stdin):
+        try:
+            with open(recording_path, "rb") as f:
+                stdin.write(f.read(index["ebml_header_end"]))
+                # Re-declare the segment with unknown size so the cut stream stays valid
+                stdin.write(SEGMENT.to_bytes(4, "big") + UNKNOWN_SEGMENT_SIZE)
+                f.seek(index["segment_data_start"])
+                stdin.write(f.read(index["header_end"] - index["segment_data_start"]))
+                f.seek(range_start)
+                remaining = range_end - range_start
+                while remaining > 0:
+                    data = f.read(min(remaining, 1 << 20))
+                    if not data:
+                        break
+                    stdin.write(data)
+                    remaining -= len(data)
+        except BrokenPipeError:
+            pass
+        finally:
+            stdin.close()
+
+    # As in audio_stream.PCMStream, ffmpeg's messages go to a temp file rather than an unread pipe
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(
+            [audio_stream.FFMPEG, "-v", "error", "-f", "webm", "-i", "pipe:0", "-vn", "-ac", "1",
+             "-ar", str(sample_rate), "-f", "s16le", "pipe:1"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=errors,
+        )
+        writer = threading.Thread(target=feed, args=(process.stdin,), daemon=True)
+        writer.start()
+        data = process.stdout.read()
+        process.stdout.close()
+        process.wait()
+        writer.join()
+        if process.returncode != 0:
+            errors.seek(0)
+            error = errors.read().decode("utf-8", "replace").strip()
+            raise RuntimeError(f"ffmpeg failed to decode {start_seconds:.0f}-{end_seconds:.0f}s of {recording_path} "
+                               f"(exit code {process.returncode}): {error[-2000:]}")
+
+    pcm = np.frombuffer(data[: len(data) - len(data) % 2], dtype=np.int16)
+    skip = max(0, int(round((start_seconds - cluster_start) * sample_rate)))
+    length = int(round((end_seconds - start_seconds) * sample_rate))
+    pcm = pcm[skip:skip + length]
+    # Only the last range may end early; a short one elsewhere would shift every later window
+    expected = int(round((min(end_seconds, index["duration_seconds"]) - start_seconds) * sample_rate))
+    if len(pcm) < expected:
+        print(f"{recording_path}: {start_seconds:.0f}-{end_seconds:.0f}s decoded "
+              f"{(expected - len(pcm)) / sample_rate:.2f}s short; padding with silence")
+        pcm = np.concatenate([pcm, np.zeros(expected - len(pcm), dtype=np.int16)])
+    return pcm
+
+
+def _timed_decode_range(*args):
+    start = time.perf_counter()
+    pcm = decode_range(*args)
+    return pcm, start, time.perf_counter()
+
+
+class ParallelPCMStream:
+    """
+    Same interface as audio_stream.PCMStream, but decodes disjoint time ranges
+    of an indexed WebM on several ffmpeg processes at once and yields windows in order.
+
+    Without `workers` the process's thread budget sets how many ffmpeg processes
+    run; at most two ranges per worker are decoded ahead of the consumer, so
+    memory stays flat however long the lecture is.
+    """
+
+    def __init__(self, recording_path, window_seconds=30, sample_rate=None, range_seconds=120, workers=None):
+        import audio_stream
+
+        self.recording_path = str(recording_path)
+        self.window_seconds = window_seconds
+        self.sample_rate = sample_rate or audio_stream.SAMPLE_RATE
+        self.range_seconds = range_seconds
+        self.workers = workers
+        self.decoded_seconds = 0.0
+        self.decode_wait_seconds = 0.0
+        # Wall time during which at least one range was being decoded; ranges decode
+        # ahead of the consumer, so unlike the wait this counts the overlapped work too
+        self.decode_seconds = 0.0
+
+    def __iter__(self):
+        import numpy as np
+
+        index = load_index(self.recording_path)
+        duration = index["duration_seconds"]
+        # Pad the final range so audio after the last block timecode is not lost
+        ranges = ((start, start + self.range_seconds) for start in np.arange(0, duration + 1, self.range_seconds))
+        window = int(self.window_seconds * self.sample_rate)
+        pending = np.zeros(0, dtype=np.int16)
+        workers = self.workers or thread_budget.current_share()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = deque()
+
+            def submit_next():
+                next_range = next(ranges, None)
+                if next_range is not None:
+                    futures.append(executor.submit(_timed_decode_range, self.recording_path, index, *next_range,
+                                                   self.sample_rate))
+
+            for _ in range(2 * workers):
+                submit_next()
+            busy_until = 0.0
+            while futures:
+                start = time.perf_counter()
+                pcm, range_start, range_end = futures.popleft().result()
+                # Ranges start in submission order, so only the part past the busy period so far is new
+                self.decode_seconds += max(0.0, range_end - max(range_start, busy_until))
+                busy_until = max(busy_until, range_end)
+                # One range consumed, one more started; finished results are not kept around
+                submit_next()
+                self.decode_wait_seconds += time.perf_counter() - start
+                pending = np.concatenate([pending, pcm])
+                while len(pending) >= window:
+                    chunk, pending = pending[:window], pending[window:]
+                    self.decoded_seconds += len(chunk) / self.sample_rate
+                    yield chunk.astype(np.float32) / 32768.0
+        if len(pending):
+            self.decoded_seconds += len(pending) / self.sample_rate
+            yield pending.astype(np.float32) / 32768.0
+
+
+def indexed_duration(recording_path, build=False):
+    """
+    Duration from the recording's index, or None when it has not been indexed
+    (or, with `build`, cannot be).
+    """
+    try:
+        index = load_index(recording_path, build=build)
+    except (OSError, ValueError):
+        return None
+    return index["duration_seconds"] if index else None
+
+
+def stream_for(recording_path, window_seconds=30):
+    """
+    Pick the parallel range decoder for indexable WebM files and the plain stream otherwise.
+    """
+    import audio_stream
+
+    if str(recording_path).lower().endswith(".webm"):
+        try:
+            load_index(recording_path)
+            return ParallelPCMStream(recording_path, window_seconds=window_seconds)
+        except (OSError, ValueError) as e:
+            print(f"Falling back to sequential decode for {recording_path}: {e}")
+    return audio_stream.PCMStream(recording_path, window_seconds=window_seconds)
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        index = load_index(path)
+        print(f"{path}: {len(index['clusters'])} clusters, {index['duration_seconds']:.1f}s, "
+              f"header {index['header_end']} bytes")
@@ -0,0 +1,212 @@
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import traceback
+
+import job_store
+import thread_budget
+
+HEARTBEAT_SECONDS = 30
+POLL_SECONDS = 5
+# Job parameters a queued recording may pass through to process_recording
+PROCESS_PARAMS = ("profile", "model", "slo_minutes", "cascade_model")
+
+
+class LeaseLost(Exception):
+    """
+    Raised at a stage boundary when another worker has reclaimed the current job.
+    """
+
+
+class _Heartbeat:
+    """
+    Renews a job's lease from a background thread until stopped.
+    """
+
+    def __init__(self, store_url, job_id, worker_id, lease_seconds, interval=HEARTBEAT_SECONDS):
+        self.store_url = store_url
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.interval = interval
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        # A connection of its own so renewals never wait on the worker's transactions
+        store = job_store.open_store(self.store_url)
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    if not store.heartbeat(self.job_id, self.worker_id, self.lease_seconds):
+                        self.lost = True
+                        return
+                except Exception as e:
+                    print(f"Heartbeat for job {self.job_id} failed: {e}")
+        finally:
+            store.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+def enqueue_new(store_url=job_store.DEFAULT_STORE, priority="normal", params=None):
+    """
+    Queue every unprocessed recording in the input directory. Recordings are
+    stored relative to the input directory so each host can mount the share
+    at its own path (SMARTREC_INPUT_DIR / SMARTREC_OUTPUT_DIR).
+    """
+    import checkFolder
+    import job_server
+
+    store = job_store.open_store(store_url)
+    queued = []
+    for input_file in checkFolder.find_new_recordings(checkFolder.input_dir, checkFolder.output_dir):
+        recording = os.path.relpath(input_file, checkFolder.input_dir)
+        duration = checkFolder.recording_duration(input_file)
+        job_id = store.enqueue(recording, dict(params or {}, priority=priority),
+                               job_server.PRIORITIES[priority], duration)
+        if job_id:
+            queued.append(job_id)
+            print(f"Queued {recording} as job {job_id}")
+    store.close()
+    return queued
+
+
+def run_worker(store_url=job_store.DEFAULT_STORE, worker_id=None, lease_seconds=job_store.LEASE_SECONDS,
+               max_jobs=None, exit_when_idle=False, models=None):
+    """
+    Claim and process recordings from the shared store until stopped.
+
+    With `models`, model selection only picks among those Whisper sizes.
+    """
+    thread_budget.install()
+    import checkFolder
+    import model_selection
+
+    if models:
+        model_selection.restrict_models(models)
+
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    store = job_store.open_store(store_url)
+    heartbeat = None
+
+    def check_lease(next_stage):
+        if heartbeat is not None and heartbeat.lost:
+            raise LeaseLost(f"Lease lost before {next_stage}")
+
+    checkFolder.stage_boundary_hook = check_lease
+    print(f"Worker {worker_id} polling {store_url}")
+    done = 0
+    while max_jobs is None or done < max_jobs:
+        job = store.claim(worker_id, lease_seconds)
+        if job is None:
+            if exit_when_idle:
+                break
+            time.sleep(POLL_SECONDS)
+            continue
+
+        input_file = os.path.join(checkFolder.input_dir, job["recording"])
+        params = {key: job["params"][key] for key in PROCESS_PARAMS if key in job["params"]}
+        print(f"Worker {worker_id} processing {job['recording']} (job {job['id']})")
+        interval = min(HEARTBEAT_SECONDS, lease_seconds / 3)
+        try:
+            with _Heartbeat(store_url, job["id"], worker_id, lease_seconds, interval) as heartbeat:
+                output_folder = checkFolder.process_recording(input_file, checkFolder.output_dir, **params)
+            if not store.complete(job["id"], worker_id, str(output_folder)):
+                print(f"Job {job['id']} was reclaimed before it finished; result discarded")
+        except LeaseLost as e:
+            print(f"Abandoning job {job['id']}: {e}")
+        except Exception as e:
+            print(f"Job {job['id']} failed: {e}")
+            store.fail(job["id"], worker_id, f"{e}\n{traceback.format_exc()}")
+        finally:
+            heartbeat = None
+        done += 1
+    store.close()
+    return done
+
+
+def run_pool(processes, store_url=job_store.DEFAULT_STORE, preload=None, mode="fork", **kwargs):
+    """
+    Run several worker processes on this host and wait for them.
+
+    With `preload` (a list of Whisper model names) the models and the
+    summarizer are loaded once here and shared with the workers (see model_pool.py),
+    and the workers' model selection is limited to those models so no worker
+    loads a private copy of another size.
+    """
+    thread_budget.install(processes)
+    if preload:
+        import model_pool
+
+        model_pool.load_models(whisper=preload, summarizer=True)
+        kwargs = dict(kwargs, models=list(preload))
+        workers = model_pool.start_workers(run_worker, processes, args=(store_url,), kwargs=kwargs, mode=mode)
+    else:
+        workers = [multiprocessing.Process(target=run_worker, args=(store_url,), kwargs=kwargs)
+                   for _ in range(processes)]
+        for process in workers:
+            process.start()
+    for process in workers:
+        process.join()
+
+
+def print_stats(store_url=job_store.DEFAULT_STORE, window_seconds=3600):
+    store = job_store.open_store(store_url)
+    stats = store.stats(window_seconds)
+    store.close()
+    print(json.dumps(stats["counts"]))
+    total_audio = 0.0
+    for worker, entry in sorted(stats["workers"].items()):
+        total_audio += entry["audio_seconds"]
+        speed = entry["audio_seconds"] / entry["busy_seconds"] if entry["busy_seconds"] else 0.0
+        print(f"{worker:>30}: {entry['jobs']} jobs, {entry['audio_seconds'] / 60:.1f} audio min, "
+              f"{speed:.2f}x real time")
+    print(f"{len(stats['workers'])} workers processed {total_audio / 60:.1f} audio minutes "
+          f"in the last {window_seconds / 60:.0f} minutes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distributed lecture pipeline workers over a shared job store.")
+    parser.add_argument("--store", default=job_store.DEFAULT_STORE,
+                        help="sqlite:///path/on/share/jobs.db, redis://host:6379/0 or fakeredis://")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = commands.add_parser("enqueue", help="Queue new recordings from the input directory")
+    enqueue.add_argument("--priority", default="normal", choices=["urgent", "normal", "archive"])
+
+    work = commands.add_parser("work", help="Claim and process recordings")
+    work.add_argument("--processes", type=int, default=1)
+    work.add_argument("--lease", type=float, default=job_store.LEASE_SECONDS)
+    work.add_argument("--max-jobs", type=int)
+    work.add_argument("--exit-when-idle", action="store_true")
+    work.add_argument("--preload", help="Comma-separated Whisper models to load once and share with the workers")
+    work.add_argument("--share-mode", default="fork", choices=["fork", "shared"])
+
+    stats = commands.add_parser("stats", help="Show queue counts and per-worker throughput")
+    stats.add_argument("--window", type=float, default=3600)
+
+    args = parser.parse_args()
+    if args.command == "enqueue":
+        enqueue_new(args.store, priority=args.priority)
+    elif args.command == "work":
+        options = {"lease_seconds": args.lease, "max_jobs": args.max_jobs, "exit_when_idle": args.exit_when_idle}
+        if args.processes > 1:
+            preload = [name for name in (args.preload or "").split(",") if name]
+            run_pool(args.processes, args.store, preload=preload, mode=args.share_mode, **options)
+        else:
+            run_worker(args.store, **options)
+    else:
+        print_stats(args.store, args.window)
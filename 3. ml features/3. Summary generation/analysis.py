@@ -0,0 +1,254 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from graph_extraction import extract_edges, split_sentences
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+SUMMARY_MODEL = "facebook/bart-large-cnn"
+
+# Models are shared by every TranscriptAnalysis in the process and only
+# loaded the first time a product that needs them is requested.
+_models = {}
+
+
+def get_embeddings(model_name=EMBEDDING_MODEL):
+    key = ("embeddings", model_name)
+    if key not in _models:
+        from langchain.embeddings import HuggingFaceEmbeddings
+
+        _models[key] = HuggingFaceEmbeddings(model_name=model_name)
+    return _models[key]
+
+
+def get_summarizer(model_name=SUMMARY_MODEL):
+    key = ("summarizer", model_name)
+    if key not in _models:
+        import torch
+        from transformers import pipeline
+
+        _models[key] = pipeline("summarization", model=model_name, device=0 if torch.cuda.is_available() else -1)
+    return _models[key]
+
+
+def get_llm(model_name=SUMMARY_MODEL):
+    key = ("llm", model_name)
+    if key not in _models:
+        try:
+            from langchain_huggingface import HuggingFacePipeline
+        except ImportError:
+            from langchain.llms import HuggingFacePipeline
+
+        _models[key] = HuggingFacePipeline(pipeline=get_summarizer(model_name))
+    return _models[key]
+
+
+def clear_model_cache():
+    """
+    Forget every loaded model, spaCy's included, so the next request loads it again.
+    """
+    import graph_extraction
+
+    _models.clear()
+    graph_extraction._nlp_cache.clear()
+
+
+class TranscriptAnalysis:
+    """
+    One analysis job per transcript: the text is read and split once, and the
+    chunks, embeddings, summaries, sentences and graph edges are computed on
+    first request and shared by every consumer. The parsed spaCy docs are not
+    among them: they are streamed into the edges and dropped (see `edges`).
+    """
+
+    def __init__(self, text, source=None, chunk_size=1000, chunk_overlap=200, n_process=1):
+        self.text = text
+        self.source = source
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.n_process = n_process
+        self.docs_per_second = None
+        self._products = {}
+        self.timings = {}
+
+    @classmethod
+    def from_file(cls, file_path, **kwargs):
+        with open(file_path, "r", encoding="utf-8") as f:
+            return cls(f.read(), source=file_path, **kwargs)
+
+    def _product(self, name, build):
+        if name not in self._products:
+            start = time.perf_counter()
+            self._products[name] = build()
+            self.timings[name] = time.perf_counter() - start
+        return self._products[name]
+
+    @property
+    def chunks(self):
+        def build():
+            from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+            splitter = RecursiveCharacterTextSplitter(chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap)
+            metadata = [{"source": self.source}] if self.source else None
+            return splitter.create_documents([self.text], metadatas=metadata)
+
+        return self._product("chunks", build)
+
+    @property
+    def vectorstore(self):
+        def build():
+            from langchain.vectorstores import FAISS
+
+            return FAISS.from_documents(self.chunks, get_embeddings())
+
+        return self._product("vectorstore", build)
+
+    def qa_summary(self, query, model_name=SUMMARY_MODEL):
+        """
+        Answer a summary query with RetrievalQA over the shared vector store.
+        """
+        def build():
+            from langchain.chains import RetrievalQA
+
+            qa_chain = RetrievalQA.from_chain_type(llm=get_llm(model_name), retriever=self.vectorstore.as_retriever())
+            return qa_chain.invoke({"query": query})["result"]
+
+        return self._product(("qa_summary", query, model_name), build)
+
+    def summary(self, max_length=150, min_length=50, model_name=SUMMARY_MODEL):
+        """
+        Summarize the whole transcript directly, as generate_summary does.
+        """
+        def build():
+            summarizer = get_summarizer(model_name)
+            return summarizer(self.text, max_length=max_length, min_length=min_length, do_sample=False,
+                              truncation=True)[0]['summary_text']
+
+        return self._product(("summary", max_length, min_length, model_name), build)
+
+    def sentence_vectors(self, vectors="embeddings"):
+        """
+        One vector per sentence of the transcript, as used for extractive ranking.
+        """
+        def build():
+            import extractive
+
+            return extractive.VECTORIZERS[vectors](self.sentences)
+
+        return self._product(("sentence_vectors", vectors), build)
+
+    @property
+    def sentences(self):
+        return self._product("sentences", lambda: list(split_sentences(self.text)))
+
+    def extractive_summary(self, num_sentences=5, vectors="embeddings", fallback=False):
+        """
+        The most central sentences by TextRank (see extractive.py), in the order
+        they were said; far cheaper than a BART generation. With `fallback`, the
+        abstractive summary is returned when the sentences cannot be ranked.
+        """
+        def build():
+            if len(self.sentences) <= num_sentences:
+                return " ".join(self.sentences)
+            try:
+                import extractive
+
+                scores = extractive.textrank(self.sentence_vectors(vectors))
+            except Exception as e:
+                # A missing or offline MiniLM raises OSError or RuntimeError from HuggingFace, not just ImportError
+                if not fallback:
+                    raise
+                print(f"Extractive summary unavailable ({e}); using the abstractive summary")
+                return self.summary()
+            return extractive.top_sentences(self.sentences, scores, num_sentences)
+
+        return self._product(("extractive_summary", num_sentences, vectors, fallback), build)
+
+    @property
+    def edges(self):
+        """
+        Dependency edges, from the sentences streamed through spaCy's nlp.pipe
+        (see graph_extraction.extract_edges) without keeping the parsed docs.
+        """
+        def build():
+            edges, self.docs_per_second = extract_edges(self.text, n_process=self.n_process)
+            return edges
+
+        return self._product("edges", build)
+
+    def report(self):
+        for name, seconds in self.timings.items():
+            label = name if isinstance(name, str) else name[0]
+            print(f"  {label}: {seconds:.2f}s")
+        if self.docs_per_second is not None:
+            print(f"  spaCy throughput: {self.docs_per_second:.1f} docs/s")
+
+
+def _benchmark_side(side, file_path, workdir):
+    """
+    One side of the benchmark, run in a fresh process so neither side finds models
+    the other loaded. Both run the same consumers, graph layout included.
+    """
+    from app import summarize_with_langchain
+    from summaryAndKnowledgeGraph import summarize_and_generate_knowledge_graph
+
+    start = time.perf_counter()
+    if side == "separate":
+        # Each consumer on its own, as when run one by one: its own analysis and its own model loads
+        summarize_with_langchain(file_path)
+        clear_model_cache()
+        summarize_and_generate_knowledge_graph(file_path, os.path.join(workdir, "summary.txt"), show_graph=False)
+        clear_model_cache()
+        TranscriptAnalysis.from_file(file_path).summary()
+        analysis = None
+    else:
+        analysis = TranscriptAnalysis.from_file(file_path)
+        summarize_with_langchain(file_path, analysis=analysis)
+        summarize_and_generate_knowledge_graph(file_path, os.path.join(workdir, "summary.txt"), show_graph=False,
+                                               analysis=analysis)
+        analysis.summary()
+    seconds = time.perf_counter() - start
+    if analysis is not None:
+        analysis.report()
+    return seconds
+
+
+def benchmark(file_path, runs=1):
+    """
+    Compare running the three consumers (QA summary, summary plus knowledge
+    graph, direct summary) each on its own against one shared analysis.
+    Every side runs in its own process, so both pay for the same model loads.
+    """
+    import tempfile
+
+    results = {"separate": [], "shared": []}
+    with tempfile.TemporaryDirectory() as tmp:
+        for _ in range(runs):
+            for side in results:
+                completed = subprocess.run([sys.executable, os.path.abspath(__file__), "_side", side, file_path, tmp],
+                                           capture_output=True, text=True)
+                if completed.returncode != 0:
+                    raise RuntimeError(f"The {side} run failed: {completed.stderr[-2000:]}")
+                lines = completed.stdout.strip().splitlines()
+                results[side].append(json.loads(lines[-1])["seconds"])
+                if side == "shared":
+                    shared_report = [line for line in lines if line.startswith("  ")]
+
+    separate, shared = min(results["separate"]), min(results["shared"])
+    print(f"Separate consumers: {separate:.2f}s")
+    print(f"Shared analysis:    {shared:.2f}s ({separate / shared:.2f}x faster)")
+    print("\n".join(shared_report))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 5 and sys.argv[1] == "_side":
+        # Through the imported module: its model caches are the ones app.py and the graph code use
+        import analysis
+
+        print(json.dumps({"seconds": analysis._benchmark_side(*sys.argv[2:])}))
+    elif len(sys.argv) > 2 and sys.argv[1] == "benchmark":
+        benchmark(sys.argv[2], runs=int(sys.argv[3]) if len(sys.argv) > 3 else 1)
+    else:
+        print("Usage: python analysis.py benchmark <transcript.txt> [runs]")
@@ -1,13 +1,7 @@
-from langchain.document_loaders import TextLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.vectorstores import FAISS
-from langchain.chains import RetrievalQA
-from langchain.llms import HuggingFacePipeline
-from transformers import pipeline
-import torch 
+from analysis import TranscriptAnalysis
 
-def summarize_with_langchain(file_path, model_name="facebook/bart-large-cnn", num_sentences=3):
+def summarize_with_langchain(file_path, model_name="facebook/bart-large-cnn", num_sentences=3, analysis=None,
+                             mode="abstractive"):
     """
     Summarize content from a .txt file using LangChain and HuggingFace pipeline.
 
@@ -15,33 +9,26 @@ def summarize_with_langchain(file_path, model_name="facebook/bart-large-cnn", nu
         file_path (str): Path to the .txt file.
         model_name (str): HuggingFace model for summarization.
         num_sentences (int): Number of sentences to include in the summary.
+        analysis (TranscriptAnalysis): Optional shared analysis of the same file to reuse
+            (its chunking is used as is; on its own this function uses a 100-character overlap).
+        mode (str): "abstractive" answers a summary query with RetrievalQA; "extractive"
+            picks the most central sentences with TextRank in milliseconds to seconds,
+            falling back to the abstractive model if they cannot be ranked.
 
     Returns:
         str: The summarized content.
     """
     try:
-        # Step 1: Load the text file
-        loader = TextLoader(file_path, encoding='utf-8')
-        documents = loader.load()
+        # Step 1: Load and split the text, embed it and summarize over the shared analysis
+        if analysis is None:
+            analysis = TranscriptAnalysis.from_file(file_path, chunk_overlap=100)
 
-        # Step 2: Split the text into manageable chunks
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-        texts = text_splitter.split_documents(documents)
+        if mode == "extractive":
+            return analysis.extractive_summary(num_sentences, fallback=True)
 
-        # Step 3: Embed the text for semantic search
-        embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-        vectorstore = FAISS.from_documents(texts, embeddings)
-
-        # Step 4: Set up the HuggingFace summarization pipeline
-        summarizer = pipeline("summarization", model=model_name, device=0 if torch.cuda.is_available() else -1)
-
-        # Step 5: Create a RetrievalQA chain for summarization
-        llm = HuggingFacePipeline(pipeline=summarizer)
-        qa_chain = RetrievalQA.from_chain_type(llm=llm, retriever=vectorstore.as_retriever())
-        
-        # Step 6: Query for a summary
+        # Step 2: Query for a summary
         query = f"Summarize this text into {num_sentences} sentences."
-        summary = qa_chain.run(query)
+        summary = analysis.qa_summary(query, model_name=model_name)
         
         return summary
 
@@ -51,7 +38,8 @@ def summarize_with_langchain(file_path, model_name="facebook/bart-large-cnn", nu
         return f"An error occurred: {e}"
 
 # Example usage
-file_path = "file1.txt"  # Replace with your .txt file path
-summary = summarize_with_langchain(file_path)
-print("Summary:")
-print(summary)
+if __name__ == "__main__":
+    file_path = "file1.txt"  # Replace with your .txt file path
+    summary = summarize_with_langchain(file_path)
+    print("Summary:")
+    print(summary)
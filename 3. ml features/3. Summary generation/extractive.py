@@ -0,0 +1,132 @@
+import argparse
+import glob
+import os
+import re
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+# Where the apps keep lecture transcripts: the classroom's sample lectures and the pipeline's outputs
+TRANSCRIPT_PATTERNS = [
+    os.path.join(REPO_ROOT, "2. classroom", "public", "data", "*", "*_transcript.txt"),
+    os.path.join(REPO_ROOT, "2. classroom", "public", "data", "smartrec", "*", "*-english.txt"),
+    os.path.join(REPO_ROOT, "1. whiteboard", "public", "data", "*", "*_transcript.txt"),
+]
+EMBEDDING_BATCH_SIZE = 64
+DAMPING = 0.85
+
+_word = re.compile(r"[a-z0-9']+")
+
+
+def tfidf_vectors(sentences):
+    """
+    TF-IDF rows for the sentences; needs no model, so ranking takes milliseconds.
+    """
+    vocabulary = {}
+    rows, columns = [], []
+    for i, sentence in enumerate(sentences):
+        for word in _word.findall(sentence.lower()):
+            rows.append(i)
+            columns.append(vocabulary.setdefault(word, len(vocabulary)))
+    counts = np.zeros((len(sentences), max(1, len(vocabulary))), dtype=np.float32)
+    np.add.at(counts, (np.array(rows, dtype=np.intp), np.array(columns, dtype=np.intp)), 1.0)
+    document_frequency = (counts > 0).sum(axis=0)
+    idf = np.log((1 + len(sentences)) / (1 + document_frequency)) + 1
+    return counts * idf
+
+
+def embedding_vectors(sentences, batch_size=EMBEDDING_BATCH_SIZE):
+    """
+    MiniLM sentence embeddings (the model analysis.py uses for retrieval), computed in batches.
+    """
+    from analysis import get_embeddings
+
+    embeddings = get_embeddings()
+    vectors = []
+    for start in range(0, len(sentences), batch_size):
+        vectors.extend(embeddings.embed_documents(sentences[start:start + batch_size]))
+    return np.asarray(vectors, dtype=np.float32)
+
+
+VECTORIZERS = {
+    "embeddings": embedding_vectors,
+    "tfidf": tfidf_vectors,
+}
+
+
+def textrank(vectors, damping=DAMPING, iterations=100, tolerance=1e-6):
+    """
+    PageRank over the cosine-similarity graph of the sentence vectors.
+    """
+    count = len(vectors)
+    if count == 0:
+        return np.zeros(0, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = vectors / np.where(norms == 0, 1, norms)
+    similarity = np.clip(unit @ unit.T, 0, None)
+    np.fill_diagonal(similarity, 0)
+    out_weight = similarity.sum(axis=1, keepdims=True)
+    # Sentences similar to nothing link to every sentence equally
+    transition = np.divide(similarity, out_weight, out=np.full_like(similarity, 1 / count), where=out_weight > 0)
+    scores = np.full(count, 1 / count, dtype=transition.dtype)
+    for _ in range(iterations):
+        updated = (1 - damping) / count + damping * (transition.T @ scores)
+        converged = np.abs(updated - scores).sum() < tolerance
+        scores = updated
+        if converged:
+            break
+    return scores
+
+
+def top_sentences(sentences, scores, num_sentences):
+    """
+    The highest-scoring sentences, in the order they were said. Repeated
+    sentences (common in transcripts) are only picked once.
+    """
+    chosen, seen = [], set()
+    for i in np.argsort(-scores, kind="stable"):
+        key = sentences[i].lower()
+        if key not in seen:
+            seen.add(key)
+            chosen.append(i)
+            if len(chosen) == num_sentences:
+                break
+    return " ".join(sentences[i] for i in sorted(chosen))
+
+
+def find_transcripts(patterns=TRANSCRIPT_PATTERNS):
+    paths = []
+    for pattern in patterns:
+        paths.extend(sorted(glob.glob(pattern)))
+    return paths
+
+
+def digest(paths, num_sentences=5, vectors="embeddings", fallback=False):
+    """
+    Print a quick extractive digest of each lecture transcript with the time it took.
+    """
+    from analysis import TranscriptAnalysis
+
+    total = 0.0
+    for path in paths:
+        analysis = TranscriptAnalysis.from_file(path)
+        start = time.perf_counter()
+        summary = analysis.extractive_summary(num_sentences, vectors=vectors, fallback=fallback)
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        print(f"\n{os.path.relpath(path, REPO_ROOT)} ({elapsed * 1000:.1f} ms)")
+        print(summary)
+    print(f"\n{len(paths)} lectures in {total:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quick extractive digest of lecture transcripts.")
+    parser.add_argument("paths", nargs="*", help="Transcript .txt files (default: every lecture under public/data)")
+    parser.add_argument("--sentences", type=int, default=5)
+    parser.add_argument("--vectors", default="embeddings", choices=sorted(VECTORIZERS),
+                        help="MiniLM embeddings, or model-free TF-IDF for the fastest run")
+    parser.add_argument("--fallback", action="store_true",
+                        help="Fall back to the abstractive summary when a transcript cannot be ranked")
+    args = parser.parse_args()
+    digest(args.paths or find_transcripts(), args.sentences, args.vectors, args.fallback)
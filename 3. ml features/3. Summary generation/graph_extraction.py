@@ -0,0 +1,118 @@
+import re
+import time
+from collections import Counter
+
+# Only the parser (and the tok2vec layer it listens to) is needed for
+# dependency edges, so everything else in the pipeline is left unloaded.
+SPACY_MODEL = "en_core_web_sm"
+UNUSED_COMPONENTS = ["ner", "lemmatizer", "attribute_ruler", "tagger", "senter", "textcat"]
+EDGE_DEPS = ("nsubj", "dobj")
+
+_nlp_cache = {}
+
+_sentence_end = re.compile(r"(?<=[.!?])\s+")
+
+
+def load_nlp(model_name=SPACY_MODEL):
+    """
+    Load a trimmed spaCy pipeline once per process and reuse it on later calls.
+    """
+    if model_name not in _nlp_cache:
+        import spacy
+
+        _nlp_cache[model_name] = spacy.load(model_name, exclude=UNUSED_COMPONENTS)
+    return _nlp_cache[model_name]
+
+
+def split_sentences(text):
+    """
+    Cheaply split text into sentences so they can be streamed through nlp.pipe.
+    """
+    for line in text.splitlines():
+        for sentence in _sentence_end.split(line):
+            sentence = sentence.strip()
+            if sentence:
+                yield sentence
+
+
+class EdgeWeights:
+    """
+    Weighted (source, target, relation) edge counts with interned node names.
+    """
+
+    def __init__(self):
+        self.names = []
+        self._ids = {}
+        self._counts = Counter()
+
+    def _intern(self, name):
+        node_id = self._ids.get(name)
+        if node_id is None:
+            node_id = len(self.names)
+            self._ids[name] = node_id
+            self.names.append(name)
+        return node_id
+
+    def add(self, source, target, relation, weight=1):
+        key = (self._intern(source), self._intern(target), self._intern(relation))
+        self._counts[key] += weight
+
+    def update(self, other):
+        for source, target, relation, weight in other.items():
+            self.add(source, target, relation, weight)
+
+    def items(self):
+        names = self.names
+        for (source, target, relation), weight in self._counts.items():
+            yield names[source], names[target], names[relation], weight
+
+    def most_common(self, n=None):
+        names = self.names
+        return [
+            (names[source], names[target], names[relation], weight)
+            for (source, target, relation), weight in self._counts.most_common(n)
+        ]
+
+    def total(self):
+        return sum(self._counts.values())
+
+    def __len__(self):
+        return len(self._counts)
+
+    def __bool__(self):
+        return bool(self._counts)
+
+
+def edges_from_doc(doc, edges=None):
+    """
+    Add subject/object dependency edges found in a parsed doc to `edges`.
+    """
+    if edges is None:
+        edges = EdgeWeights()
+    for token in doc:
+        if token.dep_ in EDGE_DEPS and token.head.is_alpha and token.text != token.head.text:
+            edges.add(token.text, token.head.text, token.dep_)
+    return edges
+
+
+def extract_edges(text, model_name=SPACY_MODEL, batch_size=256, n_process=1):
+    """
+    Stream the sentences of `text` through spaCy and count dependency edges.
+
+    Returns the EdgeWeights and the throughput in documents (sentences) per second.
+    """
+    nlp = load_nlp(model_name)
+    edges = EdgeWeights()
+
+    start = time.perf_counter()
+    doc_count = 0
+    for doc in nlp.pipe(split_sentences(text), batch_size=batch_size, n_process=n_process):
+        edges_from_doc(doc, edges)
+        doc_count += 1
+    elapsed = time.perf_counter() - start
+
+    docs_per_second = doc_count / elapsed if elapsed > 0 else 0.0
+    print(f"Parsed {doc_count} sentences in {elapsed:.2f}s ({docs_per_second:.1f} docs/s), "
+          f"{len(edges)} unique edges.")
+    return edges, docs_per_second
+
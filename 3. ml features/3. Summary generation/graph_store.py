@@ -0,0 +1,366 @@
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_DB_PATH = os.environ.get(
+    "KNOWLEDGE_GRAPH_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "knowledge_graph.db")
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    label TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS node_lectures (
+    node_id INTEGER NOT NULL,
+    lecture_id TEXT NOT NULL,
+    mentions INTEGER NOT NULL,
+    PRIMARY KEY (node_id, lecture_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS edges (
+    id INTEGER PRIMARY KEY,
+    source INTEGER NOT NULL,
+    target INTEGER NOT NULL,
+    relation TEXT NOT NULL,
+    weight INTEGER NOT NULL,
+    UNIQUE (source, target, relation)
+);
+CREATE INDEX IF NOT EXISTS edges_by_target ON edges (target);
+CREATE TABLE IF NOT EXISTS edge_lectures (
+    edge_id INTEGER NOT NULL,
+    lecture_id TEXT NOT NULL,
+    weight INTEGER NOT NULL,
+    PRIMARY KEY (edge_id, lecture_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS edge_lectures_by_lecture ON edge_lectures (lecture_id);
+CREATE INDEX IF NOT EXISTS node_lectures_by_lecture ON node_lectures (lecture_id);
+CREATE TABLE IF NOT EXISTS lectures (
+    lecture_id TEXT PRIMARY KEY,
+    merged_at REAL NOT NULL,
+    edge_count INTEGER NOT NULL
+);
+"""
+
+_punctuation = re.compile(r"^[\W_]+|[\W_]+$")
+_whitespace = re.compile(r"\s+")
+
+
+def normalize_entity(name):
+    """
+    Normalize an entity name so the same concept from different lectures maps to one node.
+    """
+    name = _whitespace.sub(" ", name).strip()
+    return _punctuation.sub("", name).casefold()
+
+
+class GraphStore:
+    """
+    Persistent knowledge graph spanning all lectures, backed by SQLite.
+
+    Each thread gets its own connection (the HTTP server handles requests on
+    many threads); WAL mode lets them read while one of them merges.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self.conn.executescript(SCHEMA)
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=OFF")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                # Connections of other threads can only be closed there; they go when the thread does
+                pass
+        self._local = threading.local()
+
+    def has_lecture(self, lecture_id):
+        row = self.conn.execute("SELECT 1 FROM lectures WHERE lecture_id = ?", (lecture_id,)).fetchone()
+        return row is not None
+
+    def lectures(self):
+        return [row[0] for row in self.conn.execute("SELECT lecture_id FROM lectures ORDER BY merged_at")]
+
+    def _node_id(self, name):
+        key = normalize_entity(name)
+        if not key:
+            return None
+        self.conn.execute("INSERT OR IGNORE INTO nodes (name, label) VALUES (?, ?)", (key, name.strip()))
+        return self.conn.execute("SELECT id FROM nodes WHERE name = ?", (key,)).fetchone()[0]
+
+    def merge_lecture(self, lecture_id, edges, replace=False):
+        """
+        Merge one lecture's weighted (source, target, relation, weight) edges into the store.
+
+        Lectures already in the store are skipped unless `replace` is set, in
+        which case their previous contribution is removed first.
+        """
+        if self.has_lecture(lecture_id):
+            if not replace:
+                print(f"Lecture {lecture_id} is already in the knowledge graph store.")
+                return 0
+            self.remove_lecture(lecture_id)
+
+        start = time.perf_counter()
+        merged = 0
+        with self.conn:
+            for source, target, relation, weight in edges:
+                source_id = self._node_id(source)
+                target_id = self._node_id(target)
+                if source_id is None or target_id is None or source_id == target_id:
+                    continue
+
+                self.conn.execute(
+                    "INSERT INTO edges (source, target, relation, weight) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (source, target, relation) DO UPDATE SET weight = weight + excluded.weight",
+                    (source_id, target_id, relation, weight),
+                )
+                edge_id = self.conn.execute(
+                    "SELECT id FROM edges WHERE source = ? AND target = ? AND relation = ?",
+                    (source_id, target_id, relation),
+                ).fetchone()[0]
+                self.conn.execute(
+                    "INSERT INTO edge_lectures (edge_id, lecture_id, weight) VALUES (?, ?, ?) "
+                    "ON CONFLICT (edge_id, lecture_id) DO UPDATE SET weight = weight + excluded.weight",
+                    (edge_id, lecture_id, weight),
+                )
+                for node_id in (source_id, target_id):
+                    self.conn.execute(
+                        "INSERT INTO node_lectures (node_id, lecture_id, mentions) VALUES (?, ?, ?) "
+                        "ON CONFLICT (node_id, lecture_id) DO UPDATE SET mentions = mentions + excluded.mentions",
+                        (node_id, lecture_id, weight),
+                    )
+                merged += 1
+
+            self.conn.execute(
+                "INSERT INTO lectures (lecture_id, merged_at, edge_count) VALUES (?, ?, ?)",
+                (lecture_id, time.time(), merged),
+            )
+
+        print(f"Merged {merged} edges from lecture {lecture_id} in {time.perf_counter() - start:.2f}s.")
+        return merged
+
+    def remove_lecture(self, lecture_id):
+        """
+        Subtract a lecture's edge weights and drop edges and nodes no lecture still uses.
+        """
+        with self.conn:
+            self.conn.execute(
+                "UPDATE edges SET weight = weight - "
+                "(SELECT el.weight FROM edge_lectures el WHERE el.edge_id = edges.id AND el.lecture_id = ?) "
+                "WHERE id IN (SELECT edge_id FROM edge_lectures WHERE lecture_id = ?)",
+                (lecture_id, lecture_id),
+            )
+            self.conn.execute("DELETE FROM edge_lectures WHERE lecture_id = ?", (lecture_id,))
+            self.conn.execute("DELETE FROM node_lectures WHERE lecture_id = ?", (lecture_id,))
+            self.conn.execute("DELETE FROM edges WHERE weight <= 0")
+            self.conn.execute("DELETE FROM nodes WHERE id NOT IN (SELECT node_id FROM node_lectures)")
+            self.conn.execute("DELETE FROM lectures WHERE lecture_id = ?", (lecture_id,))
+
+    def _lookup(self, name):
+        row = self.conn.execute("SELECT id, label FROM nodes WHERE name = ?", (normalize_entity(name),)).fetchone()
+        return row
+
+    def node_lectures(self, name):
+        row = self._lookup(name)
+        if row is None:
+            return []
+        return [
+            lecture_id
+            for (lecture_id,) in self.conn.execute(
+                "SELECT lecture_id FROM node_lectures WHERE node_id = ? ORDER BY mentions DESC", (row[0],)
+            )
+        ]
+
+    def neighbors(self, name, limit=50):
+        """
+        Return the heaviest relations touching `name`, with the lectures each came from.
+        """
+        row = self._lookup(name)
+        if row is None:
+            return []
+        node_id = row[0]
+        rows = self.conn.execute(
+            "SELECT e.id, 'out', n.label, e.relation, e.weight FROM edges e JOIN nodes n ON n.id = e.target "
+            "WHERE e.source = ? "
+            "UNION ALL "
+            "SELECT e.id, 'in', n.label, e.relation, e.weight FROM edges e JOIN nodes n ON n.id = e.source "
+            "WHERE e.target = ? "
+            "ORDER BY 5 DESC LIMIT ?",
+            (node_id, node_id, limit),
+        ).fetchall()
+
+        results = []
+        for edge_id, direction, label, relation, weight in rows:
+            lectures = [
+                lecture_id
+                for (lecture_id,) in self.conn.execute(
+                    "SELECT lecture_id FROM edge_lectures WHERE edge_id = ?", (edge_id,)
+                )
+            ]
+            results.append({
+                "direction": direction,
+                "node": label,
+                "relation": relation,
+                "weight": weight,
+                "lectures": lectures,
+            })
+        return results
+
+    def _adjacent(self, node_ids, batch_size=500):
+        """
+        Yield (node, neighbor) pairs for a whole BFS level, a few hundred nodes per query.
+        """
+        node_ids = list(node_ids)
+        for start in range(0, len(node_ids), batch_size):
+            batch = node_ids[start:start + batch_size]
+            marks = ",".join("?" * len(batch))
+            yield from self.conn.execute(
+                f"SELECT source, target FROM edges WHERE source IN ({marks}) "
+                f"UNION SELECT target, source FROM edges WHERE target IN ({marks})",
+                batch + batch,
+            )
+
+    def shortest_path(self, source, target, max_depth=6):
+        """
+        Find the shortest undirected path between two entities with a bidirectional BFS.
+        """
+        source_row = self._lookup(source)
+        target_row = self._lookup(target)
+        if source_row is None or target_row is None:
+            return None
+        if source_row[0] == target_row[0]:
+            return [source_row[1]]
+
+        # A node is visited (given a parent) when it is enqueued, so no node is queued twice
+        parents = [{source_row[0]: None}, {target_row[0]: None}]
+        frontiers = [[source_row[0]], [target_row[0]]]
+        meeting = None
+        for _ in range(max_depth):
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            visited, other_side = parents[side], parents[1 - side]
+            next_frontier = []
+            for node_id, other in self._adjacent(frontiers[side]):
+                if other in visited:
+                    continue
+                visited[other] = node_id
+                if other in other_side:
+                    meeting = other
+                    break
+                next_frontier.append(other)
+            if meeting is not None or not next_frontier:
+                break
+            frontiers[side] = next_frontier
+
+        if meeting is None:
+            return None
+
+        path = []
+        node_id = meeting
+        while node_id is not None:
+            path.append(node_id)
+            node_id = parents[0][node_id]
+        path.reverse()
+        node_id = parents[1][meeting]
+        while node_id is not None:
+            path.append(node_id)
+            node_id = parents[1][node_id]
+
+        labels = dict(self.conn.execute(
+            f"SELECT id, label FROM nodes WHERE id IN ({','.join('?' * len(path))})", path
+        ).fetchall())
+        return [labels[node_id] for node_id in path]
+
+
+def serve(store, port=8010):
+    """
+    Serve neighbor and path lookups as JSON for the classroom UI.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            start = time.perf_counter()
+            if url.path == "/neighbors" and "name" in query:
+                body = {"name": query["name"], "neighbors": store.neighbors(query["name"]),
+                        "lectures": store.node_lectures(query["name"])}
+            elif url.path == "/path" and "source" in query and "target" in query:
+                body = {"path": store.shortest_path(query["source"], query["target"])}
+            elif url.path == "/lectures":
+                body = {"lectures": store.lectures()}
+            else:
+                self.send_error(404)
+                return
+            body["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 3)
+
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    with ThreadingHTTPServer(("", port), Handler) as httpd:
+        print(f"Knowledge graph store serving on port {port}...")
+        httpd.serve_forever()
+
+
+if __name__ == "__main__":
+    usage = (
+        "Usage:\n"
+        "  python graph_store.py merge <lecture_id> <transcript.txt> [--replace]\n"
+        "  python graph_store.py neighbors <entity>\n"
+        "  python graph_store.py path <entity> <entity>\n"
+        "  python graph_store.py serve [port]"
+    )
+    if len(sys.argv) < 2:
+        print(usage)
+        sys.exit(1)
+
+    store = GraphStore()
+    command = sys.argv[1]
+    if command == "merge":
+        from graph_extraction import extract_edges
+
+        lecture_id, transcript_path = sys.argv[2], sys.argv[3]
+        if store.has_lecture(lecture_id) and "--replace" not in sys.argv:
+            print(f"Lecture {lecture_id} is already in the knowledge graph store.")
+        else:
+            with open(transcript_path, "r", encoding="utf-8") as f:
+                edges, _ = extract_edges(f.read())
+            store.merge_lecture(lecture_id, edges.items(), replace="--replace" in sys.argv)
+    elif command == "neighbors":
+        print(json.dumps(store.neighbors(sys.argv[2]), ensure_ascii=False, indent=2))
+    elif command == "path":
+        print(store.shortest_path(sys.argv[2], sys.argv[3]))
+    elif command == "serve":
+        serve(store, int(sys.argv[2]) if len(sys.argv) > 2 else 8010)
+    else:
+        print(usage)
+        sys.exit(1)
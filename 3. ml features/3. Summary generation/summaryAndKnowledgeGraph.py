@@ -1,95 +1,79 @@
 import os
-import torch
-import spacy
 import networkx as nx
-import matplotlib.pyplot as plt
-from langchain.document_loaders import TextLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.vectorstores import FAISS
-from langchain.chains import RetrievalQA
-from langchain_huggingface import HuggingFacePipeline
-from transformers import pipeline
-
-def summarize_and_generate_knowledge_graph(file_path, output_file, model_name="facebook/bart-large-cnn", summary_length=300):
+from analysis import TranscriptAnalysis
+from graph_export import compute_layout, export_graph, render_graph
+
+def summarize_and_generate_knowledge_graph(file_path, output_file, model_name="facebook/bart-large-cnn", summary_length=300,
+                                           graph_output=None, graph_image=None, show_graph=False,
+                                           graph_store=None, lecture_id=None, analysis=None):
     """
     Summarize content from a .txt file using LangChain and generate a detailed knowledge graph.
+
+    The graph is written to `graph_output` (.graphml or .json) and/or drawn to
+    `graph_image` when given; `show_graph=True` opens a non-blocking window unless headless.
+    When a GraphStore is passed the edges are also merged into it under `lecture_id`.
+    Pass a TranscriptAnalysis to reuse chunks, embeddings and parses from other consumers.
     """
     try:
-        # Step 1: Load the text file
-        loader = TextLoader(file_path, encoding='utf-8')
-        documents = loader.load()
+        # Step 1: Load and split the text once, shared with any other consumer of the analysis
+        if analysis is None:
+            analysis = TranscriptAnalysis.from_file(file_path, chunk_size=1000, chunk_overlap=200)
 
         # Check if documents are empty
-        if len(documents) == 0:
+        if not analysis.text.strip():
             print("The document is empty.")
             return
 
-        # Step 2: Split the text into manageable chunks
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)  # Adjust chunk size
-        texts = text_splitter.split_documents(documents)
-
         # Check if texts are empty
-        if len(texts) == 0:
+        if len(analysis.chunks) == 0:
             print("The document couldn't be split into chunks.")
             return
 
-        # Step 3: Embed the text for semantic search
-        embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-        vectorstore = FAISS.from_documents(texts, embeddings)
-
-        # Step 4: Set up the HuggingFace summarization pipeline
-        summarizer = pipeline("summarization", model=model_name, device=0 if torch.cuda.is_available() else -1)
-
-        # Step 5: Create a RetrievalQA chain for summarization
-        llm = HuggingFacePipeline(pipeline=summarizer)
-        qa_chain = RetrievalQA.from_chain_type(llm=llm, retriever=vectorstore.as_retriever())
-
-        # Step 6: Query for a longer summary
+        # Step 2: Query for a longer summary over the shared embeddings
         query = f"Summarize this text in about {summary_length} words, keeping key details intact."
-        summary = qa_chain.invoke({"query": query})
+        summary = analysis.qa_summary(query, model_name=model_name)
 
         # Validate summary response
-        if not summary or 'result' not in summary:
+        if not summary:
             print("Summary could not be generated.")
             return
 
-        # Step 7: Save the summary to a .txt file
+        # Step 3: Save the summary to a .txt file
         with open(output_file, "w", encoding="utf-8") as f:
-            f.write(summary['result'])
+            f.write(summary)
         
         print(f"Summary saved to {output_file}")
 
-        # Step 8: Generate Knowledge Graph
+        # Step 4: Generate Knowledge Graph
         print("Generating knowledge graph...")
-        nlp = spacy.load("en_core_web_sm")  # Ensure the spaCy model is downloaded
-        doc = nlp(" ".join([t.page_content for t in texts]))
-
-        # Extract detailed relations and entities
-        edges = []
-        for sent in doc.sents:
-            for token in sent:
-                if token.dep_ in ("nsubj", "dobj") and token.head.is_alpha and token.text != token.head.text:
-                    edges.append((token.text, token.head.text, token.dep_))
+        edges = analysis.edges
 
         # Validate edges
         if not edges:
             print("No valid relationships found for knowledge graph.")
             return
 
-        # Create a graph with detailed edge relationships
+        if graph_store is not None:
+            graph_store.merge_lecture(lecture_id or os.path.splitext(os.path.basename(file_path))[0], edges.items())
+
+        # Create a graph with weighted edge relationships
         graph = nx.DiGraph()
-        for edge in edges:
-            graph.add_edge(edge[0], edge[1], label=edge[2])
-
-        # Plot the graph with enhanced visuals
-        plt.figure(figsize=(14, 10))
-        pos = nx.spring_layout(graph, seed=42)
-        nx.draw(graph, pos, with_labels=True, node_size=4000, node_color="lightgreen", font_size=10, font_weight="bold", edge_color="gray")
-        edge_labels = nx.get_edge_attributes(graph, 'label')
-        nx.draw_networkx_edge_labels(graph, pos, edge_labels=edge_labels, font_color='red', font_size=9)
-        plt.title("Knowledge Graph", fontsize=16)
-        plt.show()
+        # Several relations between the same two concepts share one edge: their weights add up
+        # and the label is the most frequent relation
+        merged = {}
+        for source, target, relation, weight in edges.items():
+            total, label, label_weight = merged.get((source, target), (0, relation, 0))
+            if weight > label_weight:
+                label, label_weight = relation, weight
+            merged[(source, target)] = (total + weight, label, label_weight)
+        for (source, target), (weight, label, _) in merged.items():
+            graph.add_edge(source, target, label=label, weight=weight)
+
+        # Step 5: Lay out, export and optionally render the graph
+        pos = compute_layout(graph)
+        if graph_output:
+            export_graph(graph, graph_output, pos)
+        render_graph(graph, pos, image_path=graph_image, show=show_graph)
 
         print("Knowledge graph generated successfully.")
 
@@ -100,7 +84,9 @@ def summarize_and_generate_knowledge_graph(file_path, output_file, model_name="f
 
 
 # Example Usage
-file_path = "file2.txt"  # Provide the path to your input file
-output_file = "output_summary.txt"    # Provide the output file path for the summary
+if __name__ == "__main__":
+    file_path = "file2.txt"  # Provide the path to your input file
+    output_file = "output_summary.txt"    # Provide the output file path for the summary
+    graph_output = "knowledge_graph.graphml"  # .graphml or .json, for headless servers
 
-summarize_and_generate_knowledge_graph(file_path, output_file)
+    summarize_and_generate_knowledge_graph(file_path, output_file, graph_output=graph_output)